@@ -1,4 +1,5 @@
 import streamlit as st
+import numpy as np
 import pandas as pd
 import streamlit_authenticator as stauth
 from dotenv import load_dotenv
@@ -49,57 +50,51 @@ with st.sidebar:
     authenticator.logout('Logout', 'main')
     st.divider()
 
-from utils.data_loader import load_projects, load_orgs
-from utils.db import get_watchlist
-from utils.matcher import ProjectMatcher
+from utils.data_loader import load_projects, load_org_index, load_filter_engine, load_dashboard_cube, load_aggregate_index, load_presentation_view
+from utils.user_cache import get_watchlist, get_user_cache
+from utils.matcher import SEMANTIC_TOP_K
+from utils.matcher_service import get_matcher_service
+from utils.incremental_aggregates import get_session_aggregates
 from components.sidebar import render_sidebar
 from components.project_list import render_project_list
 from components.metrics import render_metrics
-from components.charts import render_charts, render_coordinator_stats, render_project_timeline, render_choropleth_map
+from components.charts import render_charts, render_coordinator_stats, render_project_timeline, render_choropleth_map, frame_fingerprint, get_chart_timings
 from components.admin import render_admin_panel
 
 logger.info("Application started/reloaded.")
 
 # --- Semantic Search Initialization ---
-if 'project_matcher' not in st.session_state:
-    st.session_state['project_matcher'] = ProjectMatcher()
-
-# Dictionary mapping country codes to country names
-country_mapping = {
-    'IT': 'Italy', 'AT': 'Austria', 'CZ': 'Czech Republic', 'ES': 'Spain', 'FR': 'France', 'DE': 'Germany',
-    'NL': 'Netherlands',
-    'UK': 'United Kingdom', 'BE': 'Belgium', 'EE': 'Estonia', 'PL': 'Poland', 'HR': 'Croatia', 'IE': 'Ireland',
-    'FI': 'Finland',
-    'NO': 'Norway', 'LU': 'Luxembourg', 'DK': 'Denmark', 'CH': 'Switzerland', 'SE': 'Sweden', 'PT': 'Portugal',
-    'RO': 'Romania',
-    'BG': 'Bulgaria', 'LV': 'Latvia', 'SI': 'Slovenia', 'LT': 'Lithuania', 'SK': 'Slovakia', 'UA': 'Ukraine',
-    'RS': 'Serbia',
-    'CY': 'Cyprus', 'HU': 'Hungary', 'MT': 'Malta', 'MK': 'North Macedonia', 'IS': 'Iceland',
-    'BA': 'Bosnia and Herzegovina',
-    'AL': 'Albania', 'MD': 'Moldova', 'XK': 'Kosovo', 'ME': 'Montenegro'
-}
+# One matcher per server process, shared by all sessions
+matcher_service = get_matcher_service()
 
 # Title
 st.title("Available Hopon Projects")
 projects = load_projects()
 
-# --- Semantic Encoding ---
-if 'project_matcher' in st.session_state and st.session_state['project_matcher'].embeddings is None and not projects.empty:
-    with st.spinner("Initializing AI Search Engine... (First run only)"):
-        st.session_state['project_matcher'].encode_projects(projects)
+# --- Semantic Engine Warm-up ---
+# Non-blocking: the model and embeddings load in a background thread while
+# searches are served by keyword matching.
+if not projects.empty:
+    matcher_service.start_warmup(projects)
 
-df_organizations = load_orgs()
-
-# Filter organizations to keep only those in Europe
-if not df_organizations.empty:
-    df_organizations = df_organizations[df_organizations['country'].isin(country_mapping.keys())]
-    # Replace country codes with country names
-    df_organizations['country'] = df_organizations['country'].map(country_mapping)
+# European organizations with country names, indexed by projectID (cached, shared read-only)
+org_index = load_org_index()
+df_organizations = org_index.orgs
 
 # Render Sidebar and get filters
 # We pass the authenticated user_id to the sidebar
 filters = render_sidebar(projects, current_user_id) 
 
+# Semantic engine readiness
+warmup = matcher_service.status()
+if warmup['semantic_ready']:
+    total = warmup['timings'].get('total')
+    st.sidebar.caption("🟢 AI Search ready" + (f" (warm-up {total:.1f}s)" if total else ""))
+elif warmup['state'] == 'warming':
+    st.sidebar.caption("🟡 AI Search warming up, keyword search in use")
+else:
+    st.sidebar.caption("⚪ AI Search unavailable, keyword search in use")
+
 # --- ROUTING LOGIC ---
 if filters.get('page') == "User Management":
     render_admin_panel(current_user_id)
@@ -109,49 +104,63 @@ if filters.get('page') == "User Management":
 
 # Apply filters
 if not projects.empty and filters:
-    filtered_df = projects.copy() # Start with a copy
-    
-    # Date filters (only if dates are selected)
-    if filters['start_date']:
-        filtered_df = filtered_df[filtered_df['startDate'] >= pd.to_datetime(filters['start_date'])]
-    if filters['end_date']:
-        filtered_df = filtered_df[filtered_df['endDate'] <= pd.to_datetime(filters['end_date'])]
-
-    # Cluster and Funding Scheme filters
-    if filters['selected_clusters']:
-        filtered_df = filtered_df[filtered_df['cluster'].isin(filters['selected_clusters'])]
-    if filters['selected_funding_schemes']:
-        filtered_df = filtered_df[filtered_df['fundingScheme'].isin(filters['selected_funding_schemes'])]
+    # Structured filters (dates, clusters, schemes, id, favorites) -> one mask,
+    # then semantic ranking; results are row positions cached across sessions
+    filter_engine = load_filter_engine()
+    watchlist_ids = None
+    if filters.get('show_watchlist'):
+        watchlist_ids = get_watchlist(current_user_id) if current_user_id else []
+    matcher = matcher_service.matcher # Snapshot, may be hot-swapped by another session
+    filtered_positions, relevance = filter_engine.run(filters, watchlist_ids, matcher, top_k=SEMANTIC_TOP_K)
+    filtered_df = filter_engine.take(filtered_positions)
+    # Analytics come from the pre-aggregated cube unless text/favorite filters are on
+    cube_slice = load_dashboard_cube().slice(filters, watchlist_ids)
 
     # Text search filters
     if filters['search_objective']:
         # Semantic Search & Ranking
-        if 'project_matcher' in st.session_state:
-            filtered_df = st.session_state['project_matcher'].search(filters['search_objective'], filtered_df)
-            st.info(f"Showing results for '{filters['search_objective']}' sorted by AI Relevance.")
-    
-    if filters['search_id']:
-        filtered_df = filtered_df[filtered_df['id'].str.contains(filters['search_id'], case=False, na=False)]
-    
-    # Watchlist Filter
-    if filters.get('show_watchlist'):
-        if current_user_id:
-            watchlist_ids = get_watchlist(current_user_id)
-            filtered_df = filtered_df[filtered_df['id'].isin(watchlist_ids)]
+        if matcher is not None:
+            if relevance is not None:
+                filtered_df = filtered_df.assign(relevance_score=relevance)
+            st.info(f"Showing the top {SEMANTIC_TOP_K} results for '{filters['search_objective']}' sorted by Relevance.")
+            if filters.get('search_mode', 'semantic') != 'keyword' and not matcher.semantic_ready:
+                if warmup['state'] == 'warming':
+                    st.caption("AI Search Engine is still warming up, showing keyword matches for now.")
+                else:
+                    st.caption("AI Search Engine is unavailable, showing keyword matches.")
         else:
-            filtered_df = filtered_df[filtered_df['id'].isin([])]
+            st.warning("Search engine is starting, please try again in a moment.")
 else:
     filtered_df = projects
+    filtered_positions = None
+    cube_slice = load_dashboard_cube().slice({}) if not projects.empty else None
+
+# Watchlist / saved searches are served from the write-through user data cache
+logger.debug(f"User data cache: {get_user_cache().stats()}")
 
 # --- Dashboard Metrics ---
-render_metrics(filtered_df, df_organizations)
+# KPIs are updated with the rows that entered / left the filtered set since the last rerun
+aggregates = None
+if not projects.empty:
+    aggregate_index = load_aggregate_index()
+    if filtered_positions is not None:
+        aggregates = get_session_aggregates(aggregate_index).update(filtered_positions, filters, watchlist_ids)
+    else:
+        aggregates = get_session_aggregates(aggregate_index).update(np.arange(aggregate_index.n_rows), {})
+render_metrics(filtered_df, org_index, aggregates)
 
 # --- Visualizations ---
 with st.expander("📊 Dashboard Analytics", expanded=False):
-    render_project_timeline(filtered_df)
-    render_charts(filtered_df)
-    render_coordinator_stats(filtered_df, df_organizations)
-    render_choropleth_map(filtered_df, df_organizations)
+    # Charts are cached on this fingerprint instead of hashing the frames
+    chart_timings = get_chart_timings()
+    with chart_timings.measure('fingerprint'):
+        chart_key = frame_fingerprint(filtered_df, filtered_positions)
+    render_project_timeline(filtered_df, chart_key)
+    chart_aggregates = cube_slice if cube_slice is not None else aggregates
+    render_charts(filtered_df, chart_key, chart_aggregates)
+    render_coordinator_stats(filtered_df, org_index, chart_key, cube_slice)
+    render_choropleth_map(filtered_df, org_index, chart_key, chart_aggregates)
+    logger.debug(f"Chart layer timings: {chart_timings.stats()}")
 
 # Create tabs
 tab1, tab2 = st.tabs(["Projects", "Organisations"])
@@ -165,7 +174,9 @@ with tab1:
         st.write(f"**Min Start Date:** {min_date}")
         st.write(f"**Max End Date:** {max_date}")
 
-    selected_project = render_project_list(filtered_df, current_user_id)
+    # Display columns (DOI links, previews) are precomputed once and taken by row position
+    presentation_view = load_presentation_view() if not projects.empty else None
+    selected_project = render_project_list(filtered_df, current_user_id, filtered_positions, presentation_view)
 
     # --- AI Project Brief ---
     if selected_project:
@@ -212,7 +223,7 @@ with tab1:
     # Org view for selected project
     if not df_organizations.empty and selected_project:
         st.write("### Participating Organizations")
-        project_orgs = df_organizations[df_organizations['projectID'] == selected_project]
+        project_orgs = org_index.orgs_for_project(selected_project)
         project_orgs = project_orgs.sort_values(by=['order'],ascending=True)
         st.dataframe(project_orgs,hide_index=True)
 
@@ -1,5 +1,6 @@
 import streamlit as st
 from utils.db import create_user, delete_user, update_user, get_db, User
+from utils.user_cache import get_user_cache
 
 def render_admin_panel(current_user_id):
     """
@@ -61,6 +62,7 @@ def render_admin_panel(current_user_id):
                     else:
                         if st.button("🗑️ Delete User", type="primary"):
                             if delete_user(user_to_edit.id):
+                                get_user_cache().invalidate(user_to_edit.id)
                                 st.success(f"User {user_to_edit.username} deleted.")
                                 st.rerun()
                             else:
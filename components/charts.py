@@ -1,37 +1,128 @@
+import time
+import hashlib
+import functools
+import threading
+from contextlib import contextmanager
+import numpy as np
 import streamlit as st
 import pandas as pd
 import altair as alt
 import plotly.express as px
 
+# Chart functions are cached on a compact fingerprint (dataset version + hash
+# of the filtered row positions). DataFrames are passed as underscore
+# arguments, which Streamlit does not hash. When aggregates are passed (a
+# CubeSlice from utils/olap_cube.py or the session's IncrementalAggregates),
+# the render functions build the charts from them instead of the rows.
+
+def frame_fingerprint(projects_df, positions=None):
+    """
+    Cache key of a filtered projects frame: its dataset version plus a hash
+    of the row positions (or of the ids if no positions are given).
+    """
+    digest = hashlib.sha1(str(projects_df.attrs.get('dataset_version', '')).encode('utf-8'))
+    if positions is not None:
+        digest.update(np.ascontiguousarray(positions, dtype=np.int64).tobytes())
+    elif 'id' in projects_df.columns:
+        digest.update(pd.util.hash_array(projects_df['id'].to_numpy(dtype=object)).tobytes())
+    return digest.hexdigest()
+
+class ChartTimings:
+    """
+    Time spent per stage of the chart layer:
+    - fingerprint: computing the cache key
+    - lookup: cached call minus compute, i.e. Streamlit hashing and cache lookup
+    - compute: building charts on cache misses
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.seconds = {'fingerprint': 0.0, 'lookup': 0.0, 'compute': 0.0}
+        self.calls = {'fingerprint': 0, 'lookup': 0, 'compute': 0}
+
+    def record(self, stage, seconds):
+        with self._lock:
+            self.seconds[stage] += seconds
+            self.calls[stage] += 1
+
+    @contextmanager
+    def measure(self, stage):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(stage, time.perf_counter() - started)
+
+    def cached_call(self, func, *args):
+        """Calls a cached chart function, splitting its time into lookup and compute."""
+        compute_before = self.seconds['compute']
+        started = time.perf_counter()
+        result = func(*args)
+        elapsed = time.perf_counter() - started
+        self.record('lookup', max(elapsed - (self.seconds['compute'] - compute_before), 0.0))
+        return result
+
+    def stats(self):
+        with self._lock:
+            return {stage: {'seconds': self.seconds[stage], 'calls': self.calls[stage]} for stage in self.seconds}
+
+@st.cache_resource
+def get_chart_timings():
+    """Returns the chart timing counters of this server process."""
+    return ChartTimings()
+
+def timed_compute(func):
+    """Records the run time of a cached chart function (it only runs on cache misses)."""
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        with get_chart_timings().measure('compute'):
+            return func(*args, **kwargs)
+    return wrapper
+
+def cluster_chart(cluster_counts):
+    """Bar chart of a projects-per-cluster Series."""
+    # Categorical columns also count clusters that are filtered out
+    cluster_counts = cluster_counts[cluster_counts > 0].reset_index()
+    cluster_counts.columns = ['Cluster', 'Count']
+
+    return alt.Chart(cluster_counts).mark_bar().encode(
+        x=alt.X('Count', title='Number of Projects', axis=alt.Axis(tickMinStep=1)),
+        y=alt.Y('Cluster', sort='-x', title=None),
+        tooltip=['Cluster', 'Count']
+    ).properties(height=300)
+
+def funding_chart_data(cluster_funding):
+    """Series for st.bar_chart from a funding-per-cluster Series."""
+    funding_data = cluster_funding.reset_index()
+    funding_data.columns = ['Cluster', 'TotalFunding']
+    funding_data['TotalFunding'] = funding_data['TotalFunding'].astype(float)
+    return funding_data.set_index('Cluster')['TotalFunding']
+
 @st.cache_data
-def get_cluster_chart(projects_df):
-    if 'cluster' in projects_df.columns:
-        cluster_counts = projects_df['cluster'].value_counts().reset_index()
-        cluster_counts.columns = ['Cluster', 'Count']
-        
-        return alt.Chart(cluster_counts).mark_bar().encode(
-            x=alt.X('Count', title='Number of Projects', axis=alt.Axis(tickMinStep=1)),
-            y=alt.Y('Cluster', sort='-x', title=None),
-            tooltip=['Cluster', 'Count']
-        ).properties(height=300)
+@timed_compute
+def get_cluster_chart(fingerprint, _projects_df):
+    if 'cluster' in _projects_df.columns:
+        return cluster_chart(_projects_df['cluster'].value_counts())
     return None
 
 @st.cache_data
-def get_funding_chart_data(projects_df):
+@timed_compute
+def get_funding_chart_data(fingerprint, _projects_df):
     # Returns data for st.bar_chart (which doesn't return an object we can easily cache-and-render the same way)
-    if 'cluster' in projects_df.columns and 'totalCost' in projects_df.columns:
-        funding_data = projects_df.groupby('cluster')['totalCost'].sum().reset_index()
-        funding_data.columns = ['Cluster', 'TotalFunding']
-        funding_data['TotalFunding'] = funding_data['TotalFunding'].astype(float)
-        return funding_data.set_index('Cluster')['TotalFunding']
+    if 'cluster' in _projects_df.columns and 'totalCost' in _projects_df.columns:
+        return funding_chart_data(_projects_df.groupby('cluster', observed=True)['totalCost'].sum())
     return None
 
-def render_charts(projects_df):
+def render_charts(projects_df, fingerprint=None, aggregates=None):
     """
     Renders interactive charts for the dashboard.
     """
     if projects_df.empty:
         return
+    timings = get_chart_timings()
+    if fingerprint is None and aggregates is None:
+        with timings.measure('fingerprint'):
+            fingerprint = frame_fingerprint(projects_df)
 
     st.subheader("Visual Insights")
     
@@ -39,7 +130,11 @@ def render_charts(projects_df):
     
     with col1:
         st.write("#### Projects by Cluster")
-        chart = get_cluster_chart(projects_df)
+        if aggregates is not None:
+            with timings.measure('compute'):
+                chart = cluster_chart(aggregates.cluster_counts())
+        else:
+            chart = timings.cached_call(get_cluster_chart, fingerprint, projects_df)
         if chart:
             st.altair_chart(chart, use_container_width=True)
         else:
@@ -47,7 +142,11 @@ def render_charts(projects_df):
 
     with col2:
         st.write("#### Funding Distribution")
-        chart_data = get_funding_chart_data(projects_df)
+        if aggregates is not None:
+            with timings.measure('compute'):
+                chart_data = funding_chart_data(aggregates.cluster_funding())
+        else:
+            chart_data = timings.cached_call(get_funding_chart_data, fingerprint, projects_df)
         if chart_data is not None:
             st.bar_chart(chart_data, color="#FFA500", horizontal=True)
         else:
@@ -56,9 +155,10 @@ def render_charts(projects_df):
     st.markdown("---")
 
 @st.cache_data
-def get_coordinator_chart(projects_df, orgs_df):
+@timed_compute
+def get_coordinator_chart(fingerprint, _projects_df, _org_index):
     # Filter orgs to only those involved in the visible projects
-    relevant_orgs = orgs_df[orgs_df['projectID'].isin(projects_df['id'])]
+    relevant_orgs = _org_index.orgs_for(_projects_df['id'])
     
     # Filter for Coordinators only
     coordinators = relevant_orgs[relevant_orgs['role'].str.contains('coordinator', case=False, na=False)]
@@ -66,29 +166,40 @@ def get_coordinator_chart(projects_df, orgs_df):
     if coordinators.empty:
         return None
 
-    # Count projects per coordinator
-    coord_counts = coordinators['name'].value_counts().reset_index()
-    coord_counts.columns = ['Coordinator', 'Projects Managed']
-    
-    # Take Top 10
-    top_coords = coord_counts.head(10)
-    
+    # Count projects per coordinator, take Top 10
+    return coordinator_chart(coordinators['name'].value_counts().head(10).reset_index())
+
+def coordinator_chart(top_coords):
+    """Bar chart of a (name, projects) frame of the top coordinators."""
+    if top_coords.empty:
+        return None
+    top_coords = top_coords.copy()
+    top_coords.columns = ['Coordinator', 'Projects Managed']
+
     return alt.Chart(top_coords).mark_bar().encode(
         x=alt.X('Projects Managed', title='Projects', axis=alt.Axis(tickMinStep=1)),
         y=alt.Y('Coordinator', sort='-x', title=None),
         tooltip=['Coordinator', 'Projects Managed']
     ).properties(height=300)
 
-def render_coordinator_stats(projects_df, orgs_df):
+def render_coordinator_stats(projects_df, org_index, fingerprint=None, cube_slice=None):
     """
     Renders a leaderboard of project coordinators.
     """
-    if projects_df.empty or orgs_df.empty:
+    if projects_df.empty or org_index.orgs.empty:
         return
+    timings = get_chart_timings()
+    if fingerprint is None and cube_slice is None:
+        with timings.measure('fingerprint'):
+            fingerprint = frame_fingerprint(projects_df)
 
     st.subheader("🏆 Coordinator Leaderboard")
     
-    chart = get_coordinator_chart(projects_df, orgs_df)
+    if cube_slice is not None:
+        with timings.measure('compute'):
+            chart = coordinator_chart(cube_slice.top_coordinators(10))
+    else:
+        chart = timings.cached_call(get_coordinator_chart, fingerprint, projects_df, org_index)
     
     if chart:
         st.altair_chart(chart, use_container_width=True)
@@ -98,9 +209,10 @@ def render_coordinator_stats(projects_df, orgs_df):
     st.markdown("---")
 
 @st.cache_data
-def get_timeline_chart(projects_df):
+@timed_compute
+def get_timeline_chart(fingerprint, _projects_df):
     # Sort by Start Date
-    timeline_df = projects_df.sort_values('startDate', ascending=False).head(30).copy()
+    timeline_df = _projects_df.sort_values('startDate', ascending=False).head(30).copy()
     
     # Calculate duration
     timeline_df['duration_months'] = ((timeline_df['endDate'] - timeline_df['startDate']) / pd.Timedelta(days=30)).astype(int)
@@ -120,30 +232,38 @@ def get_timeline_chart(projects_df):
         height=400
     ).interactive()
 
-def render_project_timeline(projects_df):
+def render_project_timeline(projects_df, fingerprint=None):
     """
     Renders a Gantt chart of project timelines.
     """
     if projects_df.empty:
         return
+    timings = get_chart_timings()
+    if fingerprint is None:
+        with timings.measure('fingerprint'):
+            fingerprint = frame_fingerprint(projects_df)
 
     st.subheader("⏳ Project Timeline")
-    chart = get_timeline_chart(projects_df)
+    chart = timings.cached_call(get_timeline_chart, fingerprint, projects_df)
     st.altair_chart(chart, use_container_width=True)
     st.caption("Displaying 30 most recent projects sorted by Start Date.")
     st.markdown("---")
 
 @st.cache_data
-def get_choropleth_map(projects_df, orgs_df):
-    # Filter orgs
-    relevant_orgs = orgs_df[orgs_df['projectID'].isin(projects_df['id'])].copy()
+@timed_compute
+def get_choropleth_map(fingerprint, _projects_df, _org_index):
+    # Filter orgs (the org index is a process-wide constant, not part of the key)
+    relevant_orgs = _org_index.orgs_for(_projects_df['id'])
     
     # Aggregate by Country
-    country_stats = relevant_orgs.groupby('country').agg(
+    country_stats = relevant_orgs.groupby('country', observed=True).agg(
         TotalFunding=('ecContribution', 'sum'),
         ProjectCount=('projectID', 'count')
     ).reset_index()
-    
+    return choropleth_map(country_stats)
+
+def choropleth_map(country_stats):
+    """Plotly choropleth of a (country, TotalFunding, ProjectCount) frame."""
     if country_stats.empty:
         return None
 
@@ -170,16 +290,24 @@ def get_choropleth_map(projects_df, orgs_df):
     )
     return fig
 
-def render_choropleth_map(projects_df, orgs_df):
+def render_choropleth_map(projects_df, org_index, fingerprint=None, aggregates=None):
     """
     Renders a Choropleth map of funding using Plotly.
     """
-    if projects_df.empty or orgs_df.empty:
+    if projects_df.empty or org_index.orgs.empty:
         return
+    timings = get_chart_timings()
+    if fingerprint is None and aggregates is None:
+        with timings.measure('fingerprint'):
+            fingerprint = frame_fingerprint(projects_df)
         
     st.subheader("🌍 European Funding Landscape")
     
-    fig = get_choropleth_map(projects_df, orgs_df)
+    if aggregates is not None:
+        with timings.measure('compute'):
+            fig = choropleth_map(aggregates.country_stats())
+    else:
+        fig = timings.cached_call(get_choropleth_map, fingerprint, projects_df, org_index)
     
     if fig:
         st.plotly_chart(fig, use_container_width=True)
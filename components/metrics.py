@@ -1,29 +1,37 @@
 import streamlit as st
 import pandas as pd
 
-def render_metrics(projects_df, orgs_df):
+def render_metrics(projects_df, org_index, aggregates=None):
     """
     Renders key metrics (KPIs) for the filtered dataset.
     
     Args:
         projects_df (pd.DataFrame): The filtered projects DataFrame.
-        orgs_df (pd.DataFrame): The full organizations DataFrame.
+        org_index (OrgIndex): Index over the full organizations DataFrame.
+        aggregates (IncrementalAggregates): The session's KPIs for projects_df,
+            if maintained incrementally (otherwise computed from the rows).
     """
     if projects_df.empty:
         st.warning("No projects match the current filters.")
         return
 
-    # Calculate Metrics
-    total_projects = len(projects_df)
-    
-    # Calculate Total Funding (in Millions)
-    total_cost = projects_df['totalCost'].sum()
+    if aggregates is not None:
+        totals = aggregates.totals()
+        total_projects, total_cost, unique_orgs = totals['projects'], totals['funding'], totals['orgs']
+    else:
+        # Calculate Metrics
+        total_projects = len(projects_df)
+
+        # Calculate Total Funding
+        total_cost = projects_df['totalCost'].sum()
+
+        # Calculate Unique Organizations participating in these projects
+        # Filter orgs to only those involved in the visible projects
+        relevant_orgs = org_index.orgs_for(projects_df['id'])
+        unique_orgs = relevant_orgs['name'].nunique()
+
+    # Total Funding in Millions
     total_cost_formatted = f"€{total_cost / 1_000_000:.1f}M"
-    
-    # Calculate Unique Organizations participating in these projects
-    # Filter orgs to only those involved in the visible projects
-    relevant_orgs = orgs_df[orgs_df['projectID'].isin(projects_df['id'])]
-    unique_orgs = relevant_orgs['name'].nunique()
 
     # Display Metrics in columns
     col1, col2, col3 = st.columns(3)
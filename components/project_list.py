@@ -1,9 +1,74 @@
 import streamlit as st
+import numpy as np
 import pandas as pd
-from utils.db import get_watchlist, add_to_watchlist, remove_from_watchlist
+from utils.user_cache import get_watchlist, update_watchlist
 from utils.export import convert_df_to_csv, convert_df_to_excel
+from utils.matcher_service import get_matcher_service
+from utils.presentation import doi_urls, objective_previews
 
-def render_project_list(filtered_df, user_id):
+# Table paging: only the visible page is decorated, sent to the browser and diffed
+PAGE_SIZES = [25, 50, 100, 250]
+DEFAULT_PAGE_SIZE = 50
+SORT_COLUMNS = ['startDate', 'endDate', 'totalCost', 'acronym', 'title', 'id']
+
+def page_positions(df, page, page_size, sort_by=None, ascending=True):
+    """
+    Row positions of one page of df, sorted server-side by a single column
+    (missing values last; None keeps the current order, e.g. by relevance).
+    Only the sort column is sorted, the page rows are then taken by position.
+
+    Returns:
+        tuple: (positions, number of pages)
+    """
+    n_pages = max(1, -(-len(df) // page_size))
+    page = min(max(page, 1), n_pages)
+    start, stop = (page - 1) * page_size, page * page_size
+    if sort_by is None or sort_by not in df.columns:
+        return np.arange(start, min(stop, len(df))), n_pages
+    column = df[sort_by].reset_index(drop=True)
+    order = column.sort_values(ascending=ascending, na_position='last', kind='stable').index
+    return order[start:stop].to_numpy(), n_pages
+
+def render_page_controls(df):
+    """
+    Sort and page widgets above the table.
+
+    Returns:
+        tuple: (positions, page, n_pages, editor key). The editor key changes
+        with the view, so pending edits never apply to another page's rows.
+    """
+    sort_options = ['Default'] + [c for c in SORT_COLUMNS if c in df.columns]
+    col_sort, col_order, col_size, col_page = st.columns([0.35, 0.2, 0.2, 0.25])
+    with col_sort:
+        sort_by = st.selectbox("Sort by", sort_options, key='project_sort')
+    with col_order:
+        ascending = st.selectbox("Order", ["Ascending", "Descending"], key='project_order') == "Ascending"
+    with col_size:
+        page_size = st.selectbox("Rows per page", PAGE_SIZES, index=PAGE_SIZES.index(DEFAULT_PAGE_SIZE), key='project_page_size')
+
+    n_pages = max(1, -(-len(df) // page_size))
+    # Filters may have shrunk the result below the current page
+    if st.session_state.get('project_page', 1) > n_pages:
+        st.session_state['project_page'] = n_pages
+    with col_page:
+        page = st.number_input("Page", min_value=1, max_value=n_pages, step=1, key='project_page')
+
+    positions, n_pages = page_positions(df, int(page), page_size, None if sort_by == 'Default' else sort_by, ascending)
+    editor_key = f"project_editor_{sort_by}_{ascending}_{page_size}_{int(page)}"
+    return positions, int(page), n_pages, editor_key
+
+def render_project_list(filtered_df, user_id, positions=None, view=None):
+    """
+    Renders the paged project table, the project selector and similar projects.
+
+    Args:
+        filtered_df (pd.DataFrame): The filtered projects, in display order.
+        user_id (int): The logged-in user's id (None disables favorites).
+        positions (np.ndarray): Row positions of filtered_df in the full
+            projects frame (None if filtered_df is the full frame).
+        view (PresentationView): Precomputed display columns of the full
+            frame; if None they are computed for the visible page.
+    """
     col_header, col_export = st.columns([0.7, 0.3])
     
     with col_header:
@@ -33,19 +98,26 @@ def render_project_list(filtered_df, user_id):
     else:
         watchlist = []
     
+    # Only the visible page is decorated and sent to the editor
+    page_rows, page, n_pages, editor_key = render_page_controls(filtered_df)
+    st.caption(f"Showing {len(page_rows)} of {len(filtered_df)} projects (page {page} of {n_pages}).")
+
     # Add 'Favorite' column
-    df_display = filtered_df.copy()
+    df_display = filtered_df.iloc[page_rows].copy()
     df_display.insert(0, 'Favorite', df_display['id'].isin(watchlist))
 
-    # Construct clickable DOI links
+    # Clickable DOI links, precomputed in the presentation view
     if 'grantDoi' in df_display.columns:
-        # Prepend base URL to DOI, handling NaNs
-        df_display['grantDoi'] = df_display['grantDoi'].apply(lambda x: f"https://doi.org/{x}" if pd.notnull(x) and str(x).strip() != '' else None)
+        if view is not None:
+            rows = page_rows if positions is None else np.asarray(positions)[page_rows]
+            df_display['grantDoi'] = view.take(rows)['doiUrl'].to_numpy()
+        else:
+            df_display['grantDoi'] = doi_urls(df_display['grantDoi']).to_numpy()
 
     # Reorder columns: Move Match Score to front if present
     if 'relevance_score' in df_display.columns:
-        cols = ['Favorite', 'relevance_score'] + [c for c in df_display.columns if c not in ['Favorite', 'relevance_score']]
-        df_display = df_display[cols]
+        front = ['Favorite', 'relevance_score']
+        df_display = df_display[front + df_display.columns.drop(front).tolist()]
 
     # Display editor
     # We disable editing if no user is selected
@@ -81,35 +153,30 @@ def render_project_list(filtered_df, user_id):
             )
         },
         disabled=disabled_cols,
-        key="project_editor"
+        key=editor_key
     )
 
-    # Detect Changes only if user is logged in
+    # Detect Changes only if user is logged in (on the visible page only)
     if user_id and not edited_df.equals(df_display):
-        # New Favorites
+        # New and removed Favorites, written in one transaction
         new_favs_mask = edited_df['Favorite'] & ~df_display['Favorite']
-        new_fav_ids = edited_df.loc[new_favs_mask, 'id'].tolist()
-        
-        for pid in new_fav_ids:
-            add_to_watchlist(pid, user_id)
-            
-        # Removed Favorites
         removed_favs_mask = ~edited_df['Favorite'] & df_display['Favorite']
-        removed_fav_ids = edited_df.loc[removed_favs_mask, 'id'].tolist()
-        
-        for pid in removed_fav_ids:
-            remove_from_watchlist(pid, user_id)
-            
-        # Force rerun to update UI immediately
-        st.rerun()
+        if new_favs_mask.any() or removed_favs_mask.any():
+            update_watchlist(
+                edited_df.loc[new_favs_mask, 'id'].tolist(),
+                edited_df.loc[removed_favs_mask, 'id'].tolist(),
+                user_id
+            )
+            # Force rerun to update UI immediately
+            st.rerun()
     
     # Select project
     selected_project = st.selectbox("Select a Project ID to View Organizations", filtered_df['id'].unique())
     st.write('Results: ' + str(filtered_df.shape[0]))
 
     # --- Similar Projects Recommender ---
-    if selected_project and 'project_matcher' in st.session_state:
-        matcher = st.session_state['project_matcher']
+    matcher = get_matcher_service().matcher
+    if selected_project and matcher is not None:
         # Only try if embeddings are ready
         if matcher.embeddings is not None:
             st.markdown("---")
@@ -118,15 +185,20 @@ def render_project_list(filtered_df, user_id):
             similar_df = matcher.get_similar_projects(selected_project, filtered_df, top_k=3)
             
             if not similar_df.empty:
+                if view is not None:
+                    cards = view.for_ids(similar_df['id'])
+                    previews, costs = cards['objectivePreview'].tolist(), cards['costLabel'].tolist()
+                else:
+                    previews, costs = objective_previews(similar_df['objective']).tolist(), [None] * len(similar_df)
                 cols = st.columns(3)
                 for idx, (col, row) in enumerate(zip(cols, similar_df.iterrows())):
                     _, project = row
                     with col:
                         score = int(project['similarity_score'] * 100)
                         st.metric(label=f"Match: {score}%", value=project['id'])
-                        st.caption(f"**{project['title']}**")
+                        st.caption(f"**{project['title']}**" + (f" · {costs[idx]}" if costs[idx] else ""))
                         with st.expander("Brief"):
-                            st.write(project['objective'][:200] + "...")
+                            st.write(previews[idx])
             else:
                 st.caption("No similar projects found (try generating embeddings first).")
     
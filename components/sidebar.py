@@ -1,8 +1,9 @@
 import streamlit as st
 import pandas as pd
 import json
-from utils.db import save_search, get_saved_searches, delete_search
+from utils.user_cache import save_search, get_saved_searches, delete_search
 from utils.logger import logger
+from utils.matcher import SEARCH_MODES
 
 def reset_filters_to_defaults():
     """Sets all filter-related session state keys to their initial 'empty' state."""
@@ -14,6 +15,7 @@ def reset_filters_to_defaults():
     st.session_state['filter_funding'] = [] # Empty
     st.session_state['filter_id'] = ""
     st.session_state['filter_objective'] = ""
+    st.session_state['filter_search_mode'] = SEARCH_MODES[0]
 
 def render_sidebar(projects, current_user_id):
     """
@@ -34,6 +36,7 @@ def render_sidebar(projects, current_user_id):
         st.session_state.filter_funding = filters.get('selected_funding_schemes', [])
         st.session_state.filter_id = filters.get('search_id', "")
         st.session_state.filter_objective = filters.get('search_objective', "")
+        st.session_state.filter_search_mode = filters.get('search_mode', SEARCH_MODES[0])
 
         # Clean up the temporary key to prevent re-applying on the next rerun
         del st.session_state.search_to_load
@@ -66,6 +69,14 @@ def render_sidebar(projects, current_user_id):
         key='filter_objective',
         help="Type a concept (e.g., 'Cancer', 'Green Energy'). AI will find relevant projects even if keywords don't match exactly."
     )
+    search_mode = st.sidebar.radio(
+        "Search Mode",
+        SEARCH_MODES,
+        format_func=str.title,
+        key='filter_search_mode',
+        horizontal=True,
+        help="Hybrid combines AI relevance with exact keyword matches (acronyms, topic codes). Keyword uses exact terms only."
+    )
 
     # --- Saved Search UI ---
     if current_user_id:
@@ -85,7 +96,7 @@ def render_sidebar(projects, current_user_id):
                     st.rerun()
             with col_del_search:
                 if st.button("Delete"):
-                    delete_search(search_options[selected_search_name]['id']); st.rerun()
+                    delete_search(search_options[selected_search_name]['id'], current_user_id); st.rerun()
 
         with st.sidebar.expander("Save Current Search"):
             new_search_name = st.text_input("Name for this search")
@@ -95,7 +106,7 @@ def render_sidebar(projects, current_user_id):
                         'show_watchlist': show_watchlist, 'start_date': str(start_date) if start_date else None,
                         'end_date': str(end_date) if end_date else None, 'selected_clusters': selected_clusters,
                         'selected_funding_schemes': selected_funding_schemes, 'search_id': search_project_id,
-                        'search_objective': search_objective
+                        'search_objective': search_objective, 'search_mode': search_mode
                     }
                     save_search(new_search_name, json.dumps(current_filters), current_user_id)
                     st.rerun()
@@ -105,6 +116,7 @@ def render_sidebar(projects, current_user_id):
     return {
         'show_watchlist': show_watchlist, 'start_date': start_date, 'end_date': end_date,
         'selected_clusters': selected_clusters, 'selected_funding_schemes': selected_funding_schemes,
-        'search_id': search_project_id, 'search_objective': search_objective, 'user_id': current_user_id,
+        'search_id': search_project_id, 'search_objective': search_objective, 'search_mode': search_mode,
+        'user_id': current_user_id,
         'page': page
     }
\ No newline at end of file
@@ -0,0 +1,147 @@
+import argparse
+import hashlib
+import os
+import shutil
+import sys
+import time
+
+import numpy as np
+
+# Add project root to path
+sys.path.append(os.getcwd())
+
+from utils.data_loader import load_projects
+from utils.logger import logger
+from utils.matcher import ProjectMatcher, MODEL_NAME
+
+CHECKPOINT_DIR = "data/processed/embedding_chunks"
+DEFAULT_CHUNK_SIZE = 1024
+DEFAULT_BATCH_SIZE = 64
+
+
+class ChunkedEncoder:
+    """
+    Encodes texts chunk by chunk with a multi-process pool.
+
+    Every finished chunk is written to `<checkpoint_dir>/<run>/chunk_NNNNN.npy`,
+    where the run id is a hash of the model and texts. Re-running the same build
+    skips the chunks already on disk, so an interrupted build resumes. The
+    result is a normalised float32 memmap (`<run>/matrix.npy`) rather than an
+    in-memory concatenation.
+    """
+
+    def __init__(self, model, chunk_size=DEFAULT_CHUNK_SIZE, processes=None,
+                 batch_size=DEFAULT_BATCH_SIZE, checkpoint_dir=CHECKPOINT_DIR):
+        self.model = model
+        self.chunk_size = chunk_size
+        self.processes = processes or os.cpu_count() or 1
+        self.batch_size = batch_size
+        self.checkpoint_dir = checkpoint_dir
+        self.run_dir = None
+
+    def _run_dir(self, texts):
+        digest = hashlib.sha1(MODEL_NAME.encode('utf-8'))
+        for text in texts:
+            digest.update(text.encode('utf-8'))
+            digest.update(b"\0")
+        return os.path.join(self.checkpoint_dir, digest.hexdigest()[:16])
+
+    def __call__(self, texts):
+        self.run_dir = self._run_dir(texts)
+        os.makedirs(self.run_dir, exist_ok=True)
+        n_chunks = (len(texts) + self.chunk_size - 1) // self.chunk_size
+        chunk_paths = [os.path.join(self.run_dir, f"chunk_{i:05d}.npy") for i in range(n_chunks)]
+
+        pending = [i for i, path in enumerate(chunk_paths) if not os.path.exists(path)]
+        if len(pending) < n_chunks:
+            logger.info(f"Resuming build: {n_chunks - len(pending)}/{n_chunks} chunks already done.")
+
+        pool = self.model.start_multi_process_pool(['cpu'] * self.processes) if pending and self.processes > 1 else None
+        started = time.perf_counter()
+        encoded = 0
+        try:
+            for i in pending:
+                chunk = texts[i * self.chunk_size:(i + 1) * self.chunk_size]
+                chunk_started = time.perf_counter()
+                if pool is not None:
+                    vectors = self.model.encode(chunk, pool=pool, batch_size=self.batch_size)
+                else:
+                    vectors = self.model.encode(chunk, batch_size=self.batch_size)
+                _atomic_save_npy(chunk_paths[i], np.asarray(vectors, dtype=np.float32))
+
+                encoded += len(chunk)
+                elapsed = time.perf_counter() - chunk_started
+                logger.info(f"Chunk {i + 1}/{n_chunks}: {len(chunk)} texts, {len(chunk) / max(elapsed, 1e-9):.1f} texts/sec")
+        finally:
+            if pool is not None:
+                self.model.stop_multi_process_pool(pool)
+
+        if encoded:
+            elapsed = time.perf_counter() - started
+            logger.info(f"Encoded {encoded} texts in {elapsed:.1f}s ({encoded / max(elapsed, 1e-9):.1f} texts/sec, {self.processes} processes).")
+
+        if not chunk_paths:
+            return np.empty((0, 0), dtype=np.float32)
+        return self._assemble(chunk_paths, len(texts))
+
+    def _assemble(self, chunk_paths, n_rows):
+        """
+        Copies the checkpointed chunks into one float32 `.npy` memmap and
+        L2-normalises them in place, so only one chunk is held in memory.
+        """
+        dim = np.load(chunk_paths[0], mmap_mode='r').shape[1]
+        matrix = np.lib.format.open_memmap(
+            os.path.join(self.run_dir, "matrix.npy"), mode='w+', dtype=np.float32, shape=(n_rows, dim)
+        )
+        for i, path in enumerate(chunk_paths):
+            rows = matrix[i * self.chunk_size:(i + 1) * self.chunk_size]
+            rows[:] = np.load(path)
+            norms = np.linalg.norm(rows, axis=1, keepdims=True)
+            norms[norms == 0] = 1.0
+            rows /= norms
+        matrix.flush()
+        return matrix
+
+    def cleanup(self):
+        """Removes the checkpoints of the last run once its artifact is saved."""
+        if self.run_dir and os.path.isdir(self.run_dir):
+            shutil.rmtree(self.run_dir)
+
+
+def _atomic_save_npy(path, array):
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'wb') as f:
+        np.save(f, array)
+    os.replace(tmp_path, path)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build the project embedding artifact offline.")
+    parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE, help="Texts per checkpointed chunk")
+    parser.add_argument("--processes", type=int, default=None, help="Encoding processes (default: all CPU cores)")
+    parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE, help="Model batch size")
+    parser.add_argument("--fresh", action="store_true", help="Discard existing checkpoints first")
+    args = parser.parse_args()
+
+    if args.fresh and os.path.isdir(CHECKPOINT_DIR):
+        shutil.rmtree(CHECKPOINT_DIR)
+
+    projects = load_projects()
+    if projects.empty:
+        print("Error: No projects loaded.")
+        sys.exit(1)
+
+    matcher = ProjectMatcher()
+    if matcher.model is None:
+        print("Error: Embedding model could not be loaded.")
+        sys.exit(1)
+
+    encoder = ChunkedEncoder(matcher.model, args.chunk_size, args.processes, args.batch_size)
+    started = time.perf_counter()
+    matcher.encode_projects(projects, encode_fn=encoder)
+    encoder.cleanup()
+    print(f"Embeddings for {len(projects)} projects ready in {time.perf_counter() - started:.1f}s.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,60 @@
+import unittest
+import tempfile
+import os
+import numpy as np
+from unittest.mock import MagicMock
+from scripts.build_embeddings import ChunkedEncoder
+
+
+class TestChunkedEncoder(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.model = MagicMock()
+        self.model.encode.side_effect = lambda texts, **kwargs: np.eye(6, dtype=np.float32)[[len(texts[0])] * len(texts)] * 2
+        self.texts = ['a', 'bb', 'ccc', 'dddd', 'eeeee']
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def _encoder(self):
+        return ChunkedEncoder(self.model, chunk_size=2, processes=1, checkpoint_dir=self.tmp_dir.name)
+
+    def test_encodes_in_chunks(self):
+        matrix = self._encoder()(self.texts)
+        self.assertEqual(matrix.shape, (5, 6))
+        self.assertEqual(self.model.encode.call_count, 3)
+        self.assertEqual(matrix.argmax(axis=1).tolist(), [1, 1, 3, 3, 5])
+
+    def test_result_is_normalised_memmap(self):
+        matrix = self._encoder()(self.texts)
+        self.assertIsInstance(matrix, np.memmap)
+        self.assertEqual(matrix.dtype, np.float32)
+        np.testing.assert_allclose(np.linalg.norm(matrix, axis=1), 1.0)
+
+    def test_resumes_from_checkpoints(self):
+        encoder = self._encoder()
+        first = encoder(self.texts)
+
+        # Simulate an interrupted run that lost its last chunk
+        os.remove(os.path.join(encoder.run_dir, 'chunk_00002.npy'))
+        self.model.encode.reset_mock()
+        resumed = self._encoder()(self.texts)
+
+        self.model.encode.assert_called_once()
+        np.testing.assert_array_equal(first, resumed)
+
+    def test_multi_process_pool_is_stopped(self):
+        encoder = ChunkedEncoder(self.model, chunk_size=2, processes=2, checkpoint_dir=self.tmp_dir.name)
+        encoder(self.texts)
+        self.model.start_multi_process_pool.assert_called_once_with(['cpu', 'cpu'])
+        self.model.stop_multi_process_pool.assert_called_once()
+
+    def test_cleanup_removes_checkpoints(self):
+        encoder = self._encoder()
+        encoder(self.texts)
+        encoder.cleanup()
+        self.assertFalse(os.path.exists(encoder.run_dir))
+
+
+if __name__ == '__main__':
+    unittest.main()
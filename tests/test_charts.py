@@ -0,0 +1,67 @@
+import unittest
+import numpy as np
+import pandas as pd
+from components.charts import frame_fingerprint, ChartTimings, get_cluster_chart, get_chart_timings, cluster_chart, coordinator_chart
+from utils.olap_cube import DashboardCube
+
+
+def make_projects(version='v1'):
+    df = pd.DataFrame({
+        'id': ['1', '2', '3'],
+        'cluster': pd.Categorical(['C1', 'C2', 'C1'], categories=['C1', 'C2', 'C3']),
+        'totalCost': [1.0, 2.0, 3.0],
+    })
+    df.attrs['dataset_version'] = version
+    return df
+
+
+class TestChartKeys(unittest.TestCase):
+
+    def test_frame_fingerprint(self):
+        df = make_projects()
+        positions = np.array([0, 2])
+        self.assertEqual(frame_fingerprint(df, positions), frame_fingerprint(df, positions.astype(np.int32)))
+        self.assertNotEqual(frame_fingerprint(df, positions), frame_fingerprint(df, np.array([0, 1])))
+        self.assertNotEqual(frame_fingerprint(df, positions), frame_fingerprint(make_projects('v2'), positions))
+        # Without positions the ids are hashed
+        self.assertEqual(frame_fingerprint(df), frame_fingerprint(make_projects()))
+        self.assertNotEqual(frame_fingerprint(df), frame_fingerprint(df.iloc[:2]))
+
+    def test_charts_are_keyed_on_fingerprint(self):
+        get_cluster_chart.clear()
+        timings = get_chart_timings()
+        computed = timings.calls['compute']
+        df = make_projects()
+
+        first = get_cluster_chart('key', df)
+        get_cluster_chart('key', df.iloc[:1]) # Same key: served from cache
+        self.assertEqual(timings.calls['compute'], computed + 1)
+        # Filtered-out categories are not drawn
+        self.assertEqual(first.data['Cluster'].tolist(), ['C1', 'C2'])
+
+    def test_charts_from_cube_slice(self):
+        df = make_projects()
+        orgs = pd.DataFrame({
+            'projectID': ['1', '3', '3'], 'name': ['A', 'A', 'B'], 'country': ['Italy', 'Italy', 'Spain'],
+            'role': ['coordinator', 'coordinator', 'participant'], 'ecContribution': [1.0, 2.0, 3.0],
+        })
+        cube_slice = DashboardCube(df, orgs).slice({'selected_clusters': ['C1']})
+        self.assertEqual(cluster_chart(cube_slice.cluster_counts()).data['Count'].tolist(), [2])
+        self.assertEqual(coordinator_chart(cube_slice.top_coordinators()).data['Projects Managed'].tolist(), [2])
+
+    def test_timings_split_lookup_and_compute(self):
+        timings = ChartTimings()
+
+        def chart():
+            timings.record('compute', 0.5)
+            return 'chart'
+
+        self.assertEqual(timings.cached_call(chart), 'chart')
+        stats = timings.stats()
+        self.assertEqual(stats['compute'], {'seconds': 0.5, 'calls': 1})
+        self.assertEqual(stats['lookup']['calls'], 1)
+        self.assertLess(stats['lookup']['seconds'], 0.5)
+
+
+if __name__ == '__main__':
+    unittest.main()
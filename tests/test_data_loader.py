@@ -1,10 +1,44 @@
+import os
+import json
+import tempfile
 import unittest
 from unittest.mock import patch, MagicMock
 import pandas as pd
-from utils.data_loader import load_projects, load_orgs
+import utils.data_loader
+from utils.data_loader import load_projects, load_orgs, load_orgs_europe, get_optimized_dataframe, manifest_path, apply_schema
+from utils.data_loader import load_org_index, load_filter_engine, load_dashboard_cube, load_aggregate_index
+from utils.data_loader import CUBE_PROJECT_COLUMNS, CUBE_ORG_COLUMNS, AGGREGATE_ORG_COLUMNS, ORG_INDEX_COLUMNS
+from utils.parquet_source import ParquetSource
+from utils.incremental_aggregates import IncrementalAggregates
 
 class TestDataLoader(unittest.TestCase):
-    
+
+    def setUp(self):
+        # Keep the Parquet caches of mocked data out of data/processed
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        paths = {}
+        for name in ('projects', 'orgs'):
+            paths[name] = os.path.join(self.tmp_dir.name, f'{name}.csv')
+            with open(paths[name], 'w') as f:
+                f.write('placeholder')
+        self.patches = [
+            patch.object(utils.data_loader, 'PROJECTS_CSV', paths['projects']),
+            patch.object(utils.data_loader, 'ORGS_CSV', paths['orgs']),
+        ]
+        for p in self.patches:
+            p.start()
+        load_projects.clear()
+        load_orgs.clear()
+        load_orgs_europe.clear()
+
+    def tearDown(self):
+        for p in self.patches:
+            p.stop()
+        load_projects.clear()
+        load_orgs.clear()
+        load_orgs_europe.clear()
+        self.tmp_dir.cleanup()
+
     @patch('utils.data_loader.pd.read_csv')
     def test_load_projects(self, mock_read_csv):
         # Mock data
@@ -59,6 +93,184 @@ class TestDataLoader(unittest.TestCase):
         self.assertTrue('extra_col' not in result.columns)
         self.assertEqual(len(result), 1)
         self.assertTrue(pd.api.types.is_string_dtype(result['projectID']))
+        self.assertIsInstance(result['country'].dtype, pd.CategoricalDtype)
+        self.assertIsInstance(result['role'].dtype, pd.CategoricalDtype)
+        self.assertEqual(result['order'].dtype, 'int32')
+        self.assertEqual(result['ecContribution'].dtype, 'float64')
+
+    @patch('utils.data_loader.pd.read_csv')
+    def test_load_orgs_europe(self, mock_read_csv):
+        mock_read_csv.return_value = pd.DataFrame({
+            'name': ['Org A', 'Org B', 'Org C'],
+            'country': ['DE', 'US', 'EL'],
+            'projectID': [1, 2, 3],
+        })
+
+        result = load_orgs_europe()
+
+        self.assertEqual(result['name'].tolist(), ['Org A'])
+        self.assertEqual(result['country'].tolist(), ['Germany'])
+        self.assertIsInstance(result['country'].dtype, pd.CategoricalDtype)
+        # Shared, not recomputed, on the next rerun
+        self.assertIs(load_orgs_europe(), result)
+
+    def test_apply_schema(self):
+        df = pd.DataFrame({
+            'cluster': ['C1', 'C2', 'C1'],
+            'title': ['A', None, 'C'],
+            'order': [1.0, None, 3.0],
+            'totalCost': [1.5, 2.5, 3.5],
+        })
+        typed = apply_schema(df, {'cluster': 'category', 'title': 'text', 'order': 'int32', 'totalCost': 'float32', 'missing': 'text'})
+
+        self.assertIsInstance(typed['cluster'].dtype, pd.CategoricalDtype)
+        self.assertEqual(typed['title'].dtype.storage, 'pyarrow')
+        self.assertEqual(str(typed['order'].dtype), 'Int32') # Nullable, as it has gaps
+        self.assertEqual(typed['totalCost'].dtype, 'float32')
+        self.assertNotIn('missing', typed.columns)
+        self.assertNotIsInstance(df['cluster'].dtype, pd.CategoricalDtype) # Input untouched
+
+    def test_currency_round_trips_to_the_cent(self):
+        # Amounts above float32's ~7 significant digits, with comma decimals as in the source
+        costs = ['12345678,91', '987654321,07', '0,01', '16777217,99']
+        with open(utils.data_loader.PROJECTS_CSV, 'w') as f:
+            f.write('id|title|startDate|endDate|totalCost\n')
+            f.writelines(f'{i}|T{i}|2024-01-01|2025-01-01|{cost}\n' for i, cost in enumerate(costs))
+        with open(utils.data_loader.ORGS_CSV, 'w') as f:
+            f.write('name|projectID|country|ecContribution\n')
+            f.writelines(f'Org {i}|{i}|DE|{cost}\n' for i, cost in enumerate(costs))
+        expected = [int(cost.replace(',', '')) for cost in costs]
+
+        # Slow path (CSV) and fast path (Parquet cache) alike
+        for _ in range(2):
+            load_projects.clear()
+            load_orgs.clear()
+            projects, orgs = load_projects(), load_orgs()
+            self.assertEqual([round(v * 100) for v in projects['totalCost']], expected)
+            self.assertEqual([round(v * 100) for v in orgs['ecContribution']], expected)
+            self.assertEqual(round(projects['totalCost'].sum() * 100), sum(expected))
+
+    def test_derived_structures_read_only_their_columns(self):
+        with open(utils.data_loader.PROJECTS_CSV, 'w') as f:
+            f.write('id|acronym|title|objective|cluster|fundingScheme|startDate|endDate|totalCost\n')
+            f.write('1|A|T1|O1|C1|F1|2024-01-01|2025-01-01|10,5\n2|B|T2|O2|C2|F2|2024-02-01|2025-01-01|20\n')
+        with open(utils.data_loader.ORGS_CSV, 'w') as f:
+            f.write('name|activityType|city|country|role|organizationURL|projectID|order|ecContribution|contactForm\n')
+            f.write('Org A|PRC|Rome|IT|coordinator|u|1|1|5,25|c\nOrg B|HES|Oslo|NO|participant|u|2|1|7|c\nOrg C|HES|NYC|US|participant|u|2|2|1|c\n')
+        resources = (load_org_index, load_filter_engine, load_dashboard_cube, load_aggregate_index)
+        for resource in resources:
+            resource.clear()
+            self.addCleanup(resource.clear)
+        load_projects() # Build the Parquet caches
+        load_orgs()
+
+        read = ParquetSource.to_pandas
+        with patch.object(ParquetSource, 'to_pandas', autospec=True, side_effect=read) as to_pandas:
+            cube = load_dashboard_cube()
+            aggregate_index = load_aggregate_index() # Also builds the filter engine
+            org_index = load_org_index()
+        columns = [call.args[1] for call in to_pandas.call_args_list]
+
+        self.assertIn(CUBE_PROJECT_COLUMNS, columns)
+        self.assertIn(CUBE_ORG_COLUMNS, columns)
+        self.assertIn(AGGREGATE_ORG_COLUMNS, columns)
+        self.assertEqual(list(org_index.orgs.columns), ORG_INDEX_COLUMNS)
+        # The filter engine's full projects table comes from the load_projects cache
+        self.assertNotIn(None, columns)
+
+        self.assertEqual(cube.slice({}).totals(), {'projects': 2, 'funding': 30.5})
+        self.assertEqual(cube.slice({}).country_stats()['TotalFunding'].sum(), 12.25)
+        self.assertEqual(len(org_index.orgs), 2) # US org is not European
+        self.assertEqual(IncrementalAggregates(aggregate_index).update([0, 1]).totals(), {'projects': 2, 'funding': 30.5, 'orgs': 2})
+
+class TestParquetCache(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.csv_path = os.path.join(self.tmp_dir.name, 'data.csv')
+        self.parquet_path = os.path.join(self.tmp_dir.name, 'data.parquet')
+        self.write_csv('a|b\n1|x\n2|y\n')
+        self.loader = MagicMock(side_effect=lambda path: pd.read_csv(path, delimiter='|'))
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def write_csv(self, content):
+        with open(self.csv_path, 'w') as f:
+            f.write(content)
+
+    def load(self, cleaning_func=None):
+        return get_optimized_dataframe(self.csv_path, self.loader, cleaning_func)
+
+    def test_cache_hit_survives_timestamp_reset(self):
+        first = self.load()
+        # e.g. a git checkout or container rebuild touching the source
+        os.utime(self.csv_path, (0, 0))
+        second = self.load()
+
+        self.assertEqual(self.loader.call_count, 1)
+        pd.testing.assert_frame_equal(first, second)
+        self.assertEqual(first.attrs['dataset_version'], second.attrs['dataset_version'])
+
+    def test_content_change_invalidates_cache(self):
+        first = self.load()
+        # Same size and restored mtime: only the content hash can tell
+        stat = os.stat(self.csv_path)
+        self.write_csv('a|b\n1|x\n3|z\n')
+        os.utime(self.csv_path, (stat.st_atime, stat.st_mtime + 1))
+        second = self.load()
+
+        self.assertEqual(self.loader.call_count, 2)
+        self.assertEqual(second['a'].tolist(), [1, 3])
+        self.assertNotEqual(first.attrs['dataset_version'], second.attrs['dataset_version'])
+
+    def test_cleaning_change_invalidates_cache(self):
+        self.load(lambda df: df)
+        self.load(lambda df: df.assign(c=1))
+        self.assertEqual(self.loader.call_count, 2)
+
+    def test_manifest_records_source_and_schema(self):
+        self.load()
+        with open(manifest_path(self.parquet_path)) as f:
+            manifest = json.load(f)
+
+        self.assertEqual(manifest['rows'], 2)
+        self.assertEqual(manifest['schema'], {'a': 'int64', 'b': str(pd.Series(['x']).dtype)})
+        self.assertEqual(len(manifest['source_hash']), 40)
+        # Atomic writes leave no temp files behind
+        self.assertEqual(sorted(os.listdir(self.tmp_dir.name)), ['data.csv', 'data.parquet', 'data.parquet.manifest.json'])
+
+    def test_schema_is_persisted(self):
+        self.load_typed()
+        second = self.load_typed()
+
+        self.assertEqual(self.loader.call_count, 1)
+        self.assertIsInstance(second['b'].dtype, pd.CategoricalDtype)
+        with open(manifest_path(self.parquet_path)) as f:
+            memory = json.load(f)['memory']
+        self.assertGreater(memory['typed'], 0)
+
+        # A schema change invalidates the cache
+        get_optimized_dataframe(self.csv_path, self.loader, schema={'b': 'text'})
+        self.assertEqual(self.loader.call_count, 2)
+
+    def load_typed(self):
+        return get_optimized_dataframe(self.csv_path, self.loader, schema={'a': 'int32', 'b': 'category'})
+
+    def test_columns_and_filters(self):
+        # Slow path (building the cache) and fast path (reading it) agree
+        for _ in range(2):
+            df = get_optimized_dataframe(self.csv_path, self.loader, columns=['b'], filters=[('a', '>', 1)])
+            self.assertEqual(df['b'].tolist(), ['y'])
+            self.assertEqual(list(df.columns), ['b'])
+            self.assertIn('dataset_version', df.attrs)
+        self.assertEqual(self.loader.call_count, 1)
+
+    def test_missing_manifest_rebuilds(self):
+        self.load()
+        os.remove(manifest_path(self.parquet_path))
+        self.load()
+        self.assertEqual(self.loader.call_count, 2)
 
 if __name__ == '__main__':
     unittest.main()
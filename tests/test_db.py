@@ -1,7 +1,7 @@
 import unittest
 from unittest.mock import patch
 import os
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event
 from sqlalchemy.orm import sessionmaker
 from utils.models import Base
 # Import the functions we want to test
@@ -61,6 +61,38 @@ class TestDB(unittest.TestCase):
         watchlist = utils.db.get_watchlist(uid)
         self.assertNotIn('proj_1', watchlist)
 
+    def test_bulk_watchlist_update(self):
+        uid = utils.db.create_user("bulk", "pass")
+        utils.db.add_to_watchlist('proj_1', uid)
+
+        # Adds (with duplicates and an existing id) and removes in one transaction
+        self.assertTrue(utils.db.update_watchlist(['proj_1', 'proj_2', 'proj_3', 'proj_2'], [], uid))
+        self.assertEqual(sorted(utils.db.get_watchlist(uid)), ['proj_1', 'proj_2', 'proj_3'])
+
+        self.assertTrue(utils.db.update_watchlist(['proj_4'], ['proj_1', 'proj_3', 'unknown'], uid))
+        self.assertEqual(sorted(utils.db.get_watchlist(uid)), ['proj_2', 'proj_4'])
+
+        # Other users' favorites are untouched
+        other = utils.db.create_user("other", "pass")
+        utils.db.update_watchlist(['proj_2'], [], other)
+        utils.db.update_watchlist([], ['proj_2'], uid)
+        self.assertEqual(utils.db.get_watchlist(other), ['proj_2'])
+
+    def test_bulk_watchlist_single_round_trip(self):
+        uid = utils.db.create_user("roundtrip", "pass")
+        statements = []
+
+        def record(conn, cursor, statement, *args):
+            statements.append(statement)
+
+        event.listen(self.engine, 'before_cursor_execute', record)
+        utils.db.update_watchlist([f'p{i}' for i in range(50)], ['x', 'y'], uid)
+        event.remove(self.engine, 'before_cursor_execute', record)
+        writes = [s for s in statements if s.lstrip().upper().startswith(('INSERT', 'DELETE'))]
+        self.assertEqual(len(writes), 2)
+        self.assertIn('ON CONFLICT', writes[0].upper())
+        self.assertEqual(len(utils.db.get_watchlist(uid)), 50)
+
     def test_saved_search_flow(self):
         uid = utils.db.create_user("searcher", "pass")
         
@@ -0,0 +1,80 @@
+import os
+import json
+import numpy as np
+import pytest
+from unittest.mock import patch
+from utils.embedding_store import EmbeddingStore
+from utils.vector_index import FlatIndex, as_float_matrix
+
+@pytest.fixture
+def matrix():
+    rng = np.random.default_rng(1)
+    return as_float_matrix(rng.normal(size=(200, 32)))
+
+@pytest.mark.parametrize('dtype', ['float32', 'float16', 'int8'])
+def test_round_trip_is_memory_mapped(matrix, tmp_path, dtype):
+    ids = [str(i) for i in range(len(matrix))]
+    path = str(tmp_path / 'embeddings.npy')
+    EmbeddingStore.from_float(matrix, ids, dtype=dtype, meta={'model': 'm'}).save(path)
+
+    store = EmbeddingStore.load(path)
+    assert isinstance(store.matrix, np.memmap)
+    assert store.dtype == dtype
+    assert store.ids == ids
+    assert store.meta['model'] == 'm'
+    np.testing.assert_allclose(store.dequantize(), matrix, atol=0.02)
+
+def test_int8_scores_close_to_exact(matrix):
+    store = EmbeddingStore.from_float(matrix, range(len(matrix)), dtype='int8')
+    query = matrix[5]
+    np.testing.assert_allclose(store.scores(query), matrix @ query, atol=0.05)
+    np.testing.assert_allclose(store.rescore(query, np.array([5])), [1.0], atol=0.01)
+
+def test_float16_scores_across_widened_blocks(matrix):
+    store = EmbeddingStore.from_float(matrix, range(len(matrix)), dtype='float16')
+    query = matrix[7]
+    expected = store.matrix.astype(np.float32) @ query
+    positions = np.array([199, 3, 120, 64])
+    with patch('utils.embedding_store.WIDEN_BLOCK_ROWS', 64):
+        np.testing.assert_allclose(store.scores(query), expected, rtol=1e-6)
+        np.testing.assert_allclose(store.scores(query, positions), expected[positions], rtol=1e-6)
+
+def test_quantized_search_rescoring_matches_float(matrix):
+    store = EmbeddingStore.from_float(matrix, range(len(matrix)), dtype='int8')
+    query = matrix[17]
+    positions, scores = FlatIndex(store).search(query, 5)
+    exact_positions, _ = FlatIndex(matrix).search(query, 5)
+    assert positions[0] == 17
+    assert set(positions.tolist()) == set(exact_positions.tolist())
+
+def test_load_rejects_mismatched_sidecar(matrix, tmp_path):
+    path = str(tmp_path / 'embeddings.npy')
+    EmbeddingStore.from_float(matrix, range(len(matrix))).save(path)
+    with open(tmp_path / 'embeddings.json') as f:
+        version = json.load(f)['version']
+    np.save(EmbeddingStore.paths(path, version)['matrix'], matrix[:10].astype(np.float16))
+    assert EmbeddingStore.load(path) is None
+
+def test_save_never_replaces_files_a_sidecar_names(matrix, tmp_path):
+    path = str(tmp_path / 'embeddings.npy')
+    ids = [str(i) for i in range(len(matrix))]
+    EmbeddingStore.from_float(matrix, ids, dtype='int8').save(path)
+    old = EmbeddingStore.load(path)
+    old_files = {name: open(tmp_path / name, 'rb').read() for name in os.listdir(tmp_path) if name.endswith('.npy')}
+
+    # A same-size re-encode with other ids: the files named by the old sidecar are untouched
+    EmbeddingStore.from_float(matrix[::-1], ids[::-1], dtype='int8').save(path)
+    for name, content in old_files.items():
+        assert open(tmp_path / name, 'rb').read() == content
+    new = EmbeddingStore.load(path)
+    assert new.ids == ids[::-1]
+    np.testing.assert_allclose(new.dequantize()[0], matrix[-1], atol=0.02)
+    np.testing.assert_allclose(old.dequantize()[0], matrix[0], atol=0.02)
+
+    # Only the current and the previous version are kept
+    EmbeddingStore.from_float(matrix, ids).save(path)
+    assert set(old_files).isdisjoint(os.listdir(tmp_path))
+    assert EmbeddingStore.exists(path)
+
+def test_missing_store(tmp_path):
+    assert EmbeddingStore.load(str(tmp_path / 'nothing.npy')) is None
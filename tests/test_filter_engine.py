@@ -0,0 +1,183 @@
+import datetime
+import tempfile
+import unittest
+from unittest.mock import MagicMock, patch
+import numpy as np
+import pandas as pd
+from utils.filter_engine import FilterEngine, filter_signature, get_filter_cache
+
+
+def make_projects():
+    return pd.DataFrame({
+        'id': ['101', '102', '203', '204', '305'],
+        'cluster': pd.Categorical(['C1', 'C2', 'C1', 'C3', None]),
+        'fundingScheme': ['RIA', 'IA', 'RIA', 'RIA', 'IA'],
+        'startDate': pd.to_datetime(['2024-01-01', '2025-01-01', None, '2026-01-01', '2025-06-01']),
+        'endDate': pd.to_datetime(['2026-01-01', '2027-01-01', '2028-01-01', None, '2025-12-31']),
+    })
+
+
+def reference(projects, filters, watchlist_ids=None):
+    """The pandas filter chain the engine replaces."""
+    df = projects
+    if filters.get('start_date'):
+        df = df[df['startDate'] >= pd.to_datetime(filters['start_date'])]
+    if filters.get('end_date'):
+        df = df[df['endDate'] <= pd.to_datetime(filters['end_date'])]
+    if filters.get('selected_clusters'):
+        df = df[df['cluster'].isin(filters['selected_clusters'])]
+    if filters.get('selected_funding_schemes'):
+        df = df[df['fundingScheme'].isin(filters['selected_funding_schemes'])]
+    if filters.get('search_id'):
+        df = df[df['id'].str.contains(filters['search_id'], case=False, na=False)]
+    if watchlist_ids is not None:
+        df = df[df['id'].isin(watchlist_ids)]
+    return df
+
+
+class TestFilterEngine(unittest.TestCase):
+    def setUp(self):
+        self.projects = make_projects()
+        self.engine = FilterEngine(self.projects)
+
+    def assert_matches_reference(self, filters, watchlist_ids=None):
+        result = self.engine.take(self.engine.positions(filters, watchlist_ids))
+        pd.testing.assert_frame_equal(result, reference(self.projects, filters, watchlist_ids))
+
+    def test_no_filters(self):
+        self.assertEqual(self.engine.positions({}).tolist(), [0, 1, 2, 3, 4])
+
+    def test_date_bounds(self):
+        self.assert_matches_reference({'start_date': datetime.date(2025, 1, 1)})
+        self.assert_matches_reference({'end_date': datetime.date(2026, 1, 1)})
+        self.assert_matches_reference({'start_date': datetime.date(2025, 1, 1), 'end_date': datetime.date(2027, 1, 1)})
+
+    def test_facets(self):
+        self.assert_matches_reference({'selected_clusters': ['C1', 'C3']})
+        self.assert_matches_reference({'selected_clusters': ['C1'], 'selected_funding_schemes': ['RIA']})
+        self.assert_matches_reference({'selected_clusters': ['Unknown']})
+
+    def test_id_and_watchlist(self):
+        self.assert_matches_reference({'search_id': '20'})
+        self.assert_matches_reference({'selected_funding_schemes': ['RIA']}, watchlist_ids=['101', '204', '999'])
+        self.assert_matches_reference({}, watchlist_ids=[])
+
+    def test_positions_are_ascending(self):
+        positions = self.engine.positions({'selected_funding_schemes': ['IA', 'RIA']})
+        self.assertTrue(np.all(np.diff(positions) > 0))
+
+
+class TestFilterCache(unittest.TestCase):
+    def setUp(self):
+        get_filter_cache().clear()
+        self.projects = make_projects()
+        self.projects.attrs['dataset_version'] = 'v1'
+
+    def tearDown(self):
+        get_filter_cache().clear()
+
+    def make_matcher(self):
+        matcher = MagicMock(version='emb', semantic_ready=True)
+        matcher.lexical.version = 'lex'
+        # Ranks the candidates by descending id
+        matcher.search.side_effect = lambda query, df, top_k, mode: (
+            df.sort_values('id', ascending=False).head(top_k).assign(relevance_score=1.0)
+        )
+        return matcher
+
+    def test_signature_is_canonical(self):
+        a = {'selected_clusters': ['C1', 'C2'], 'start_date': datetime.date(2025, 1, 1),
+             'search_objective': 'Green  Energy', 'page': 'Dashboard'}
+        b = {'selected_clusters': ['C2', 'C1'], 'start_date': pd.Timestamp('2025-01-01'),
+             'search_objective': 'green energy', 'search_mode': 'semantic'}
+        self.assertEqual(filter_signature(a), filter_signature(b))
+        self.assertNotEqual(filter_signature(a), filter_signature(a, watchlist_ids=[]))
+        self.assertNotEqual(filter_signature(a), filter_signature(dict(a, search_mode='keyword')))
+
+    def test_identical_searches_share_results(self):
+        matcher = self.make_matcher()
+        filters = {'selected_funding_schemes': ['RIA'], 'search_objective': 'energy'}
+
+        # Two sessions, each with its own engine over the same dataset version
+        first = FilterEngine(self.projects).run(filters, matcher=matcher, top_k=2)
+        second = FilterEngine(self.projects).run(dict(filters, search_objective='ENERGY'), matcher=matcher, top_k=2)
+
+        self.assertEqual(matcher.search.call_count, 1)
+        self.assertIs(first, second)
+        positions, scores = first
+        self.assertEqual(positions.tolist(), [3, 2])
+        self.assertEqual(scores.tolist(), [1.0, 1.0])
+        stats = get_filter_cache().stats()
+        self.assertEqual((stats['hits'], stats['misses']), (1, 1))
+
+    def test_matcher_state_is_part_of_the_key(self):
+        matcher = self.make_matcher()
+        engine = FilterEngine(self.projects)
+        filters = {'search_objective': 'energy'}
+
+        engine.run(filters, matcher=matcher, top_k=2)
+        matcher.version = 'emb2' # A new embedding build was swapped in
+        engine.run(filters, matcher=matcher, top_k=2)
+        self.assertEqual(matcher.search.call_count, 2)
+
+    def test_without_query(self):
+        positions, scores = FilterEngine(self.projects).run({'selected_clusters': ['C1']})
+        self.assertEqual(positions.tolist(), [0, 2])
+        self.assertIsNone(scores)
+
+class TestFilteredSemanticSearch(unittest.TestCase):
+    """Favourites / id filters run before ranking, so the matcher gets tiny candidate sets."""
+
+    def setUp(self):
+        import utils.matcher
+        from utils.matcher import ProjectMatcher, load_model
+        from utils.query_cache import get_query_cache
+        self.tmp = tempfile.TemporaryDirectory()
+        self.patchers = [patch.object(utils.matcher, name, f"{self.tmp.name}/{file}") for name, file in [
+            ('EMBEDDINGS_FILE', 'embeddings.npy'), ('INDEX_FILE', 'vector_index.npz'),
+            ('KNN_GRAPH_FILE', 'knn_graph.npz'), ('LEXICAL_INDEX_FILE', 'bm25_index.npz'),
+        ]] + [patch.object(utils.matcher, 'INDEX_TYPE', 'ivf')]
+        for patcher in self.patchers:
+            patcher.start()
+        for cache in (load_model, get_query_cache, get_filter_cache):
+            cache.clear()
+
+        rng = np.random.default_rng(0)
+        n = 6000
+        self.projects = pd.DataFrame({
+            'id': [f'P{i}' for i in range(n)],
+            'title': [f'Project {i}' for i in range(n)], 'objective': [''] * n, 'topics': [''] * n,
+            'cluster': pd.Categorical(rng.choice(['C1', 'C2'], n)),
+        })
+        self.projects.attrs['dataset_version'] = 'v-ivf'
+        self.query_vec = rng.normal(size=16)
+        model = MagicMock()
+        model.encode.side_effect = lambda texts, **kwargs: (
+            self.query_vec if isinstance(texts, str) else rng.normal(size=(len(texts), 16)))
+        with patch('utils.matcher.SentenceTransformer', return_value=model):
+            self.matcher = ProjectMatcher()
+            self.matcher.encode_projects(self.projects)
+        self.assertEqual(self.matcher.index.kind, 'ivf')
+
+    def tearDown(self):
+        for patcher in self.patchers:
+            patcher.stop()
+        get_filter_cache().clear()
+        self.tmp.cleanup()
+
+    def test_watchlist_and_query(self):
+        engine = FilterEngine(self.projects)
+        watchlist = list(np.random.default_rng(1).choice(self.projects['id'], 40, replace=False))
+        filters = {'search_objective': 'query', 'search_mode': 'semantic', 'selected_clusters': ['C1']}
+
+        positions, scores = engine.run(filters, watchlist, self.matcher, top_k=100)
+
+        # Every favourite in the filtered set is ranked, in exact score order
+        expected = reference(self.projects, filters, watchlist)
+        vectors = self.matcher.embeddings.dequantize(self.matcher._id_index.get_indexer(expected['id']))
+        order = np.argsort(-(vectors @ (self.query_vec / np.linalg.norm(self.query_vec))), kind='stable')
+        self.assertEqual(engine.ids[positions].tolist(), expected['id'].iloc[order].tolist())
+        self.assertEqual(len(scores), len(expected))
+
+if __name__ == '__main__':
+    unittest.main()
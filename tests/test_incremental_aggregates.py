@@ -0,0 +1,161 @@
+import unittest
+from unittest.mock import patch
+import numpy as np
+import pandas as pd
+from utils.org_index import OrgIndex
+from utils.filter_engine import FilterEngine
+from utils.incremental_aggregates import AggregateIndex, IncrementalAggregates, get_session_aggregates
+
+
+class TestIncrementalAggregates(unittest.TestCase):
+    def setUp(self):
+        rng = np.random.default_rng(1)
+        n, m = 200, 700
+        self.projects = pd.DataFrame({
+            'id': [f'P{i}' for i in range(n)],
+            'cluster': pd.Categorical(rng.choice(['Health', 'Climate', 'Digital', None], n)),
+            'fundingScheme': rng.choice(['RIA', 'IA', 'CSA'], n),
+            'totalCost': rng.random(n) * 1e6,
+        })
+        self.orgs = pd.DataFrame({
+            'projectID': rng.choice(self.projects['id'], m),
+            'name': rng.choice([f'Org {i}' for i in range(60)] + [None], m),
+            'country': pd.Categorical(rng.choice(['Germany', 'France', 'Italy'], m)),
+            'ecContribution': rng.random(m) * 1e5,
+        })
+        self.index = AggregateIndex(self.projects, OrgIndex(self.orgs), version='v1')
+        self.rng = rng
+
+    def assert_matches_rows(self, aggregates, positions):
+        projects = self.projects.iloc[np.unique(positions)]
+        orgs = self.orgs[self.orgs['projectID'].isin(projects['id'])]
+        totals = aggregates.totals()
+        self.assertEqual(totals['projects'], len(projects))
+        self.assertAlmostEqual(totals['funding'], projects['totalCost'].sum(), places=2)
+        self.assertEqual(totals['orgs'], orgs['name'].nunique())
+
+        counts = projects['cluster'].value_counts()
+        counts = counts[counts > 0]
+        self.assertEqual(aggregates.cluster_counts().sort_index().to_dict(), counts.sort_index().to_dict())
+        funding = projects.groupby('cluster', observed=True)['totalCost'].sum()
+        np.testing.assert_allclose(aggregates.cluster_funding().loc[funding.index], funding)
+
+        stats = aggregates.country_stats().set_index('country')
+        expected = orgs.groupby('country', observed=True)['ecContribution'].agg(['sum', 'count'])
+        expected = expected[expected['count'] > 0]
+        np.testing.assert_allclose(stats.loc[expected.index, 'TotalFunding'], expected['sum'])
+        np.testing.assert_array_equal(stats.loc[expected.index, 'ProjectCount'], expected['count'])
+        self.assertEqual(len(stats), len(expected))
+
+    def test_sequence_of_updates_matches_rows(self):
+        aggregates = IncrementalAggregates(self.index)
+        positions = np.arange(len(self.projects))
+        for _ in range(20):
+            # Narrow or widen by a few rows, sometimes jump to an unrelated set
+            if self.rng.random() < 0.2:
+                positions = self.rng.choice(len(self.projects), self.rng.integers(0, 150), replace=False)
+            else:
+                toggled = self.rng.choice(len(self.projects), 10, replace=False)
+                positions = np.setxor1d(positions, toggled)
+            aggregates.update(self.rng.permutation(positions))
+            self.assert_matches_rows(aggregates, positions)
+
+    def test_update_applies_only_the_delta(self):
+        aggregates = IncrementalAggregates(self.index).update(np.arange(100))
+        with patch.object(self.index, 'org_rows', wraps=self.index.org_rows) as org_rows:
+            aggregates.update(np.arange(105))
+        self.assertEqual(org_rows.call_count, 1)
+        np.testing.assert_array_equal(org_rows.call_args[0][0], np.arange(100, 105))
+        self.assert_matches_rows(aggregates, np.arange(105))
+
+    def test_facet_changes_use_bitmaps(self):
+        engine = FilterEngine(self.projects)
+        index = AggregateIndex(self.projects, OrgIndex(self.orgs), version='v1', engine=engine)
+        aggregates = IncrementalAggregates(index)
+        steps = [
+            {},
+            {'selected_clusters': ['Health']},
+            {'selected_clusters': ['Health', 'Digital']},
+            {'selected_clusters': ['Digital', 'Climate']},
+            {'selected_clusters': ['Digital', 'Climate'], 'selected_funding_schemes': ['RIA']},
+            {'selected_clusters': [], 'selected_funding_schemes': ['RIA']},
+            {'selected_clusters': [], 'selected_funding_schemes': []},
+        ]
+        aggregates.update(engine.positions(steps[0]), steps[0])
+        for filters in steps[1:]:
+            positions = engine.positions(filters)
+            with patch('utils.incremental_aggregates.np.setdiff1d', wraps=np.setdiff1d) as setdiff:
+                aggregates.update(positions, filters)
+            self.assertEqual(setdiff.call_count, 0, filters)
+            self.assert_matches_rows(aggregates, positions)
+
+    def test_other_changes_fall_back_to_set_difference(self):
+        engine = FilterEngine(self.projects)
+        index = AggregateIndex(self.projects, OrgIndex(self.orgs), version='v1', engine=engine)
+        aggregates = IncrementalAggregates(index).update(engine.positions({}), {})
+        cases = [
+            ({'selected_clusters': ['Health'], 'search_id': 'P1'}, None, 2), # Two filters changed
+            ({'selected_clusters': ['Health', 'Digital'], 'search_id': 'P1'}, ['P1', 'P12', 'P150'], 2), # Watchlist turned on
+            ({'selected_clusters': ['Health'], 'search_id': 'P1'}, ['P1', 'P12', 'P150'], 0), # One facet changed
+        ]
+        for filters, watchlist_ids, setdiff_calls in cases:
+            positions = engine.positions(filters, watchlist_ids)
+            with patch('utils.incremental_aggregates.np.setdiff1d', wraps=np.setdiff1d) as setdiff:
+                aggregates.update(positions, filters, watchlist_ids)
+            self.assertEqual(setdiff.call_count, setdiff_calls, filters)
+            self.assert_matches_rows(aggregates, positions)
+
+        # Ranked results of a query are not the plain filter mask
+        filters = {'selected_clusters': ['Health', 'Climate'], 'search_id': 'P1', 'search_objective': 'solar'}
+        positions = engine.positions(filters, ['P1', 'P12', 'P150'])[::-1]
+        with patch('utils.incremental_aggregates.np.setdiff1d', wraps=np.setdiff1d) as setdiff:
+            aggregates.update(positions, filters, ['P1', 'P12', 'P150'])
+        self.assertEqual(setdiff.call_count, 2)
+        self.assert_matches_rows(aggregates, positions)
+
+    def test_unchanged_rerun_is_an_empty_delta(self):
+        engine = FilterEngine(self.projects)
+        index = AggregateIndex(self.projects, OrgIndex(self.orgs), version='v1', engine=engine)
+        filters = {'selected_clusters': ['Health'], 'search_id': 'P1'}
+        aggregates = IncrementalAggregates(index).update(engine.positions(filters, ['P1', 'P12']), filters, ['P12', 'P1'])
+        with patch('utils.incremental_aggregates.np.unique', wraps=np.unique) as unique, \
+                patch('utils.incremental_aggregates.np.setdiff1d', wraps=np.setdiff1d) as setdiff, \
+                patch.object(index, 'org_rows', wraps=index.org_rows) as org_rows:
+            # Same filters in another order and a re-fetched watchlist
+            aggregates.update(engine.positions(filters, ['P1', 'P12']), dict(reversed(list(filters.items()))), ['P1', 'P12'])
+        self.assertEqual((unique.call_count, setdiff.call_count, org_rows.call_count), (0, 0, 0))
+        self.assert_matches_rows(aggregates, engine.positions(filters, ['P1', 'P12']))
+
+        # A changed watchlist is not a rerun
+        positions = engine.positions(filters, ['P1'])
+        aggregates.update(positions, filters, ['P1'])
+        self.assert_matches_rows(aggregates, positions)
+
+    def test_query_rerun_needs_the_same_result(self):
+        filters = {'search_objective': 'solar'}
+        ranked = np.arange(40)[::-1]
+        aggregates = IncrementalAggregates(self.index).update(ranked, filters)
+        with patch('utils.incremental_aggregates.np.setdiff1d', wraps=np.setdiff1d) as setdiff:
+            aggregates.update(ranked, filters)
+        self.assertEqual(setdiff.call_count, 0)
+
+        # Same query, new ranking (e.g. semantic search became ready)
+        reranked = np.arange(10, 60)
+        aggregates.update(reranked, filters)
+        self.assert_matches_rows(aggregates, reranked)
+
+    def test_empty_set(self):
+        aggregates = IncrementalAggregates(self.index).update(np.arange(50)).update([])
+        self.assertEqual(aggregates.totals(), {'projects': 0, 'funding': 0.0, 'orgs': 0})
+        self.assertTrue(aggregates.country_stats().empty)
+
+    def test_session_aggregates_reset_on_new_dataset(self):
+        with patch('utils.incremental_aggregates.st.session_state', {}):
+            first = get_session_aggregates(self.index)
+            self.assertIs(get_session_aggregates(self.index), first)
+            other = AggregateIndex(self.projects, OrgIndex(self.orgs), version='v2')
+            self.assertIsNot(get_session_aggregates(other), first)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,52 @@
+import numpy as np
+import pytest
+from utils.knn_graph import KnnGraph
+from utils.vector_index import as_float_matrix
+
+@pytest.fixture
+def matrix():
+    rng = np.random.default_rng(2)
+    return as_float_matrix(rng.normal(size=(300, 16)))
+
+def brute_force(matrix, position, k):
+    scores = matrix @ matrix[position]
+    scores[position] = -np.inf
+    return np.argsort(-scores)[:k].tolist()
+
+def test_build_matches_brute_force(matrix):
+    graph = KnnGraph.build(matrix, range(len(matrix)), n_neighbours=5, block_rows=64)
+    for position in [0, 100, 299]:
+        neighbours, scores = graph.lookup(position)
+        assert neighbours.tolist() == brute_force(matrix, position, 5)
+        assert np.all(np.diff(scores) <= 0)
+
+def test_small_corpus_is_padded():
+    graph = KnnGraph.build(as_float_matrix(np.eye(3)), ['a', 'b', 'c'], n_neighbours=5)
+    neighbours, _ = graph.lookup(0)
+    assert sorted(neighbours.tolist()) == [1, 2]
+
+def test_incremental_update_matches_rebuild(matrix):
+    ids = [str(i) for i in range(len(matrix))]
+    graph = KnnGraph.build(matrix, ids, n_neighbours=8)
+
+    # Delete the first 20 projects, edit 10, add 15 new ones
+    rng = np.random.default_rng(3)
+    new_matrix = matrix[20:].copy()
+    new_matrix[:10] = as_float_matrix(rng.normal(size=(10, 16)))
+    new_matrix = np.vstack([new_matrix, as_float_matrix(rng.normal(size=(15, 16)))])
+    new_ids = ids[20:] + [f"new{i}" for i in range(15)]
+    changed = list(range(10)) + list(range(len(new_ids) - 15, len(new_ids)))
+
+    updated = graph.update(new_matrix, new_ids, changed, block_rows=50)
+    rebuilt = KnnGraph.build(new_matrix, new_ids, n_neighbours=8)
+
+    np.testing.assert_array_equal(updated.neighbours, rebuilt.neighbours)
+    np.testing.assert_allclose(updated.scores, rebuilt.scores, rtol=1e-5)
+
+def test_round_trip(matrix, tmp_path):
+    path = str(tmp_path / 'graph.npz')
+    ids = [str(i) for i in range(len(matrix))]
+    KnnGraph.build(matrix, ids, n_neighbours=4).save(path)
+    loaded = KnnGraph.load(path)
+    assert loaded.ids == ids
+    assert loaded.n_neighbours == 4
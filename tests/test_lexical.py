@@ -0,0 +1,63 @@
+import unittest
+import numpy as np
+import pandas as pd
+from utils.lexical import BM25Index, build_documents, reciprocal_rank_fusion, tokenize
+
+class TestLexical(unittest.TestCase):
+
+    def setUp(self):
+        self.projects = pd.DataFrame({
+            'id': ['1', '2', '3'],
+            'acronym': ['M-CARE', 'SOLARIS', None],
+            'title': ['Mobile care for elderly', 'Solar panels', 'Wind energy'],
+            'topics': ['HORIZON-HLTH-2024-DISEASE-13-01', 'HORIZON-CL5-2023-D3-01', 'HORIZON-CL5-2023-D3-02'],
+            'objective': ['Care at home', 'Solar energy research', 'Offshore wind and energy storage']
+        })
+        self.index = BM25Index.build(self.projects['id'].tolist(), build_documents(self.projects))
+
+    def test_tokenize_keeps_codes(self):
+        tokens = tokenize("M-CARE targets HORIZON-HLTH-2024")
+        self.assertIn('m-care', tokens)
+        self.assertIn('care', tokens)
+        self.assertIn('horizon-hlth-2024', tokens)
+        self.assertIn('hlth', tokens)
+
+    def test_topic_code_query(self):
+        positions, scores = self.index.search("HORIZON-HLTH-2024-DISEASE-13-01")
+        self.assertEqual(positions[0], 0)
+        self.assertTrue(np.all(np.diff(scores) <= 0))
+
+    def test_ranking_and_candidates(self):
+        positions, _ = self.index.search("energy")
+        self.assertEqual(sorted(positions.tolist()), [1, 2])
+
+        candidates = np.array([True, True, False])
+        positions, _ = self.index.search("energy", candidates=candidates)
+        self.assertEqual(positions.tolist(), [1])
+
+        positions, _ = self.index.search("unknownword")
+        self.assertEqual(len(positions), 0)
+
+    def test_matches_code(self):
+        self.assertTrue(self.index.matches_code("M-CARE"))
+        self.assertTrue(self.index.matches_code(" horizon-cl5-2023-d3-01 "))
+        self.assertFalse(self.index.matches_code("solar"))
+        self.assertFalse(self.index.matches_code("X-UNKNOWN"))
+
+    def test_round_trip(self):
+        import tempfile, os
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'bm25.npz')
+            self.index.save(path)
+            loaded = BM25Index.load(path)
+        self.assertEqual(loaded.ids, self.index.ids)
+        self.assertEqual(loaded.version, self.index.version)
+        np.testing.assert_array_equal(loaded.search("wind")[0], self.index.search("wind")[0])
+
+    def test_reciprocal_rank_fusion(self):
+        positions, scores = reciprocal_rank_fusion([[1, 2, 3], [3, 1]])
+        self.assertEqual(positions.tolist(), [1, 3, 2])
+        self.assertEqual(reciprocal_rank_fusion([[1, 2, 3], [3, 1]], k=1)[0].tolist(), [1])
+
+if __name__ == '__main__':
+    unittest.main()
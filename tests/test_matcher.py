@@ -2,7 +2,23 @@ import pytest
 import pandas as pd
 import numpy as np
 from unittest.mock import MagicMock, patch
-from utils.matcher import ProjectMatcher
+import utils.matcher
+from utils.matcher import ProjectMatcher, load_model
+from utils.query_cache import get_query_cache
+from utils.vector_index import FlatIndex
+
+@pytest.fixture(autouse=True)
+def isolated_matcher(tmp_path, monkeypatch):
+    """Keeps each test's model mock and on-disk artifacts separate."""
+    load_model.clear()
+    get_query_cache.clear()
+    monkeypatch.setattr(utils.matcher, 'EMBEDDINGS_FILE', str(tmp_path / 'embeddings.npy'))
+    monkeypatch.setattr(utils.matcher, 'INDEX_FILE', str(tmp_path / 'vector_index.npz'))
+    monkeypatch.setattr(utils.matcher, 'KNN_GRAPH_FILE', str(tmp_path / 'knn_graph.npz'))
+    monkeypatch.setattr(utils.matcher, 'LEXICAL_INDEX_FILE', str(tmp_path / 'bm25_index.npz'))
+    yield
+    load_model.clear()
+    get_query_cache.clear()
 
 # Mock data
 @pytest.fixture
@@ -70,23 +86,14 @@ def test_search(mock_sentence_transformer, sample_projects):
     matcher.encode_projects(sample_projects)
 
     # Search
-    # We need to mock util.cos_sim or rely on the real one?
-    # Real util.cos_sim might fail if we pass numpy arrays instead of tensors if sentence-transformers is not installed/mocked perfectly.
-    # But utils.matcher imports util. 
-    # Let's rely on the fact that we can mock `util.cos_sim` too for pure unit isolation.
-    
-    with patch('utils.matcher.util') as mock_util:
-        # Mock cos_sim to return high score for proj 1 & 2, low for 3
-        # Return shape (1, 3)
-        mock_util.cos_sim.return_value.cpu.return_value.numpy.return_value = np.array([[0.99, 0.85, 0.01]])
-        
-        results = matcher.search("Solar", sample_projects)
-        
-        assert not results.empty
-        assert 'relevance_score' in results.columns
-        # Project 1 should be top
-        assert results.iloc[0]['id'] == '1'
-        assert results.iloc[0]['relevance_score'] == 0.99
+    results = matcher.search("Solar", sample_projects)
+
+    assert not results.empty
+    assert 'relevance_score' in results.columns
+    # Project 1 should be top
+    assert results.iloc[0]['id'] == '1'
+    assert results.iloc[0]['relevance_score'] == pytest.approx(1.0, abs=1e-3)
+    assert results.iloc[-1]['id'] == '3'
 
 @patch('utils.matcher.SentenceTransformer')
 def test_get_similar_projects(mock_sentence_transformer, sample_projects):
@@ -104,17 +111,275 @@ def test_get_similar_projects(mock_sentence_transformer, sample_projects):
     matcher = ProjectMatcher()
     matcher.encode_projects(sample_projects)
 
-    with patch('utils.matcher.util') as mock_util:
-        # Mock similarity for Project 1 (Target) against [1, 2, 3]
-        # It should be [1.0, 0.85, 0.01]
-        mock_util.cos_sim.return_value.cpu.return_value.numpy.return_value = np.array([1.0, 0.85, 0.01])
-
-        # Get similar to Project 1
-        recommendations = matcher.get_similar_projects('1', sample_projects, top_k=2)
-        
-        # Should exclude itself, so top match should be Project 2
-        assert len(recommendations) == 2 # We asked for top 2, but only 2 others exist. Wait, filter out self -> 2 left.
-        assert recommendations.iloc[0]['id'] == '2'
-        assert recommendations.iloc[0]['similarity_score'] == 0.85
-        # Ensure ID 1 is not in results
-        assert '1' not in recommendations['id'].values
+    # Get similar to Project 1
+    recommendations = matcher.get_similar_projects('1', sample_projects, top_k=2)
+
+    # Should exclude itself, so top match should be Project 2
+    assert len(recommendations) == 2
+    assert recommendations.iloc[0]['id'] == '2'
+    assert recommendations.iloc[0]['similarity_score'] == pytest.approx(0.9939, abs=1e-3)
+    # Ensure ID 1 is not in results
+    assert '1' not in recommendations['id'].values
+
+@patch('utils.matcher.SentenceTransformer')
+def test_search_top_k_uses_index(mock_sentence_transformer, sample_projects):
+    """Test that top_k searches return only the best matches within df."""
+    mock_model_instance = MagicMock()
+    mock_model_instance.encode.side_effect = [
+        np.array([[1.0, 0.0], [0.9, 0.1], [0.0, 1.0]]),
+        np.array([1.0, 0.0])
+    ]
+    mock_sentence_transformer.return_value = mock_model_instance
+
+    matcher = ProjectMatcher()
+    matcher.encode_projects(sample_projects)
+    assert matcher.index is not None
+
+    # Project 1 is the best match overall but is filtered out of df
+    results = matcher.search("Solar", sample_projects[sample_projects['id'] != '1'], top_k=1)
+
+    assert results['id'].tolist() == ['2']
+    assert results.iloc[0]['relevance_score'] > 0.9
+
+@patch('utils.matcher.SentenceTransformer')
+def test_encode_projects_is_incremental(mock_sentence_transformer, sample_projects):
+    """Test that only new or edited projects are re-encoded."""
+    mock_model_instance = MagicMock()
+    mock_model_instance.encode.side_effect = lambda texts, **kwargs: np.eye(4)[:len(texts)] + 0.1
+    mock_sentence_transformer.return_value = mock_model_instance
+
+    ProjectMatcher().encode_projects(sample_projects)
+    assert mock_model_instance.encode.call_count == 1
+
+    # Unchanged data (even reordered) is a cache hit / pure reuse
+    ProjectMatcher().encode_projects(sample_projects.iloc[::-1])
+    assert mock_model_instance.encode.call_count == 1
+
+    # Edit project 2, drop project 3, add project 4
+    updated = sample_projects.iloc[:2].copy()
+    updated.loc[1, 'objective'] = 'Offshore wind farms'
+    updated = pd.concat([updated, pd.DataFrame({
+        'id': ['4'], 'title': ['Quantum'], 'objective': ['Qubits'], 'topics': ['Physics']
+    })], ignore_index=True)
+
+    matcher = ProjectMatcher()
+    matcher.encode_projects(updated)
+
+    encoded_texts = mock_model_instance.encode.call_args[0][0]
+    assert encoded_texts == ['Sustainable Power Offshore wind farms Environment', 'Quantum Qubits Physics']
+    assert matcher.project_ids == ['1', '2', '4']
+    assert len(matcher.embeddings) == 3
+
+@patch('utils.matcher.SentenceTransformer')
+def test_stale_vector_index_is_rebuilt(mock_sentence_transformer, sample_projects):
+    """Test that an index persisted for other embeddings of the same size is not reused."""
+    mock_model_instance = MagicMock()
+    mock_model_instance.encode.return_value = np.array([[1.0, 0.0], [0.9, 0.1], [0.0, 1.0]])
+    mock_sentence_transformer.return_value = mock_model_instance
+    ProjectMatcher().encode_projects(sample_projects)
+
+    # e.g. left over from a run before the store was re-encoded
+    stale = FlatIndex(np.eye(3, dtype=np.float32))
+    stale.save(utils.matcher.INDEX_FILE, version='other-embeddings')
+
+    matcher = ProjectMatcher()
+    with patch('utils.matcher.build_index', wraps=utils.matcher.build_index) as build:
+        matcher.encode_projects(sample_projects) # Embeddings are a cache hit
+    assert build.call_count == 1
+    with np.load(utils.matcher.INDEX_FILE) as data:
+        assert str(data['version']) == matcher.version
+
+@patch('utils.matcher.SentenceTransformer')
+def test_candidate_ids_restrict_results(mock_sentence_transformer, sample_projects):
+    """Test that candidate_ids limit search and recommendations to the filtered set."""
+    mock_model_instance = MagicMock()
+    mock_model_instance.encode.side_effect = [
+        np.array([[1.0, 0.0], [0.9, 0.1], [0.0, 1.0]]),
+        np.array([1.0, 0.0])
+    ]
+    mock_sentence_transformer.return_value = mock_model_instance
+
+    matcher = ProjectMatcher()
+    matcher.encode_projects(sample_projects)
+
+    recommendations = matcher.get_similar_projects('1', sample_projects, top_k=2, candidate_ids={'3'})
+    assert recommendations['id'].tolist() == ['3']
+
+    results = matcher.search("Solar", sample_projects, top_k=5, candidate_ids=['2', '3'])
+    assert results['id'].tolist() == ['2', '3']
+
+@patch('utils.matcher.SentenceTransformer')
+def test_repeated_queries_skip_the_model(mock_sentence_transformer, sample_projects):
+    """Test that repeated (normalized) queries reuse cached vectors and rankings."""
+    mock_model_instance = MagicMock()
+    mock_model_instance.encode.side_effect = [
+        np.array([[1.0, 0.0], [0.9, 0.1], [0.0, 1.0]]),
+        np.array([1.0, 0.0])
+    ]
+    mock_sentence_transformer.return_value = mock_model_instance
+
+    matcher = ProjectMatcher()
+    matcher.encode_projects(sample_projects)
+
+    first = matcher.search("Solar  Energy", sample_projects, top_k=2)
+    second = matcher.search("solar energy", sample_projects, top_k=2)
+    # A different candidate set reuses the query vector but not the ranking
+    third = matcher.search("SOLAR energy", sample_projects[sample_projects['id'] != '1'], top_k=2)
+
+    assert mock_model_instance.encode.call_count == 2 # corpus + one query
+    assert first['id'].tolist() == second['id'].tolist() == ['1', '2']
+    assert third['id'].tolist() == ['2', '3']
+
+    stats = get_query_cache().stats()
+    assert stats['rankings']['hits'] == 1
+    assert stats['vectors']['hits'] == 1
+
+@patch('utils.matcher.SentenceTransformer')
+def test_search_many_batches_queries(mock_sentence_transformer, sample_projects):
+    """Test that search_many encodes all queries in one call and returns compact arrays."""
+    mock_model_instance = MagicMock()
+    mock_model_instance.encode.side_effect = [
+        np.array([[1.0, 0.0], [0.9, 0.1], [0.0, 1.0]]),
+        np.array([[0.0, 1.0], [1.0, 0.0]]) # Batched queries (sorted: 'health', 'solar')
+    ]
+    mock_sentence_transformer.return_value = mock_model_instance
+
+    matcher = ProjectMatcher()
+    matcher.encode_projects(sample_projects)
+
+    results = matcher.search_many(["Solar", "Health", "solar"], top_k=2)
+
+    assert mock_model_instance.encode.call_count == 2
+    assert mock_model_instance.encode.call_args[0][0] == ['health', 'solar']
+    assert len(results) == 3
+    ids, scores = results[0]
+    assert ids.tolist() == ['1', '2']
+    assert scores[0] == pytest.approx(1.0, abs=1e-3)
+    assert results[1][0].tolist()[0] == '3'
+    assert results[2][0].tolist() == ids.tolist()
+
+    # Restricting the candidates
+    ids, _ = matcher.search_many(["Solar"], top_k=5, candidate_ids={'2', '3'})[0]
+    assert ids.tolist() == ['2', '3']
+
+@patch('utils.matcher.SentenceTransformer')
+def test_keyword_and_hybrid_modes(mock_sentence_transformer, sample_projects):
+    """Test BM25 keyword search and that exact codes bypass the model in hybrid mode."""
+    mock_model_instance = MagicMock()
+    mock_model_instance.encode.side_effect = [
+        np.array([[1.0, 0.0], [0.9, 0.1], [0.0, 1.0]]),
+        np.array([1.0, 0.0])
+    ]
+    mock_sentence_transformer.return_value = mock_model_instance
+    projects = sample_projects.assign(acronym=['GREEN-EN', 'SUS-POW', 'M-CARE'])
+
+    matcher = ProjectMatcher()
+    matcher.encode_projects(projects)
+
+    results = matcher.search("machine learning", projects, top_k=5, mode='keyword')
+    assert results['id'].tolist() == ['3']
+    assert results.iloc[0]['relevance_score'] == pytest.approx(1.0)
+
+    # Acronym query in hybrid mode is answered from the postings lists alone
+    results = matcher.search("M-CARE", projects, top_k=5, mode='hybrid')
+    assert results['id'].tolist() == ['3']
+    assert mock_model_instance.encode.call_count == 1
+
+    # Concept query in hybrid mode fuses both rankings
+    results = matcher.search("solar wind", projects, top_k=2, mode='hybrid')
+    assert results['id'].tolist() == ['1', '2']
+    assert mock_model_instance.encode.call_count == 2
+
+@patch('utils.matcher.SentenceTransformer')
+def test_keyword_search_without_model(mock_sentence_transformer, sample_projects):
+    """Test that search degrades to keyword mode when the model is unavailable."""
+    mock_sentence_transformer.side_effect = OSError("offline")
+
+    matcher = ProjectMatcher()
+    matcher.encode_projects(sample_projects)
+
+    assert matcher.embeddings is None
+    results = matcher.search("hospitals", sample_projects, top_k=5, mode='semantic')
+    assert results['id'].tolist() == ['3']
+
+@patch('utils.matcher.SentenceTransformer')
+def test_encode_projects_without_online_encoding(mock_sentence_transformer, sample_projects):
+    """Test that a stale artifact is served as-is when encoding is not allowed."""
+    mock_model_instance = MagicMock()
+    mock_model_instance.encode.side_effect = lambda texts, **kwargs: np.eye(4)[:len(texts)] + 0.1
+    mock_sentence_transformer.return_value = mock_model_instance
+
+    # No artifact yet: keyword search only
+    matcher = ProjectMatcher()
+    matcher.encode_projects(sample_projects, allow_encode=False)
+    assert matcher.embeddings is None
+    mock_model_instance.encode.assert_not_called()
+
+    ProjectMatcher().encode_projects(sample_projects.iloc[:2])
+    assert mock_model_instance.encode.call_count == 1
+
+    # Project 3 is new, but the finished artifact is loaded without encoding it
+    matcher = ProjectMatcher()
+    matcher.encode_projects(sample_projects, allow_encode=False)
+    assert mock_model_instance.encode.call_count == 1
+    assert matcher.project_ids == ['1', '2']
+
+@patch('utils.matcher.SentenceTransformer')
+def test_encode_projects_with_custom_encoder(mock_sentence_transformer, sample_projects):
+    """Test that encode_fn replaces model.encode for missing rows."""
+    mock_sentence_transformer.return_value = MagicMock()
+    encode_fn = MagicMock(side_effect=lambda texts: np.eye(4)[:len(texts)] + 0.1)
+
+    matcher = ProjectMatcher()
+    matcher.encode_projects(sample_projects, encode_fn=encode_fn)
+
+    encode_fn.assert_called_once()
+    mock_sentence_transformer.return_value.encode.assert_not_called()
+    assert matcher.project_ids == ['1', '2', '3']
+
+@pytest.fixture
+def large_ivf_matcher(monkeypatch):
+    """Matcher over 6,000 random projects with a forced IVF index."""
+    monkeypatch.setattr(utils.matcher, 'INDEX_TYPE', 'ivf')
+    rng = np.random.default_rng(0)
+    projects = pd.DataFrame({
+        'id': [f'P{i}' for i in range(6000)],
+        'title': [f'Project {i}' for i in range(6000)],
+        'objective': [''] * 6000,
+        'topics': [''] * 6000,
+    })
+    query_vec = rng.normal(size=16)
+    model = MagicMock()
+    model.encode.side_effect = lambda texts, **kwargs: query_vec if isinstance(texts, str) else rng.normal(size=(len(texts), 16))
+    with patch('utils.matcher.SentenceTransformer', return_value=model):
+        matcher = ProjectMatcher()
+        matcher.encode_projects(projects)
+    assert matcher.index.kind == 'ivf'
+    return matcher, projects, query_vec
+
+def brute_force_ids(matcher, query_vec, candidate_ids, k):
+    vectors = matcher.embeddings.dequantize()
+    positions = np.flatnonzero(np.isin(np.asarray(matcher.project_ids, dtype=object), list(candidate_ids)))
+    scores = vectors[positions] @ (query_vec / np.linalg.norm(query_vec))
+    best = positions[np.argsort(-scores, kind='stable')[:k]]
+    return [matcher.project_ids[i] for i in best]
+
+def test_filtered_search_matches_brute_force_with_ivf(large_ivf_matcher):
+    """Selective filters over an IVF index return the exact top-k among the candidates."""
+    matcher, projects, query_vec = large_ivf_matcher
+    candidate_ids = set(np.random.default_rng(1).choice(projects['id'], 300, replace=False))
+
+    results = matcher.search("query", projects, top_k=100, candidate_ids=candidate_ids)
+    assert results['id'].tolist() == brute_force_ids(matcher, query_vec, candidate_ids, 100)
+
+    # Same when the filtered frame itself is the candidate set
+    filtered = projects[projects['id'].isin(candidate_ids)]
+    assert matcher.search("query", filtered, top_k=100)['id'].tolist() == results['id'].tolist()
+
+def test_filtered_similar_projects_with_ivf(large_ivf_matcher):
+    matcher, projects, _ = large_ivf_matcher
+    candidate_ids = set(projects['id'].iloc[:50])
+    target = matcher.embeddings.dequantize([0])[0]
+
+    recommendations = matcher.get_similar_projects('P0', projects, top_k=5, candidate_ids=candidate_ids)
+    assert recommendations['id'].tolist() == brute_force_ids(matcher, target, candidate_ids - {'P0'}, 5)
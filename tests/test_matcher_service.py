@@ -0,0 +1,198 @@
+import threading
+import unittest
+from unittest.mock import patch, MagicMock
+import pandas as pd
+from utils.matcher import load_model
+from utils.matcher_service import MatcherService, dataset_version
+
+def make_projects(objective='Solar'):
+    return pd.DataFrame({
+        'id': ['1', '2'],
+        'title': ['A', 'B'],
+        'objective': [objective, 'Wind'],
+        'topics': ['T1', 'T2']
+    })
+
+class TestMatcherService(unittest.TestCase):
+
+    def test_dataset_version(self):
+        projects = make_projects()
+        self.assertEqual(dataset_version(projects), dataset_version(make_projects()))
+        self.assertNotEqual(dataset_version(projects), dataset_version(make_projects('Edited')))
+
+        projects.attrs['dataset_version'] = 'abc'
+        self.assertEqual(dataset_version(projects), 'abc')
+
+    @patch('utils.matcher_service.ProjectMatcher')
+    def test_builds_once_per_version(self, mock_matcher_cls):
+        mock_matcher_cls.side_effect = lambda: MagicMock()
+        service = MatcherService()
+        projects = make_projects()
+
+        first = service.ensure_ready(projects)
+        second = service.ensure_ready(projects)
+
+        self.assertIs(first, second)
+        self.assertEqual(mock_matcher_cls.call_count, 1)
+        self.assertTrue(service.is_current(projects))
+
+    @patch('utils.matcher_service.ProjectMatcher')
+    def test_new_dataset_swaps_matcher(self, mock_matcher_cls):
+        mock_matcher_cls.side_effect = lambda: MagicMock()
+        service = MatcherService()
+
+        old = service.ensure_ready(make_projects())
+        new = service.ensure_ready(make_projects('Edited'))
+
+        self.assertIsNot(old, new)
+        self.assertIs(service.matcher, new)
+
+    @patch('utils.matcher_service.ProjectMatcher')
+    def test_concurrent_sessions_share_one_build(self, mock_matcher_cls):
+        mock_matcher_cls.side_effect = lambda: MagicMock()
+        service = MatcherService()
+        projects = make_projects()
+        results = []
+
+        threads = [threading.Thread(target=lambda: results.append(service.ensure_ready(projects))) for _ in range(8)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+
+        self.assertEqual(mock_matcher_cls.call_count, 1)
+        self.assertTrue(all(r is results[0] for r in results))
+    @patch('utils.matcher_service.load_model')
+    @patch('utils.matcher_service.ProjectMatcher')
+    def test_warmup_serves_keyword_matcher_first(self, mock_matcher_cls, mock_load_model):
+        lexical, full = MagicMock(semantic_ready=False), MagicMock(semantic_ready=True)
+        mock_matcher_cls.side_effect = lambda with_model=True: full if with_model else lexical
+        model_loading = threading.Event()
+        mock_load_model.side_effect = lambda: model_loading.wait(5)
+        service = MatcherService()
+        projects = make_projects()
+
+        self.assertTrue(service.start_warmup(projects))
+        self.assertFalse(service.start_warmup(projects)) # Already warming up
+        # The keyword-only matcher is published before the model has loaded
+        for _ in range(100):
+            if service.matcher is not None:
+                break
+            threading.Event().wait(0.01)
+        self.assertIs(service.matcher, lexical)
+        self.assertFalse(service.is_current(projects))
+        self.assertEqual(service.status()['state'], 'warming')
+
+        model_loading.set()
+        self.assertTrue(service.wait_until_ready(5))
+        status = service.status()
+        self.assertIs(service.matcher, full)
+        self.assertTrue(service.is_current(projects))
+        self.assertEqual(status['state'], 'ready')
+        self.assertTrue(status['semantic_ready'])
+        self.assertEqual(set(status['timings']), {'lexical', 'model', 'embeddings', 'total'})
+        self.assertFalse(service.start_warmup(projects))
+
+    @patch('utils.matcher_service.load_model')
+    @patch('utils.matcher_service.ProjectMatcher')
+    def test_warmup_failure_is_reported(self, mock_matcher_cls, mock_load_model):
+        mock_matcher_cls.side_effect = lambda with_model=True: MagicMock(semantic_ready=False)
+        mock_load_model.side_effect = RuntimeError("download failed")
+        service = MatcherService()
+
+        service.start_warmup(make_projects())
+        service.wait_until_ready(5)
+
+        status = service.status()
+        self.assertEqual(status['state'], 'failed')
+        self.assertIn("download failed", status['error'])
+        self.assertFalse(status['semantic_ready'])
+
+    @patch('utils.matcher_service.load_model')
+    @patch('utils.matcher_service.ProjectMatcher')
+    def test_failed_warmup_is_not_restarted_on_rerun(self, mock_matcher_cls, mock_load_model):
+        mock_matcher_cls.side_effect = lambda with_model=True: MagicMock(semantic_ready=False)
+        mock_load_model.side_effect = RuntimeError("download failed")
+        service = MatcherService()
+        projects = make_projects()
+
+        self.assertTrue(service.start_warmup(projects))
+        service.wait_until_ready(5)
+        # Next rerun, same dataset: the failure is remembered
+        self.assertFalse(service.start_warmup(projects))
+        self.assertEqual(mock_load_model.call_count, 1)
+        self.assertEqual(service.status()['state'], 'failed')
+
+        # A new dataset version retries right away
+        self.assertTrue(service.start_warmup(make_projects('Edited')))
+        service.wait_until_ready(5)
+        self.assertEqual(mock_load_model.call_count, 2)
+
+        # The same version is retried after the cooldown
+        self.assertFalse(service.start_warmup(make_projects('Edited')))
+        with patch('utils.matcher_service.WARMUP_RETRY_SECONDS', 0):
+            self.assertTrue(service.start_warmup(make_projects('Edited')))
+        service.wait_until_ready(5)
+        self.assertEqual(mock_load_model.call_count, 3)
+
+    @patch('utils.matcher.SentenceTransformer')
+    @patch('utils.matcher_service.ProjectMatcher')
+    def test_model_load_failure_fails_warmup(self, mock_matcher_cls, mock_transformer):
+        # The real load_model logs the error and returns None
+        mock_matcher_cls.side_effect = lambda with_model=True: MagicMock(semantic_ready=False)
+        mock_transformer.side_effect = OSError("offline")
+        load_model.clear()
+        self.addCleanup(load_model.clear)
+        service = MatcherService()
+        projects = make_projects()
+
+        self.assertTrue(service.start_warmup(projects))
+        service.wait_until_ready(5)
+        status = service.status()
+        self.assertEqual(status['state'], 'failed')
+        self.assertIn("could not be loaded", status['error'])
+        self.assertFalse(service.is_current(projects))
+        self.assertFalse(service.start_warmup(projects))
+
+        # The None was not cached: the retry loads the model again
+        with patch('utils.matcher_service.WARMUP_RETRY_SECONDS', 0):
+            self.assertTrue(service.start_warmup(projects))
+        service.wait_until_ready(5)
+        self.assertEqual(mock_transformer.call_count, 2)
+
+    @patch('utils.matcher_service.load_model')
+    @patch('utils.matcher_service.ProjectMatcher')
+    def test_superseded_warmup_does_not_publish(self, mock_matcher_cls, mock_load_model):
+        built = []
+        def make_matcher(with_model=True):
+            matcher = MagicMock(semantic_ready=with_model)
+            if with_model:
+                built.append(matcher)
+            return matcher
+        mock_matcher_cls.side_effect = make_matcher
+        release_first = threading.Event()
+        calls = []
+        def slow_first_load():
+            calls.append(1)
+            if len(calls) == 1:
+                release_first.wait(5)
+            return MagicMock()
+        mock_load_model.side_effect = slow_first_load
+        service = MatcherService()
+        old, new = make_projects(), make_projects('Edited')
+
+        self.assertTrue(service.start_warmup(old))
+        first_thread = service._warmup_thread
+        self.assertTrue(service.start_warmup(new))
+        self.assertTrue(service.wait_until_ready(5))
+        release_first.set()
+        first_thread.join(5)
+
+        # The older warm-up finished last but neither swapped nor reported
+        self.assertEqual(len(built), 2)
+        self.assertIs(service.matcher, built[0])
+        self.assertTrue(service.is_current(new))
+        self.assertEqual(service.status()['state'], 'ready')
+
+if __name__ == '__main__':
+    unittest.main()
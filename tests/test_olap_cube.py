@@ -0,0 +1,117 @@
+import unittest
+import numpy as np
+import pandas as pd
+from utils.data_loader import PROJECTS_SCHEMA, ORGS_SCHEMA, apply_schema
+from utils.filter_engine import FilterEngine
+from utils.incremental_aggregates import AggregateIndex, IncrementalAggregates
+from utils.org_index import OrgIndex
+from utils.olap_cube import DashboardCube, month_number
+
+
+class TestDashboardCube(unittest.TestCase):
+    def setUp(self):
+        rng = np.random.default_rng(0)
+        n = 300
+        starts = pd.Timestamp('2021-01-01') + pd.to_timedelta(rng.integers(0, 1500, n), unit='D')
+        self.projects = pd.DataFrame({
+            'id': [f'P{i}' for i in range(n)],
+            'cluster': pd.Categorical(rng.choice(['Health', 'Climate', 'Digital', None], n)),
+            'fundingScheme': rng.choice(['RIA', 'IA', 'CSA'], n),
+            'startDate': starts.where(rng.random(n) > 0.05),
+            'endDate': starts + pd.Timedelta(days=700),
+            'totalCost': rng.random(n) * 1e6,
+        })
+        m = 900
+        self.orgs = pd.DataFrame({
+            'projectID': rng.choice(self.projects['id'], m),
+            'name': rng.choice([f'Org {i}' for i in range(40)], m),
+            'country': pd.Categorical(rng.choice(['Germany', 'France', 'Italy'], m)),
+            'role': rng.choice(['coordinator', 'participant', 'partner'], m),
+            'ecContribution': rng.random(m) * 1e5,
+        })
+        self.cube = DashboardCube(self.projects, self.orgs)
+        self.engine = FilterEngine(self.projects)
+
+    def rows(self, filters):
+        projects = self.engine.take(self.engine.positions(filters))
+        return projects, self.orgs[self.orgs['projectID'].isin(projects['id'])]
+
+    def filter_sets(self):
+        return [
+            {},
+            {'selected_clusters': ['Health']},
+            {'selected_clusters': ['Health', 'Digital'], 'selected_funding_schemes': ['RIA']},
+            {'start_date': '2023-03-01'},
+            {'start_date': pd.Timestamp('2022-07-01').date(), 'selected_funding_schemes': ['IA', 'CSA']},
+        ]
+
+    def test_matches_row_level_aggregates(self):
+        for filters in self.filter_sets():
+            with self.subTest(filters=filters):
+                cube_slice = self.cube.slice(filters)
+                projects, orgs = self.rows(filters)
+
+                self.assertEqual(cube_slice.totals()['projects'], len(projects))
+                self.assertAlmostEqual(cube_slice.totals()['funding'], projects['totalCost'].sum(), places=2)
+
+                counts = projects['cluster'].value_counts()
+                pd.testing.assert_series_equal(
+                    cube_slice.cluster_counts().sort_index(), counts[counts > 0].sort_index(),
+                    check_names=False, check_index_type=False, check_categorical=False)
+
+                funding = projects.groupby('cluster', observed=True)['totalCost'].sum()
+                np.testing.assert_allclose(cube_slice.cluster_funding().loc[funding.index], funding)
+
+                stats = cube_slice.country_stats().set_index('country')
+                expected = orgs.groupby('country', observed=True).agg(
+                    TotalFunding=('ecContribution', 'sum'), ProjectCount=('projectID', 'count'))
+                expected = expected[expected['ProjectCount'] > 0]
+                np.testing.assert_allclose(stats.loc[expected.index, 'TotalFunding'], expected['TotalFunding'])
+                np.testing.assert_array_equal(stats.loc[expected.index, 'ProjectCount'], expected['ProjectCount'])
+
+                coordinators = orgs[orgs['role'] == 'coordinator']['name'].value_counts()
+                top = cube_slice.top_coordinators(10)
+                self.assertEqual(top['projects'].tolist(), coordinators.head(10).tolist())
+                for name, count in zip(top['name'], top['projects']):
+                    self.assertEqual(coordinators[name], count)
+
+    def test_funding_paths_agree_to_the_cent(self):
+        # Typed like the loaded frames, with amounts in whole cents up to 100M
+        rng = np.random.default_rng(2)
+        projects = apply_schema(self.projects.assign(totalCost=rng.integers(0, 10**10, len(self.projects)) / 100), PROJECTS_SCHEMA)
+        orgs = apply_schema(self.orgs.assign(ecContribution=rng.integers(0, 10**9, len(self.orgs)) / 100), ORGS_SCHEMA)
+        cube, engine = DashboardCube(projects, orgs), FilterEngine(projects)
+        aggregates = IncrementalAggregates(AggregateIndex(projects, OrgIndex(orgs)))
+        for filters in self.filter_sets():
+            with self.subTest(filters=filters):
+                positions = engine.positions(filters)
+                expected = round(projects['totalCost'].iloc[positions].sum() * 100)
+                self.assertEqual(round(cube.slice(filters).totals()['funding'] * 100), expected)
+                self.assertEqual(round(aggregates.update(positions).totals()['funding'] * 100), expected)
+
+    def test_unsupported_filters_fall_back(self):
+        self.assertIsNone(self.cube.slice({'search_objective': 'hydrogen'}))
+        self.assertIsNone(self.cube.slice({'search_id': 'P1'}))
+        self.assertIsNone(self.cube.slice({'end_date': '2024-01-01'}))
+        self.assertIsNone(self.cube.slice({'start_date': '2023-03-15'}))
+        self.assertIsNone(self.cube.slice({}, watchlist_ids=['P1']))
+        self.assertIsNotNone(self.cube.slice({'search_objective': '', 'search_mode': 'semantic'}))
+
+    def test_cells_are_fewer_than_rows(self):
+        self.assertLessEqual(len(self.cube.projects), len(self.projects))
+        self.assertEqual(self.cube.projects['count'].sum(), len(self.projects))
+        self.assertEqual(self.cube.orgs['rows'].sum(), len(self.orgs))
+
+    def test_month_number(self):
+        months = month_number([pd.Timestamp('2024-01-31'), pd.Timestamp('2024-02-01'), pd.NaT])
+        self.assertEqual(months[1] - months[0], 1)
+        self.assertEqual(months[2], -1)
+
+    def test_empty_orgs(self):
+        cube = DashboardCube(self.projects, pd.DataFrame())
+        self.assertTrue(cube.slice({}).country_stats().empty)
+        self.assertTrue(cube.slice({}).top_coordinators().empty)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,37 @@
+import unittest
+import numpy as np
+import pandas as pd
+from utils.org_index import OrgIndex
+
+
+class TestOrgIndex(unittest.TestCase):
+    def setUp(self):
+        rng = np.random.default_rng(0)
+        self.orgs = pd.DataFrame({
+            'projectID': rng.choice(['p1', 'p2', 'p3', 'p4', None], size=200).tolist(),
+            'name': [f'Org {i}' for i in range(200)],
+        })
+        self.index = OrgIndex(self.orgs)
+
+    def test_orgs_for_matches_isin(self):
+        for ids in [['p1'], ['p2', 'p4'], ['p3', 'p1', 'p3', 'unknown'], [], ['unknown']]:
+            expected = self.orgs[self.orgs['projectID'].isin(ids)]
+            pd.testing.assert_frame_equal(self.index.orgs_for(pd.Series(ids, dtype=object)), expected)
+
+    def test_orgs_for_project_is_a_slice(self):
+        expected = self.orgs[self.orgs['projectID'] == 'p2']
+        pd.testing.assert_frame_equal(self.index.orgs_for_project('p2'), expected)
+        self.assertTrue(self.index.orgs_for_project('unknown').empty)
+
+    def test_offsets(self):
+        self.assertEqual(len(self.index), 4)
+        self.assertEqual(self.index.offsets[-1], self.orgs['projectID'].notna().sum())
+
+    def test_empty_frame(self):
+        index = OrgIndex(pd.DataFrame())
+        self.assertEqual(len(index), 0)
+        self.assertEqual(len(index.positions(['p1'])), 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
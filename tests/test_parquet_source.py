@@ -0,0 +1,43 @@
+import os
+import tempfile
+import unittest
+import pandas as pd
+from utils.parquet_source import ParquetSource, select_frame
+
+
+class TestParquetSource(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp_dir.name, 'orgs.parquet')
+        self.df = pd.DataFrame({
+            'projectID': ['1', '1', '2', '3'],
+            'name': ['A', 'B', 'C', 'D'],
+            'country': pd.Categorical(['DE', 'FR', 'DE', 'US']),
+            'ecContribution': pd.Series([1.0, 2.0, 3.0, 4.0], dtype='float32'),
+        })
+        self.df.to_parquet(self.path, index=False)
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_column_projection(self):
+        result = ParquetSource(self.path).to_pandas(columns=['projectID', 'name', 'unknown'])
+        self.assertEqual(list(result.columns), ['projectID', 'name'])
+        self.assertEqual(len(result), 4)
+
+    def test_predicate_pushdown(self):
+        filters = [('country', 'in', ['DE', 'FR']), ('ecContribution', '>=', 2.0)]
+        result = ParquetSource(self.path).to_pandas(columns=['name', 'country'], filters=filters)
+        self.assertEqual(result['name'].tolist(), ['B', 'C'])
+        # Types survive the round trip
+        self.assertIsInstance(result['country'].dtype, pd.CategoricalDtype)
+
+    def test_select_frame_matches_parquet_path(self):
+        filters = [('country', '==', 'DE')]
+        from_disk = ParquetSource(self.path).to_pandas(['name', 'ecContribution'], filters)
+        in_memory = select_frame(self.df, ['name', 'ecContribution'], filters)
+        pd.testing.assert_frame_equal(from_disk, in_memory)
+
+
+if __name__ == '__main__':
+    unittest.main()
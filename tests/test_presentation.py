@@ -0,0 +1,42 @@
+import unittest
+import numpy as np
+import pandas as pd
+from utils.presentation import PresentationView, doi_urls, cost_labels, objective_previews
+
+
+class TestPresentationView(unittest.TestCase):
+    def setUp(self):
+        self.projects = pd.DataFrame({
+            'id': ['a', 'b', 'c'],
+            'grantDoi': ['10.3030/1', None, '  '],
+            'totalCost': [1_250_000.0, np.nan, 40_000.0],
+            'objective': ['x' * 300, None, 'short'],
+        })
+        self.view = PresentationView(self.projects, version='v1')
+
+    def test_matches_row_wise_formatting(self):
+        expected = [f"https://doi.org/{x}" if pd.notnull(x) and str(x).strip() != '' else None
+                    for x in self.projects['grantDoi']]
+        self.assertEqual(self.view.frame['doiUrl'].tolist(), expected)
+        self.assertEqual(self.view.frame['costLabel'].tolist(), ['€1.2M', None, '€0.0M'])
+        self.assertEqual(self.view.frame['objectivePreview'].iloc[0], 'x' * 200 + '...')
+        self.assertEqual(self.view.frame['objectivePreview'].iloc[2], 'short...')
+
+    def test_take_and_for_ids(self):
+        self.assertEqual(self.view.take(np.array([2, 0]))['doiUrl'].tolist(), [None, 'https://doi.org/10.3030/1'])
+        self.assertEqual(self.view.for_ids(['c', 'unknown', 'a'])['costLabel'].tolist(), ['€0.0M', '€1.2M'])
+
+    def test_missing_columns(self):
+        view = PresentationView(pd.DataFrame({'id': ['a']}))
+        self.assertEqual(len(view), 1)
+        self.assertIsNone(view.frame['doiUrl'].iloc[0])
+
+    def test_helpers_accept_arrow_strings(self):
+        dois = pd.Series(['10.1/x', None], dtype=pd.StringDtype('pyarrow'))
+        self.assertEqual(doi_urls(dois).tolist(), ['https://doi.org/10.1/x', None])
+        self.assertEqual(cost_labels([]).tolist(), [])
+        self.assertEqual(objective_previews(['abc'], chars=2).tolist(), ['ab...'])
+
+
+if __name__ == '__main__':
+    unittest.main()
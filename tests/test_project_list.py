@@ -1,7 +1,15 @@
 import unittest
 from unittest.mock import patch, MagicMock
+import numpy as np
 import pandas as pd
-from components.project_list import render_project_list
+from components.project_list import render_project_list, page_positions
+
+def mock_widgets(mock_st):
+    """Streamlit mock whose layout and input widgets return usable values."""
+    mock_st.columns.side_effect = lambda spec: [MagicMock() for _ in range(spec if isinstance(spec, int) else len(spec))]
+    mock_st.selectbox.side_effect = lambda label, options, index=0, **kwargs: list(options)[index]
+    mock_st.number_input.return_value = 1
+    mock_st.session_state = {}
 
 class TestProjectList(unittest.TestCase):
 
@@ -14,10 +22,10 @@ class TestProjectList(unittest.TestCase):
         })
         
         # Mock widget returns
-        mock_st.selectbox.return_value = '1'
+        mock_widgets(mock_st)
 
-        # Call function
-        selected_id = render_project_list(mock_projects)
+        # Call function (no user logged in)
+        selected_id = render_project_list(mock_projects, None)
 
         # Assertions
         self.assertEqual(selected_id, '1')
@@ -28,10 +36,9 @@ class TestProjectList(unittest.TestCase):
         # For now, it fails if I change implementation. I will update this test in the Green phase or now if I know the plan.
     
     @patch('components.project_list.st')
-    @patch('components.project_list.add_to_watchlist')
-    @patch('components.project_list.remove_from_watchlist')
+    @patch('components.project_list.update_watchlist')
     @patch('components.project_list.get_watchlist')
-    def test_watchlist_interaction(self, mock_get, mock_remove, mock_add, mock_st):
+    def test_watchlist_interaction(self, mock_get, mock_update, mock_st):
         # Mock initial watchlist (Project 1 is fav)
         mock_get.return_value = ['1']
         
@@ -46,13 +53,40 @@ class TestProjectList(unittest.TestCase):
         edited_df = mock_projects.copy()
         edited_df['Favorite'] = [False, True] 
         mock_st.data_editor.return_value = edited_df
+        mock_widgets(mock_st)
 
         # Call
-        render_project_list(mock_projects)
+        render_project_list(mock_projects, 7)
 
-        # Assertions
-        mock_add.assert_called_with('2')
-        mock_remove.assert_called_with('1')
+        # Assertions: the whole diff is written at once
+        mock_update.assert_called_once_with(['2'], ['1'], 7)
+        mock_st.rerun.assert_called_once()
+
+class TestPagePositions(unittest.TestCase):
+
+    def setUp(self):
+        self.df = pd.DataFrame({
+            'id': [str(i) for i in range(7)],
+            'totalCost': [5.0, None, 1.0, 7.0, 3.0, None, 2.0],
+        }, index=[10, 11, 12, 13, 14, 15, 16])
+
+    def test_default_order_is_kept(self):
+        positions, n_pages = page_positions(self.df, 2, 3)
+        self.assertEqual(n_pages, 3)
+        np.testing.assert_array_equal(positions, [3, 4, 5])
+        np.testing.assert_array_equal(page_positions(self.df, 3, 3)[0], [6])
+
+    def test_sorted_pages(self):
+        first, _ = page_positions(self.df, 1, 3, 'totalCost')
+        self.assertEqual(self.df.iloc[first]['totalCost'].tolist(), [1.0, 2.0, 3.0])
+        # Missing values last, in either direction
+        last, _ = page_positions(self.df, 3, 3, 'totalCost', ascending=False)
+        self.assertTrue(self.df.iloc[last]['totalCost'].isna().all())
+
+    def test_page_is_clamped(self):
+        np.testing.assert_array_equal(page_positions(self.df, 99, 5)[0], [5, 6])
+        positions, n_pages = page_positions(self.df.iloc[:0], 1, 5)
+        self.assertEqual((len(positions), n_pages), (0, 1))
 
 if __name__ == '__main__':
     unittest.main()
\ No newline at end of file
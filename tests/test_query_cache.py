@@ -0,0 +1,51 @@
+import unittest
+from unittest.mock import patch
+from utils.query_cache import LRUCache, normalize_query
+
+class TestQueryCache(unittest.TestCase):
+
+    def test_normalize_query(self):
+        self.assertEqual(normalize_query("  Green\tENERGY  storage "), "green energy storage")
+
+    def test_lru_eviction_and_stats(self):
+        cache = LRUCache(maxsize=2, ttl=60)
+        cache.put('a', 1)
+        cache.put('b', 2)
+        self.assertEqual(cache.get('a'), 1) # 'a' is now most recent
+        cache.put('c', 3) # Evicts 'b'
+
+        self.assertIsNone(cache.get('b'))
+        self.assertEqual(cache.get('c'), 3)
+
+        stats = cache.stats()
+        self.assertEqual(stats['hits'], 2)
+        self.assertEqual(stats['misses'], 1)
+        self.assertEqual(stats['evictions'], 1)
+        self.assertAlmostEqual(stats['hit_rate'], 2 / 3)
+
+    @patch('utils.query_cache.time.monotonic')
+    def test_ttl_expiry(self, mock_time):
+        mock_time.return_value = 100.0
+        cache = LRUCache(maxsize=10, ttl=5)
+        cache.put('a', 1)
+
+        mock_time.return_value = 104.0
+        self.assertEqual(cache.get('a'), 1)
+
+        mock_time.return_value = 106.0
+        self.assertIsNone(cache.get('a'))
+        self.assertEqual(len(cache), 0)
+
+    def test_peek_and_pop(self):
+        cache = LRUCache(maxsize=10, ttl=60)
+        cache.put('a', 1)
+        self.assertEqual(cache.peek('a'), 1)
+        self.assertIsNone(cache.peek('b'))
+        self.assertEqual((cache.hits, cache.misses), (0, 0)) # Peeks are not counted
+
+        cache.pop('a')
+        cache.pop('missing')
+        self.assertEqual(len(cache), 0)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -33,7 +33,7 @@ class TestSidebar(unittest.TestCase):
         mock_st.sidebar.text_input.side_effect = ['123', 'keyword'] 
 
         # Call function
-        filters = render_sidebar(mock_projects)
+        filters = render_sidebar(mock_projects, None)
 
         # Assertions
         self.assertIsNotNone(filters)
@@ -48,6 +48,8 @@ class TestSidebar(unittest.TestCase):
         # Verify widget calls
         self.assertTrue(mock_st.sidebar.header.called)
         self.assertTrue(mock_st.sidebar.checkbox.called)
+        # Semantic search is the default (first) mode, as assumed by app.py and the filter engine
+        self.assertEqual(mock_st.sidebar.radio.call_args[0][1][0], 'semantic')
 
 if __name__ == '__main__':
     unittest.main()
\ No newline at end of file
@@ -0,0 +1,71 @@
+import unittest
+from unittest.mock import patch
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from utils.models import Base
+import utils.db
+from utils.user_cache import UserDataCache
+
+
+class TestUserDataCache(unittest.TestCase):
+
+    def setUp(self):
+        self.engine = create_engine("sqlite:///:memory:")
+        Base.metadata.create_all(self.engine)
+        self.patcher = patch('utils.db.SessionLocal', sessionmaker(autocommit=False, autoflush=False, bind=self.engine))
+        self.patcher.start()
+        self.uid = utils.db.create_user("cached", "pass")
+        self.cache = UserDataCache(maxsize=16, ttl=60)
+
+    def tearDown(self):
+        self.patcher.stop()
+        Base.metadata.drop_all(self.engine)
+
+    def test_watchlist_is_read_once(self):
+        utils.db.add_to_watchlist('p1', self.uid)
+        with patch('utils.user_cache.db.get_watchlist', wraps=utils.db.get_watchlist) as reads:
+            for _ in range(3):
+                self.assertEqual(self.cache.get_watchlist(self.uid), {'p1'})
+        self.assertEqual(reads.call_count, 1)
+        self.assertEqual(self.cache.stats()['watchlists']['hits'], 2)
+
+    def test_watchlist_write_through(self):
+        self.cache.get_watchlist(self.uid)
+        self.assertTrue(self.cache.update_watchlist(['p1', 'p2'], [], self.uid))
+        self.assertTrue(self.cache.update_watchlist(['p3'], ['p1'], self.uid))
+        with patch('utils.user_cache.db.get_watchlist') as reads:
+            self.assertEqual(self.cache.get_watchlist(self.uid), {'p2', 'p3'})
+        reads.assert_not_called()
+        self.assertEqual(set(utils.db.get_watchlist(self.uid)), {'p2', 'p3'})
+
+    def test_failed_write_invalidates(self):
+        self.cache.get_watchlist(self.uid)
+        with patch('utils.user_cache.db.update_watchlist', return_value=False):
+            self.assertFalse(self.cache.update_watchlist(['p1'], [], self.uid))
+        self.assertIsNone(self.cache.watchlists.peek(self.uid))
+
+    def test_saved_searches_write_through(self):
+        self.assertEqual(self.cache.get_saved_searches(self.uid), [])
+        first = self.cache.save_search('First', '{}', self.uid)
+        second = self.cache.save_search('Second', '{"a": 1}', self.uid)
+        with patch('utils.user_cache.db.get_saved_searches') as reads:
+            self.assertEqual([s['name'] for s in self.cache.get_saved_searches(self.uid)], ['Second', 'First'])
+            self.assertTrue(self.cache.delete_search(first['id'], self.uid))
+            self.assertEqual(self.cache.get_saved_searches(self.uid), [second])
+        reads.assert_not_called()
+        self.assertEqual(utils.db.get_saved_searches(self.uid), [second])
+
+    def test_expiry_and_invalidate(self):
+        cache = UserDataCache(maxsize=16, ttl=0)
+        with patch('utils.user_cache.db.get_watchlist', return_value=['p1']) as reads:
+            cache.get_watchlist(self.uid)
+            cache.get_watchlist(self.uid)
+        self.assertEqual(reads.call_count, 2)
+
+        self.cache.get_saved_searches(self.uid)
+        self.cache.invalidate(self.uid)
+        self.assertIsNone(self.cache.searches.peek(self.uid))
+
+
+if __name__ == '__main__':
+    unittest.main()
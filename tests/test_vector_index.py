@@ -0,0 +1,132 @@
+from unittest.mock import patch
+import numpy as np
+import pytest
+from utils.vector_index import EXACT_SCAN_FACTOR, IVF_RECALL_TARGET, FlatIndex, IVFIndex, as_float_matrix, build_index, load_index, rank_positions, top_k_positions
+
+@pytest.fixture
+def matrix():
+    rng = np.random.default_rng(0)
+    return as_float_matrix(rng.normal(size=(500, 16)))
+
+def test_top_k_positions_sorted():
+    scores = np.array([0.1, 0.9, 0.5, 0.7])
+    assert top_k_positions(scores, 2).tolist() == [1, 3]
+    assert top_k_positions(scores, None).tolist() == [1, 3, 2, 0]
+
+def test_as_float_matrix_keeps_normalised_input(matrix):
+    assert as_float_matrix(matrix) is matrix
+    scaled = as_float_matrix(matrix * 3)
+    np.testing.assert_allclose(scaled, matrix, rtol=1e-6)
+
+def test_flat_index_is_exact(matrix):
+    index = FlatIndex(matrix)
+    query = matrix[42]
+    positions, scores = index.search(query, 5)
+    assert positions[0] == 42
+    assert scores[0] == pytest.approx(1.0)
+    assert np.all(np.diff(scores) <= 0)
+
+def test_flat_index_respects_candidates(matrix):
+    index = FlatIndex(matrix)
+    candidates = np.zeros(len(matrix), dtype=bool)
+    candidates[[3, 7, 11]] = True
+    positions, _ = index.search(matrix[42], 10, candidates=candidates)
+    assert sorted(positions.tolist()) == [3, 7, 11]
+
+def test_ivf_full_probe_matches_flat(matrix):
+    ivf = IVFIndex.build(matrix, n_lists=10)
+    flat = FlatIndex(matrix)
+    query = matrix[7]
+    ivf_positions, _ = ivf.search(query, 10, n_probe=10)
+    flat_positions, _ = flat.search(query, 10)
+    assert ivf_positions.tolist() == flat_positions.tolist()
+
+def test_ivf_finds_self_with_few_probes(matrix):
+    ivf = IVFIndex.build(matrix, n_lists=10, n_probe=1)
+    positions, _ = ivf.search(matrix[123], 1)
+    assert positions[0] == 123
+
+def test_index_round_trip(matrix, tmp_path):
+    path = str(tmp_path / 'index.npz')
+    build_index(matrix, kind='ivf', n_probe=3).save(path)
+
+    loaded = load_index(path, matrix)
+    assert isinstance(loaded, IVFIndex)
+    assert loaded.n_probe == 3
+
+    # Index built for a different corpus is rejected
+    assert load_index(path, matrix[:10]) is None
+
+def test_index_for_other_embeddings_is_rejected(matrix, tmp_path):
+    path = str(tmp_path / 'index.npz')
+    build_index(matrix, kind='ivf', n_probe=3).save(path, version='v1')
+    assert load_index(path, matrix, version='v1') is not None
+    # Same row count, re-encoded embeddings
+    assert load_index(path, matrix, version='v2') is None
+    # Files without a version are stale once versions are checked
+    build_index(matrix, kind='flat').save(path)
+    assert load_index(path, matrix, version='v1') is None
+
+@pytest.fixture
+def large_matrix():
+    rng = np.random.default_rng(1)
+    return as_float_matrix(rng.normal(size=(10000, 16)))
+
+def test_ivf_selective_candidates_are_exact(large_matrix):
+    ivf = IVFIndex.build(large_matrix, n_iter=3)
+    flat = FlatIndex(large_matrix)
+    rng = np.random.default_rng(2)
+    candidates = np.zeros(len(large_matrix), dtype=bool)
+    candidates[rng.choice(len(large_matrix), 300, replace=False)] = True
+
+    query = large_matrix[5]
+    positions, scores = ivf.search(query, 100, candidates=candidates)
+    expected, _ = flat.search(query, 100, candidates=candidates)
+    assert positions.tolist() == expected.tolist()
+
+def test_ivf_probes_until_k_candidates_survive(large_matrix):
+    ivf = IVFIndex.build(large_matrix, n_iter=3, n_probe=1)
+    rng = np.random.default_rng(3)
+    # Too many candidates for an exact scan, too few per list for one probe
+    candidates = rng.random(len(large_matrix)) < 0.2
+    k = 50
+    assert candidates.sum() > k * EXACT_SCAN_FACTOR
+    positions, _ = ivf.search(large_matrix[9], k, candidates=candidates)
+    assert len(positions) == k
+    assert candidates[positions].all()
+
+def clustered_matrix(n, dim=32, n_clusters=60, spread=1.0, seed=4):
+    rng = np.random.default_rng(seed)
+    centers = rng.normal(size=(n_clusters, dim))
+    return as_float_matrix(centers[rng.integers(0, n_clusters, n)] + rng.normal(scale=spread, size=(n, dim)))
+
+def recall_at_k(index, matrix, queries, k=100):
+    flat = FlatIndex(matrix)
+    return np.mean([len(set(index.search(q, k)[0]) & set(flat.search(q, k)[0])) / k for q in queries])
+
+@pytest.mark.parametrize('spread', [1.0, 1.5])
+def test_default_ivf_reaches_recall_target(spread):
+    data = clustered_matrix(12100, spread=spread)
+    corpus, queries = data[:12000], data[12000:] # Queries are not in the corpus
+    index = build_index(corpus)
+    assert isinstance(index, IVFIndex)
+    assert index.n_probe < len(index.centroids) / 2
+    # Calibrated on a sample, so allow some noise around the target
+    assert recall_at_k(index, corpus, queries) >= IVF_RECALL_TARGET - 0.03
+
+def test_higher_recall_target_probes_more_lists():
+    corpus = clustered_matrix(12000, spread=1.5)
+    default = IVFIndex.build(corpus)
+    strict = IVFIndex.build(corpus, recall=0.995)
+    assert strict.n_probe > default.n_probe
+
+def test_unclustered_embeddings_use_exact_scan():
+    rng = np.random.default_rng(5)
+    assert isinstance(build_index(as_float_matrix(rng.normal(size=(8000, 64)))), FlatIndex)
+
+def test_ivf_scans_at_least_k_times_factor_rows(large_matrix):
+    ivf = IVFIndex.build(large_matrix, n_iter=3, n_probe=1) # ~100 rows per list
+    k = 20
+    with patch('utils.vector_index.rank_positions', wraps=rank_positions) as rank:
+        ivf.search(large_matrix[11], k)
+    assert len(rank.call_args[0][2]) >= k * EXACT_SCAN_FACTOR
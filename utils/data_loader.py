@@ -1,59 +1,273 @@
+import numpy as np
 import pandas as pd
 import streamlit as st
 import os
+import json
+import inspect
+import hashlib
 from utils.logger import logger
+from utils.parquet_source import ParquetSource, select_frame
+from utils.org_index import OrgIndex
+from utils.filter_engine import FilterEngine
+from utils.olap_cube import DashboardCube
+from utils.incremental_aggregates import AggregateIndex
+from utils.presentation import PresentationView
 
-def get_optimized_dataframe(csv_path: str, loader_func, cleaning_func=None):
+# Source files
+PROJECTS_CSV = 'data/processed/projects.csv'
+ORGS_CSV = 'data/processed/orgs.csv'
+
+# Bump to invalidate every Parquet cache (e.g. after changing the cache format)
+CACHE_FORMAT_VERSION = 1
+HASH_CHUNK_BYTES = 1 << 20
+
+# Country codes of European organizations and their display names
+COUNTRY_MAPPING = {
+    'IT': 'Italy', 'AT': 'Austria', 'CZ': 'Czech Republic', 'ES': 'Spain', 'FR': 'France', 'DE': 'Germany',
+    'NL': 'Netherlands',
+    'UK': 'United Kingdom', 'BE': 'Belgium', 'EE': 'Estonia', 'PL': 'Poland', 'HR': 'Croatia', 'IE': 'Ireland',
+    'FI': 'Finland',
+    'NO': 'Norway', 'LU': 'Luxembourg', 'DK': 'Denmark', 'CH': 'Switzerland', 'SE': 'Sweden', 'PT': 'Portugal',
+    'RO': 'Romania',
+    'BG': 'Bulgaria', 'LV': 'Latvia', 'SI': 'Slovenia', 'LT': 'Lithuania', 'SK': 'Slovakia', 'UA': 'Ukraine',
+    'RS': 'Serbia',
+    'CY': 'Cyprus', 'HU': 'Hungary', 'MT': 'Malta', 'MK': 'North Macedonia', 'IS': 'Iceland',
+    'BA': 'Bosnia and Herzegovina',
+    'AL': 'Albania', 'MD': 'Moldova', 'XK': 'Kosovo', 'ME': 'Montenegro'
+}
+
+# Column types of the cached frames:
+# 'category' for low-cardinality enums, 'text' for Arrow-backed strings,
+# and compact numeric types. Euro amounts stay float64: float32 only keeps ~7
+# significant digits and would round multi-million totals off the cent.
+# Changing a schema invalidates the Parquet cache.
+PROJECTS_SCHEMA = {
+    'id': 'text', 'acronym': 'text', 'title': 'text', 'objective': 'text', 'topics': 'text', 'grantDoi': 'text',
+    'cluster': 'category', 'fundingScheme': 'category', 'legalBasis': 'category',
+    'totalCost': 'float64',
+}
+ORGS_SCHEMA = {
+    'name': 'text', 'organizationURL': 'text', 'projectID': 'text', 'contactForm': 'text',
+    'activityType': 'category', 'city': 'category', 'country': 'category', 'role': 'category',
+    'order': 'int32', 'ecContribution': 'float64',
+}
+
+# Columns read by each derived structure (projected at the Parquet scan).
+# The org index backs the organisations tab and the project detail view,
+# which display every org column, so it reads the whole cleaned orgs table.
+ORG_INDEX_COLUMNS = ['name', 'activityType', 'city', 'country', 'role', 'organizationURL', 'projectID', 'order', 'ecContribution', 'contactForm']
+CUBE_PROJECT_COLUMNS = ['id', 'cluster', 'fundingScheme', 'startDate', 'totalCost']
+CUBE_ORG_COLUMNS = ['projectID', 'name', 'country', 'role', 'ecContribution']
+AGGREGATE_ORG_COLUMNS = ['projectID', 'name', 'country', 'ecContribution']
+
+def text_dtype():
+    """Arrow-backed strings with NaN as missing value (pandas' default 'str' from 3.0)."""
+    try:
+        return pd.StringDtype('pyarrow', na_value=np.nan)
+    except TypeError:
+        return pd.StringDtype('pyarrow')
+
+def apply_schema(df, schema):
+    """Casts the columns of df listed in schema; columns not in df are ignored."""
+    df = df.copy()
+    for col, kind in schema.items():
+        if col not in df.columns:
+            continue
+        if kind == 'text':
+            df[col] = df[col].astype(text_dtype())
+        elif kind == 'category':
+            df[col] = df[col].astype('category')
+        elif kind.startswith('int') and df[col].isna().any():
+            df[col] = df[col].astype(kind.capitalize()) # Nullable integer
+        else:
+            df[col] = df[col].astype(kind)
+    return df
+
+def memory_usage(df):
+    return int(df.memory_usage(index=True, deep=True).sum())
+
+def file_hash(path):
+    """SHA-1 of a file's content, read in chunks."""
+    digest = hashlib.sha1()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK_BYTES), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def function_version(func):
+    """Fingerprint of a function's source code, so editing a cleaning step invalidates the cache."""
+    if func is None:
+        return 'none'
+    try:
+        source = inspect.getsource(func)
+    except (OSError, TypeError):
+        source = getattr(func, '__qualname__', repr(func))
+    return hashlib.sha1(source.encode('utf-8')).hexdigest()[:16]
+
+def frame_schema(df):
+    return {col: str(dtype) for col, dtype in df.dtypes.items()}
+
+def manifest_path(parquet_path):
+    return f"{parquet_path}.manifest.json"
+
+def read_manifest(parquet_path):
+    try:
+        with open(manifest_path(parquet_path)) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+def source_hash(csv_path, manifest=None):
+    """
+    Content hash of the source file. The hash recorded in the manifest is
+    reused while the file's size and mtime are unchanged; any other change
+    (including a mere timestamp reset) rehashes the content.
+    """
+    stat = os.stat(csv_path)
+    if manifest and manifest.get('source_size') == stat.st_size and manifest.get('source_mtime') == stat.st_mtime:
+        return manifest.get('source_hash')
+    return file_hash(csv_path)
+
+def _atomic_write(path, write_func):
+    """Writes through a per-process temp file and renames it into place."""
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    try:
+        write_func(tmp_path)
+        os.replace(tmp_path, path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+def write_cache(df, parquet_path, manifest):
+    """Writes the Parquet cache, then its manifest (last, so it never describes a missing file)."""
+    _atomic_write(parquet_path, lambda tmp: df.to_parquet(tmp, index=False))
+
+    def write_manifest(tmp):
+        with open(tmp, 'w') as f:
+            json.dump(manifest, f, indent=2)
+    _atomic_write(manifest_path(parquet_path), write_manifest)
+
+def get_optimized_dataframe(csv_path: str, loader_func, cleaning_func=None, schema=None, columns=None, filters=None):
     """
     Generic function to handle CSV -> Parquet caching strategy.
-    
+
+    The cache is valid if its manifest matches the content hash of the CSV,
+    the version of the cleaning function and the cache format; timestamps
+    alone never decide. The returned frame carries
+    `attrs['dataset_version']`, a fingerprint of those inputs.
+
     Args:
         csv_path: Path to the source CSV file.
         loader_func: Function to read the CSV (pd.read_csv with specific args).
         cleaning_func: Optional function to clean/process the DF after loading CSV.
+        schema: Optional column -> type mapping (see PROJECTS_SCHEMA) applied
+            after cleaning and persisted in the Parquet cache.
+        columns: Optional list of the columns the caller needs; only these
+            are read from the (memory-mapped) Parquet cache and converted to
+            pandas. The conversion is eager, so the saving comes from the
+            projection alone.
+        filters: Optional list of (column, op, value) tuples, AND-ed and
+            pushed down to the Parquet scan, e.g. [('country', 'in', codes)].
     """
     parquet_path = csv_path.replace('.csv', '.parquet')
-    
+
     if not os.path.exists(csv_path):
         logger.warning(f"Source file not found: {csv_path}")
         return pd.DataFrame()
 
-    # Check timestamps
-    # If parquet exists and is newer than CSV, use it.
-    if os.path.exists(parquet_path):
-        csv_mtime = os.path.getmtime(csv_path)
-        parquet_mtime = os.path.getmtime(parquet_path)
-        
-        if parquet_mtime > csv_mtime:
-            try:
-                logger.info(f"Loading cached data from {parquet_path}")
-                return pd.read_parquet(parquet_path)
-            except Exception as e:
-                logger.warning(f"Failed to read parquet cache ({e}), falling back to CSV.")
-    
+    manifest = read_manifest(parquet_path)
+    current = {
+        'format': CACHE_FORMAT_VERSION,
+        'source_hash': source_hash(csv_path, manifest),
+        'cleaning_version': function_version(cleaning_func),
+        'dtypes': schema or {},
+    }
+    dataset_version = hashlib.sha1(json.dumps(current, sort_keys=True).encode('utf-8')).hexdigest()[:16]
+
+    if manifest and all(manifest.get(key) == value for key, value in current.items()) and os.path.exists(parquet_path):
+        try:
+            logger.info(f"Loading cached data from {parquet_path}")
+            df = ParquetSource(parquet_path).to_pandas(columns, filters)
+            if _matches_schema(df, manifest.get('schema'), columns):
+                _refresh_source_stat(csv_path, parquet_path, manifest)
+                _log_memory(csv_path, manifest.get('memory'))
+                df.attrs['dataset_version'] = dataset_version
+                return df
+            logger.warning("Parquet cache schema does not match its manifest, rebuilding.")
+        except Exception as e:
+            logger.warning(f"Failed to read parquet cache ({e}), falling back to CSV.")
+
     # Fallback to CSV (Slow Path)
     try:
         logger.info(f"Reading source CSV: {csv_path}")
         df = loader_func(csv_path)
-        
+
         if cleaning_func:
             df = cleaning_func(df)
-            
+
+        memory = None
+        if schema:
+            untyped = memory_usage(df)
+            df = apply_schema(df, schema)
+            memory = {'untyped': untyped, 'typed': memory_usage(df)}
+            _log_memory(csv_path, memory)
+
         # Save to Parquet for next time
         try:
-            df.to_parquet(parquet_path, index=False)
+            stat = os.stat(csv_path)
+            write_cache(df, parquet_path, dict(
+                current, source=os.path.basename(csv_path), source_size=stat.st_size,
+                source_mtime=stat.st_mtime, schema=frame_schema(df), rows=len(df), memory=memory
+            ))
             logger.info(f"Cached data to {parquet_path}")
         except Exception as e:
             logger.warning(f"Failed to create parquet cache: {e}")
-            
+
+        df = select_frame(df, columns, filters)
+        df.attrs['dataset_version'] = dataset_version
         return df
     except Exception as e:
         logger.exception(f"Error loading data from {csv_path}: {e}")
         return pd.DataFrame()
 
-@st.cache_data
-def load_projects():
-    csv_path = 'data/processed/projects.csv'
+def _matches_schema(df, schema, columns=None):
+    """True if the columns read from the cache have the types recorded in its manifest."""
+    schema = schema or {}
+    if columns is None and list(df.columns) != list(schema):
+        return False
+    return all(schema.get(col) == dtype for col, dtype in frame_schema(df).items())
+
+def _log_memory(csv_path, memory):
+    """Reports the saving of the typed schema over the untyped frame."""
+    if not memory or not memory.get('typed'):
+        return
+    untyped, typed = memory['untyped'], memory['typed']
+    logger.info(f"{os.path.basename(csv_path)} in memory: {typed / 1e6:.1f} MB typed "
+                f"vs {untyped / 1e6:.1f} MB untyped ({untyped / typed:.1f}x smaller).")
+
+def _refresh_source_stat(csv_path, parquet_path, manifest):
+    """Records the source's new size/mtime after a content-identical touch, so it is not rehashed every boot."""
+    stat = os.stat(csv_path)
+    if manifest.get('source_size') == stat.st_size and manifest.get('source_mtime') == stat.st_mtime:
+        return
+    try:
+        def write_manifest(tmp):
+            with open(tmp, 'w') as f:
+                json.dump(dict(manifest, source_size=stat.st_size, source_mtime=stat.st_mtime), f, indent=2)
+        _atomic_write(manifest_path(parquet_path), write_manifest)
+    except OSError as e:
+        logger.warning(f"Failed to update cache manifest: {e}")
+
+def read_projects(columns=None, filters=None):
+    """
+    Reads the projects table (uncached, see load_projects). Used directly by
+    the once-per-process builders, so their column projections are not kept.
+
+    Args:
+        columns: Optional list of needed columns (all by default).
+        filters: Optional (column, op, value) filters pushed down to the Parquet scan.
+    """
+    csv_path = PROJECTS_CSV
     
     def load_csv(path):
         return pd.read_csv(path, delimiter='|')
@@ -74,13 +288,30 @@ def load_projects():
         existing_cols = [c for c in cols if c in projects.columns]
         return projects[existing_cols]
 
-    df = get_optimized_dataframe(csv_path, load_csv, clean_projects)
+    df = get_optimized_dataframe(csv_path, load_csv, clean_projects, PROJECTS_SCHEMA, columns, filters)
     logger.success(f"Loaded {len(df)} projects.")
     return df
 
 @st.cache_data
-def load_orgs():
-    csv_path = 'data/processed/orgs.csv'
+def load_projects(columns=None, filters=None):
+    """
+    Loads the projects table.
+
+    Args:
+        columns: Optional list of needed columns (all by default).
+        filters: Optional (column, op, value) filters pushed down to the Parquet scan.
+    """
+    return read_projects(columns, filters)
+
+def read_orgs(columns=None, filters=None):
+    """
+    Reads the organizations table (uncached, see load_orgs).
+
+    Args:
+        columns: Optional list of needed columns (all by default).
+        filters: Optional (column, op, value) filters pushed down to the Parquet scan.
+    """
+    csv_path = ORGS_CSV
 
     def load_csv(path):
         return pd.read_csv(path, delimiter='|')
@@ -98,6 +329,70 @@ def load_orgs():
         existing_cols = [c for c in cols if c in orgs.columns]
         return orgs[existing_cols]
 
-    df = get_optimized_dataframe(csv_path, load_csv, clean_orgs)
+    df = get_optimized_dataframe(csv_path, load_csv, clean_orgs, ORGS_SCHEMA, columns, filters)
     logger.success(f"Loaded {len(df)} organizations.")
-    return df
\ No newline at end of file
+    return df
+
+@st.cache_data
+def load_orgs(columns=None, filters=None):
+    """
+    Loads the organizations table.
+
+    Args:
+        columns: Optional list of needed columns (all by default).
+        filters: Optional (column, op, value) filters pushed down to the Parquet scan.
+    """
+    return read_orgs(columns, filters)
+
+def read_orgs_europe(columns=None):
+    """
+    Organizations based in Europe (country filter pushed down to the Parquet
+    scan), with country codes replaced by country names (categorical).
+    Uncached, see load_orgs_europe.
+    """
+    df = read_orgs(columns, filters=[('country', 'in', list(COUNTRY_MAPPING))])
+    if df.empty or 'country' not in df.columns:
+        return df
+    df['country'] = df['country'].map(COUNTRY_MAPPING).astype('category')
+    logger.success(f"Prepared {len(df)} European organizations.")
+    return df
+
+@st.cache_resource
+def load_orgs_europe(columns=None):
+    """
+    read_orgs_europe, computed once per process (and per column list) and
+    shared by every session without copying: callers must not modify the
+    returned frame.
+    """
+    return read_orgs_europe(columns)
+
+@st.cache_resource
+def load_org_index():
+    """projectID -> org rows index over the Europe orgs shown by the dashboard, built once per process."""
+    return OrgIndex(load_orgs_europe(ORG_INDEX_COLUMNS))
+
+@st.cache_resource
+def load_filter_engine():
+    """Sidebar filter engine over load_projects(), built once per process."""
+    return FilterEngine(load_projects())
+
+@st.cache_resource
+def load_dashboard_cube():
+    """Pre-aggregated dashboard cube over the projects and European orgs, built once per process."""
+    # Projected reads, released once the cells are built
+    cube = DashboardCube(read_projects(CUBE_PROJECT_COLUMNS), read_orgs_europe(CUBE_ORG_COLUMNS))
+    logger.success(f"Built dashboard cube: {len(cube.projects)} project cells, {len(cube.orgs)} org cells.")
+    return cube
+
+@st.cache_resource
+def load_aggregate_index():
+    """Per-row arrays for the incremental dashboard KPIs, built once per process."""
+    engine = load_filter_engine()
+    org_index = OrgIndex(read_orgs_europe(AGGREGATE_ORG_COLUMNS))
+    return AggregateIndex(engine.projects, org_index, engine.version, engine)
+
+@st.cache_resource
+def load_presentation_view():
+    """Display-only project columns (DOI links, cost labels, previews), built once per process."""
+    engine = load_filter_engine()
+    return PresentationView(engine.projects, engine.version)
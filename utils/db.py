@@ -1,6 +1,7 @@
 import os
 import sys
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, insert, select
+from sqlalchemy.dialects import postgresql, sqlite
 from sqlalchemy.orm import sessionmaker
 from contextlib import contextmanager
 from utils.models import Base, User, Watchlist, SavedSearch
@@ -161,23 +162,51 @@ def delete_user(user_id):
             return False
 
 # --- Watchlist ---
-def add_to_watchlist(project_id, user_id):
+def _insert_watchlist_items(db, project_ids, user_id):
+    """INSERT ... ON CONFLICT DO NOTHING on Postgres / SQLite, existence check elsewhere."""
+    dialect = db.get_bind().dialect.name
+    if dialect in ('postgresql', 'sqlite'):
+        dialect_insert = postgresql.insert if dialect == 'postgresql' else sqlite.insert
+        rows = [{'user_id': user_id, 'project_id': pid} for pid in project_ids]
+        db.execute(dialect_insert(Watchlist).values(rows).on_conflict_do_nothing(index_elements=['user_id', 'project_id']))
+        return
+    existing = set(db.scalars(select(Watchlist.project_id).where(
+        Watchlist.user_id == user_id, Watchlist.project_id.in_(project_ids))))
+    missing = [pid for pid in project_ids if pid not in existing]
+    if missing:
+        db.execute(insert(Watchlist), [{'user_id': user_id, 'project_id': pid} for pid in missing])
+
+def update_watchlist(add_ids, remove_ids, user_id):
+    """
+    Applies a favorites diff in one transaction: one INSERT for all added
+    projects (duplicates ignored) and one DELETE ... WHERE project_id IN (...)
+    for all removed ones. Returns True on success.
+    """
+    add_ids = list(dict.fromkeys(str(pid) for pid in add_ids))
+    remove_ids = list(dict.fromkeys(str(pid) for pid in remove_ids))
+    if not add_ids and not remove_ids:
+        return True
     with get_db() as db:
         try:
-            exists = db.query(Watchlist).filter_by(project_id=str(project_id), user_id=user_id).first()
-            if not exists:
-                item = Watchlist(project_id=str(project_id), user_id=user_id)
-                db.add(item)
-                db.commit()
-                logger.info(f"User {user_id}: Added {project_id} to watchlist.")
+            if add_ids:
+                _insert_watchlist_items(db, add_ids, user_id)
+            if remove_ids:
+                db.query(Watchlist).filter(
+                    Watchlist.user_id == user_id, Watchlist.project_id.in_(remove_ids)
+                ).delete(synchronize_session=False)
+            db.commit()
+            logger.info(f"User {user_id}: Watchlist +{len(add_ids)} / -{len(remove_ids)} projects.")
+            return True
         except Exception as e:
-            logger.error(f"Error adding to watchlist: {e}")
+            db.rollback()
+            logger.error(f"Error updating watchlist: {e}")
+            return False
+
+def add_to_watchlist(project_id, user_id):
+    update_watchlist([project_id], [], user_id)
 
 def remove_from_watchlist(project_id, user_id):
-    with get_db() as db:
-        db.query(Watchlist).filter_by(project_id=str(project_id), user_id=user_id).delete()
-        db.commit()
-        logger.info(f"User {user_id}: Removed {project_id} from watchlist.")
+    update_watchlist([], [project_id], user_id)
 
 def get_watchlist(user_id):
     with get_db() as db:
@@ -185,27 +214,37 @@ def get_watchlist(user_id):
         return [item.project_id for item in items]
 
 # --- Saved Searches ---
+def _search_to_dict(item):
+    return {'id': item.id, 'name': item.name, 'filters': item.filters, 'created_at': item.created_at}
+
 def save_search(name, filters_json, user_id):
+    """Saves a search; returns it as a dict (as in get_saved_searches), or None on error."""
     with get_db() as db:
         try:
             search = SavedSearch(name=name, filters=filters_json, user_id=user_id)
             db.add(search)
             db.commit()
+            db.refresh(search)
             logger.info(f"User {user_id}: Saved search '{name}'")
+            return _search_to_dict(search)
         except Exception as e:
             logger.error(f"Error saving search: {e}")
+            return None
 
 def get_saved_searches(user_id):
     with get_db() as db:
         items = db.query(SavedSearch).filter(SavedSearch.user_id == user_id).order_by(SavedSearch.created_at.desc()).all()
         # Convert to dict for compatibility
-        return [{'id': item.id, 'name': item.name, 'filters': item.filters, 'created_at': item.created_at} for item in items]
+        return [_search_to_dict(item) for item in items]
 
 def delete_search(search_id):
+    """Deletes a saved search; returns True on success."""
     with get_db() as db:
         try:
             db.query(SavedSearch).filter(SavedSearch.id == search_id).delete()
             db.commit()
             logger.info(f"Deleted search {search_id}")
+            return True
         except Exception as e:
             logger.error(f"Error deleting search: {e}")
+            return False
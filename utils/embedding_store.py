@@ -0,0 +1,226 @@
+import os
+import json
+import uuid
+import numpy as np
+from utils.logger import logger
+
+SUPPORTED_DTYPES = ('float32', 'float16', 'int8')
+
+# Rows scored per block when scanning a memory-mapped matrix
+SCAN_BLOCK_ROWS = 65536
+# float16 / int8 rows widened to float32 per block; keeps the reused buffer in cache
+WIDEN_BLOCK_ROWS = 4096
+# Quantized searches shortlist k * RESCORE_FACTOR candidates before rescoring
+RESCORE_FACTOR = 4
+
+
+class EmbeddingStore:
+    """
+    Compact embedding matrix with an id sidecar.
+
+    The matrix is stored as a raw `.npy` file (float32, float16 or int8 with
+    per-row scales) and opened with `mmap_mode='r'`, so every session and worker
+    process shares one page-cached copy instead of unpickling its own.
+    Rows are L2-normalised, so inner products are cosine similarities.
+
+    Each save writes its matrix and scales under new file names
+    (`embeddings.<version>.npy`); the JSON sidecar names them and is replaced
+    last, so the sidecar a reader opens always describes the files it names.
+    """
+
+    def __init__(self, matrix, ids, scales=None, meta=None):
+        self.matrix = matrix
+        self.ids = list(ids)
+        self.scales = scales
+        self.meta = meta or {}
+
+    def __len__(self):
+        return len(self.ids)
+
+    @property
+    def dtype(self):
+        return str(self.matrix.dtype)
+
+    @property
+    def needs_rescore(self):
+        """int8 scan scores quantize the query too; a rescoring pass removes that error."""
+        return self.dtype == 'int8'
+
+    @classmethod
+    def from_float(cls, matrix, ids, dtype='float16', meta=None):
+        """
+        Builds a store from a normalised float matrix, quantizing it to dtype.
+        """
+        if dtype not in SUPPORTED_DTYPES:
+            raise ValueError(f"Unsupported embedding dtype: {dtype}")
+        matrix = np.asarray(matrix, dtype=np.float32)
+        if dtype == 'int8':
+            scales = np.abs(matrix).max(axis=1) / 127.0
+            scales[scales == 0] = 1.0
+            quantized = np.round(matrix / scales[:, None]).astype(np.int8)
+            return cls(quantized, ids, scales=scales.astype(np.float32), meta=meta)
+        return cls(matrix.astype(dtype, copy=False), ids, meta=meta)
+
+    # --- Persistence ---
+
+    @staticmethod
+    def paths(base_path, version=None):
+        """File names of one saved version (unversioned: stores saved before versioning)."""
+        root, _ = os.path.splitext(base_path)
+        suffix = f".{version}" if version else ""
+        return {
+            'matrix': f"{root}{suffix}.npy",
+            'scales': f"{root}{suffix}.scales.npy",
+            'sidecar': f"{root}.json"
+        }
+
+    @classmethod
+    def _read_sidecar(cls, base_path):
+        """The sidecar and the paths of the files it names (None if missing)."""
+        paths = cls.paths(base_path)
+        if not os.path.exists(paths['sidecar']):
+            return None, None
+        with open(paths['sidecar']) as f:
+            sidecar = json.load(f)
+        return sidecar, cls.paths(base_path, sidecar.get('version'))
+
+    def save(self, base_path):
+        """
+        Writes the matrix and optional scales under a new version, then
+        replaces the id sidecar to point at them. Readers see either the old
+        or the new version in full. Files of versions older than the previous
+        one are deleted (the previous one stays for readers that just read
+        the old sidecar).
+        """
+        try:
+            previous, _ = self._read_sidecar(base_path)
+        except (OSError, ValueError):
+            previous = None
+        version = uuid.uuid4().hex[:12]
+        paths = self.paths(base_path, version)
+        os.makedirs(os.path.dirname(paths['matrix']) or '.', exist_ok=True)
+        _atomic_save_npy(paths['matrix'], np.asarray(self.matrix))
+        if self.scales is not None:
+            _atomic_save_npy(paths['scales'], self.scales)
+
+        sidecar = dict(self.meta, ids=self.ids, dtype=self.dtype, dim=int(self.matrix.shape[1]), version=version)
+        tmp_path = f"{paths['sidecar']}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(sidecar, f)
+        os.replace(tmp_path, paths['sidecar'])
+        _remove_old_versions(base_path, keep={version} | ({previous.get('version')} if previous else set()))
+
+    @classmethod
+    def exists(cls, base_path):
+        """True if a finished store (sidecar and the matrix it names) is on disk."""
+        try:
+            _, paths = cls._read_sidecar(base_path)
+        except (OSError, ValueError):
+            return False
+        return paths is not None and os.path.exists(paths['matrix'])
+
+    @classmethod
+    def load(cls, base_path, mmap=True):
+        """
+        Opens a persisted store (memory-mapped by default).
+        Returns None if it is missing or inconsistent.
+        """
+        try:
+            sidecar, paths = cls._read_sidecar(base_path)
+            if sidecar is None or not os.path.exists(paths['matrix']):
+                return None
+            matrix = np.load(paths['matrix'], mmap_mode='r' if mmap else None)
+            scales = np.load(paths['scales']) if sidecar['dtype'] == 'int8' else None
+
+            sidecar.pop('version', None)
+            ids = sidecar.pop('ids')
+            if matrix.shape[0] != len(ids) or str(matrix.dtype) != sidecar.pop('dtype'):
+                logger.warning("Embedding store matrix and sidecar disagree, ignoring it.")
+                return None
+            sidecar.pop('dim', None)
+            return cls(matrix, ids, scales=scales, meta=sidecar)
+        except Exception as e:
+            logger.error(f"Failed to open embedding store: {e}")
+            return None
+
+    # --- Scoring ---
+
+    def dequantize(self, positions=None):
+        """Returns float32 rows (all rows if positions is None)."""
+        rows = self.matrix if positions is None else self.matrix[positions]
+        rows = np.asarray(rows, dtype=np.float32)
+        if self.scales is not None:
+            scales = self.scales if positions is None else self.scales[positions]
+            rows = rows * scales[:, None]
+        return rows
+
+    def scores(self, query, positions=None):
+        """
+        Inner products of the query with the stored rows, computed in blocks.
+        float32 blocks are scored in place; float16 / int8 blocks are widened
+        into one reused float32 buffer, which still makes their flat scan
+        several times slower than float32's. For int8 the query is quantized
+        as well, so these scores are approximate; `rescore` refines the final
+        ranking.
+        """
+        query = np.asarray(query, dtype=np.float32)
+        if self.needs_rescore:
+            query_scale = max(float(np.abs(query).max()) / 127.0, 1e-12)
+            query = np.round(query / query_scale)
+        else:
+            query_scale = 1.0
+
+        n = len(self) if positions is None else len(positions)
+        out = np.empty(n, dtype=np.float32)
+        widen = self.matrix.dtype != np.float32
+        block_rows = WIDEN_BLOCK_ROWS if widen else SCAN_BLOCK_ROWS
+        buffer = np.empty((min(block_rows, n), self.matrix.shape[1]), dtype=np.float32) if widen else None
+        for start in range(0, n, block_rows):
+            stop = min(start + block_rows, n)
+            if positions is None:
+                block = self.matrix[start:stop]
+                scales = None if self.scales is None else self.scales[start:stop]
+            else:
+                block = self.matrix[positions[start:stop]]
+                scales = None if self.scales is None else self.scales[positions[start:stop]]
+            if widen:
+                np.copyto(buffer[:stop - start], block, casting='unsafe')
+                block = buffer[:stop - start]
+            block_scores = out[start:stop]
+            np.matmul(block, query, out=block_scores)
+            if scales is not None:
+                block_scores *= scales * query_scale
+        return out
+
+    def rescore(self, query, positions):
+        """
+        Scores of the dequantized rows against the unquantized query. For int8
+        this removes the query's quantization error but not the rows' (about
+        1/254 of each row's largest component), so scores stay approximate:
+        the stored matrix is the only copy of the vectors.
+        """
+        return self.dequantize(positions) @ np.asarray(query, dtype=np.float32)
+
+
+def _remove_old_versions(base_path, keep):
+    """Deletes the matrix / scales files of versions not in `keep` (None is the unversioned legacy file)."""
+    root, _ = os.path.splitext(base_path)
+    directory, prefix = os.path.dirname(root) or '.', os.path.basename(root)
+    for name in os.listdir(directory):
+        if not name.startswith(f"{prefix}.") or not name.endswith('.npy'):
+            continue
+        version = name[len(prefix) + 1:-len('.npy')]
+        version = version[:-len('.scales')] if version.endswith('.scales') else version
+        if version in ('', 'scales'):
+            version = None # {prefix}.npy / {prefix}.scales.npy
+        if version not in keep:
+            try:
+                os.remove(os.path.join(directory, name))
+            except OSError:
+                pass
+
+def _atomic_save_npy(path, array):
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'wb') as f:
+        np.save(f, array)
+    os.replace(tmp_path, path)
@@ -0,0 +1,222 @@
+import os
+import json
+import hashlib
+import numpy as np
+import pandas as pd
+import streamlit as st
+from utils.query_cache import LRUCache, normalize_query
+
+# Process-wide cache of filter results (row positions, not DataFrames)
+FILTER_CACHE_SIZE = int(os.getenv("HOPON_FILTER_CACHE_SIZE", 1024))
+FILTER_CACHE_TTL = float(os.getenv("HOPON_FILTER_CACHE_TTL", 3600))
+
+# Sidebar multiselect filters: filter key -> projects column
+FACET_FILTERS = {
+    'selected_clusters': 'cluster',
+    'selected_funding_schemes': 'fundingScheme',
+}
+
+
+def filter_signature(filters, watchlist_ids=None):
+    """
+    Canonical hash of the filters that select rows: equal filters give equal
+    signatures regardless of selection order, date types or query casing.
+    The user's identity is not part of it, only their favourites when used.
+    """
+    def day(value):
+        return pd.Timestamp(value).isoformat() if value else None
+
+    canonical = {
+        'start_date': day(filters.get('start_date')),
+        'end_date': day(filters.get('end_date')),
+        'clusters': sorted(map(str, filters.get('selected_clusters') or [])),
+        'schemes': sorted(map(str, filters.get('selected_funding_schemes') or [])),
+        'id': filters.get('search_id') or None,
+        'query': normalize_query(filters.get('search_objective') or '') or None,
+        'mode': filters.get('search_mode', 'semantic') if filters.get('search_objective') else None,
+        'watchlist': None if watchlist_ids is None else sorted(map(str, watchlist_ids)),
+    }
+    return hashlib.sha1(json.dumps(canonical, sort_keys=True).encode('utf-8')).hexdigest()
+
+
+@st.cache_resource
+def get_filter_cache():
+    """Returns the filter result cache shared by every session of this process."""
+    return LRUCache(FILTER_CACHE_SIZE, FILTER_CACHE_TTL)
+
+
+class SortedColumn:
+    """Non-null values of a column sorted once, so range bounds are binary searches."""
+
+    def __init__(self, values):
+        values = pd.Series(values).reset_index(drop=True)
+        valid = np.flatnonzero(values.notna().to_numpy())
+        order = np.argsort(values.iloc[valid].to_numpy(), kind='stable')
+        self.positions = valid[order]
+        self.values = pd.Index(values.iloc[self.positions])
+
+    def at_least(self, bound):
+        """Positions with value >= bound."""
+        return self.positions[self.values.searchsorted(bound, side='left'):]
+
+    def at_most(self, bound):
+        """Positions with value <= bound."""
+        return self.positions[:self.values.searchsorted(bound, side='right')]
+
+
+class FilterEngine:
+    """
+    Precomputed filter structures over the projects frame.
+
+    - one boolean array per value of each facet column (cluster, fundingScheme)
+    - startDate / endDate sorted once, so date bounds are binary searches
+
+    `positions` combines the sidebar filters into a single mask with bitwise
+    operations and returns the matching row positions; `take` materialises
+    them once. `run` adds the semantic search and memoizes the result.
+    """
+
+    def __init__(self, projects):
+        self.projects = projects
+        self.n_rows = len(projects)
+        self.ids = pd.Index(projects['id']) if 'id' in projects.columns else pd.Index([])
+        self.version = projects.attrs.get('dataset_version') or format(
+            int(pd.util.hash_array(self.ids.to_numpy(dtype=object)).sum()) & 0xFFFFFFFFFFFFFFFF, 'x'
+        )
+
+        self.bitmaps = {}
+        for column in FACET_FILTERS.values():
+            if column not in projects.columns:
+                continue
+            codes, uniques = pd.factorize(projects[column])
+            self.bitmaps[column] = {value: codes == code for code, value in enumerate(uniques)}
+
+        self.dates = {
+            column: SortedColumn(projects[column])
+            for column in ('startDate', 'endDate') if column in projects.columns
+        }
+
+    def _bound_mask(self, positions):
+        mask = np.zeros(self.n_rows, dtype=bool)
+        mask[positions] = True
+        return mask
+
+    def _facet_mask(self, column, values):
+        """Rows whose column is any of values (bitwise OR of their bitmaps)."""
+        mask = np.zeros(self.n_rows, dtype=bool)
+        for value in values:
+            bitmap = self.bitmaps[column].get(value)
+            if bitmap is not None:
+                mask |= bitmap
+        return mask
+
+    def _facet_hits(self, column, values, positions):
+        """Which of the given positions have any of values (gathered from their bitmaps)."""
+        hits = np.zeros(len(positions), dtype=bool)
+        for value in values:
+            bitmap = self.bitmaps[column].get(value)
+            if bitmap is not None:
+                hits |= bitmap[positions]
+        return hits
+
+    def facet_delta(self, previous, filters, old_positions, new_positions):
+        """
+        Rows that entered / left the result when the only change from the
+        `previous` filters is one facet selection (e.g. a cluster was ticked).
+        Each row has a single facet value, so only the rows carrying a ticked /
+        unticked value are looked at, through its bitmap.
+
+        Both positions must be the plain filter results (`positions`) for the
+        same watchlist. Returns (entered, left), or None if anything else
+        changed or a query is set (ranked results are not the mask).
+        """
+        if previous is None or previous.get('search_objective') or filters.get('search_objective'):
+            return None
+        changed = [key for key in FACET_FILTERS if set(previous.get(key) or []) != set(filters.get(key) or [])]
+        if len(changed) != 1 or FACET_FILTERS[changed[0]] not in self.bitmaps:
+            return None
+        key = changed[0]
+        if filter_signature(dict(previous, **{key: None})) != filter_signature(dict(filters, **{key: None})):
+            return None
+
+        column = FACET_FILTERS[key]
+        before, after = set(previous.get(key) or []), set(filters.get(key) or [])
+        empty = np.empty(0, dtype=np.int64)
+        if not before: # No facet filter -> some values: rows without them leave
+            return empty, old_positions[~self._facet_hits(column, after, old_positions)]
+        if not after: # Some values -> no facet filter: rows without the old values enter
+            return new_positions[~self._facet_hits(column, before, new_positions)], empty
+        return (new_positions[self._facet_hits(column, after - before, new_positions)],
+                old_positions[self._facet_hits(column, before - after, old_positions)])
+
+    def mask(self, filters, watchlist_ids=None):
+        """
+        Boolean mask of the rows matching the sidebar filters.
+
+        Args:
+            filters: The dict returned by render_sidebar.
+            watchlist_ids: The user's favourite ids if "Show Favorites Only" is
+                on (None means the watchlist filter is off).
+        """
+        mask = np.ones(self.n_rows, dtype=bool)
+
+        if filters.get('start_date') and 'startDate' in self.dates:
+            mask &= self._bound_mask(self.dates['startDate'].at_least(pd.Timestamp(filters['start_date'])))
+        if filters.get('end_date') and 'endDate' in self.dates:
+            mask &= self._bound_mask(self.dates['endDate'].at_most(pd.Timestamp(filters['end_date'])))
+
+        for key, column in FACET_FILTERS.items():
+            if filters.get(key) and column in self.bitmaps:
+                mask &= self._facet_mask(column, filters[key])
+
+        if watchlist_ids is not None:
+            positions = self.ids.get_indexer(list(watchlist_ids))
+            mask &= self._bound_mask(positions[positions >= 0])
+
+        if filters.get('search_id'):
+            # Substring match, evaluated only on rows that are still in
+            candidates = np.flatnonzero(mask)
+            matches = self.ids[candidates].str.contains(filters['search_id'], case=False, na=False)
+            mask[candidates[~np.asarray(matches, dtype=bool)]] = False
+
+        return mask
+
+    def positions(self, filters, watchlist_ids=None):
+        """Row positions (ascending) of the projects matching the filters."""
+        return np.flatnonzero(self.mask(filters, watchlist_ids))
+
+    def run(self, filters, watchlist_ids=None, matcher=None, top_k=None):
+        """
+        Applies the filters and, if there is a query and a matcher, ranks the
+        result. Returns (positions, relevance scores or None), in display order.
+
+        Results are cached process-wide by dataset version, filter signature
+        and matcher state, so identical searches from any session are reused.
+        """
+        query = filters.get('search_objective')
+        mode = filters.get('search_mode', 'semantic')
+        search_state = None
+        if query and matcher is not None:
+            lexical_version = matcher.lexical.version if matcher.lexical is not None else None
+            search_state = (matcher.version, lexical_version, matcher.semantic_ready, top_k)
+
+        cache = get_filter_cache()
+        key = (self.version, filter_signature(filters, watchlist_ids), search_state)
+        result = cache.get(key)
+        if result is None:
+            positions = self.positions(filters, watchlist_ids)
+            scores = None
+            if search_state is not None:
+                ranked = matcher.search(query, self.take(positions), top_k=top_k, mode=mode)
+                positions = self.ids.get_indexer(ranked['id'])
+                if 'relevance_score' in ranked.columns: # Not ranked if no engine is ready
+                    scores = ranked['relevance_score'].to_numpy(dtype=np.float32)
+                    scores.setflags(write=False)
+            positions.setflags(write=False)
+            result = (positions, scores)
+            cache.put(key, result)
+        return result
+
+    def take(self, positions):
+        """The projects at the given row positions, materialised once."""
+        return self.projects.iloc[positions]
@@ -0,0 +1,184 @@
+import numpy as np
+import pandas as pd
+import streamlit as st
+from utils.filter_engine import filter_signature
+
+SESSION_KEY = 'dashboard_aggregates'
+
+
+def _codes(values):
+    codes, uniques = pd.factorize(values)
+    return codes.astype(np.int64), pd.Index(uniques)
+
+
+class AggregateIndex:
+    """
+    Per-row arrays the dashboard KPIs are summed from, built once per process:
+    project funding and cluster codes by row position, and org name / country
+    codes and ecContribution by org row (orgs reached through the OrgIndex).
+    The FilterEngine over the same projects, if given, lets facet changes be
+    applied without diffing the position sets.
+    """
+
+    def __init__(self, projects, org_index, version=None, engine=None):
+        self.org_index = org_index
+        self.engine = engine
+        self.n_rows = len(projects)
+        self.version = version or projects.attrs.get('dataset_version')
+        self.ids = projects['id'].to_numpy(dtype=object) if 'id' in projects.columns else np.empty(0, dtype=object)
+        self.funding = pd.to_numeric(projects.get('totalCost', pd.Series(0.0, index=projects.index)), errors='coerce').fillna(0).to_numpy(dtype=np.float64)
+        self.cluster_codes, self.clusters = _codes(projects['cluster'] if 'cluster' in projects.columns else pd.Series([None] * self.n_rows))
+
+        orgs = org_index.orgs
+        n_orgs = len(orgs)
+        self.name_codes, self.names = _codes(orgs['name'] if 'name' in orgs.columns else pd.Series([None] * n_orgs))
+        self.country_codes, self.countries = _codes(orgs['country'] if 'country' in orgs.columns else pd.Series([None] * n_orgs))
+        contribution = orgs['ecContribution'] if 'ecContribution' in orgs.columns else pd.Series(0.0, index=orgs.index)
+        self.contribution = pd.to_numeric(contribution, errors='coerce').fillna(0).to_numpy(dtype=np.float64)
+
+    def org_rows(self, positions):
+        """Org rows of the projects at the given row positions."""
+        return self.org_index.positions(self.ids[positions])
+
+
+class IncrementalAggregates:
+    """
+    Dashboard KPIs of one session, updated by the rows that entered or left
+    the filtered set since the previous rerun:
+
+    - total projects and funding
+    - unique participating orgs (a reference count per org name)
+    - projects and funding per cluster, funding and participations per country
+
+    Only the delta rows (and their orgs) are aggregated; if the delta is larger
+    than the new set, the aggregates are rebuilt from the new set instead.
+    When the filters are passed and only one facet selection changed, the
+    delta comes from the bitmaps of the changed values (FilterEngine.facet_delta);
+    otherwise it is the set difference of the old and new positions. A rerun
+    with the same filter signature (filters and watchlist) is an empty delta;
+    with a search query the positions must also be the same cached result,
+    since the ranking can change while the filters do not (e.g. after warm-up).
+    """
+
+    def __init__(self, index):
+        self.index = index
+        self.version = index.version
+        self.reset()
+
+    def reset(self):
+        """Empties the aggregates (no rows selected)."""
+        index = self.index
+        self.positions = np.empty(0, dtype=np.int64)
+        self.filters = None
+        self.watchlist_ids = None
+        self.signature = None
+        self.source = None
+        self.projects = 0
+        self.funding = 0.0
+        self.cluster_projects = np.zeros(len(index.clusters), dtype=np.int64)
+        self.cluster_sums = np.zeros(len(index.clusters), dtype=np.float64)
+        self.org_refcounts = np.zeros(len(index.names), dtype=np.int64)
+        self.unique_orgs = 0
+        self.country_rows = np.zeros(len(index.countries), dtype=np.int64)
+        self.country_funding = np.zeros(len(index.countries), dtype=np.float64)
+
+    def _apply(self, positions, sign):
+        if len(positions) == 0:
+            return
+        index = self.index
+        self.projects += sign * len(positions)
+        self.funding += sign * index.funding[positions].sum()
+
+        clusters = index.cluster_codes[positions]
+        valid = clusters >= 0
+        self.cluster_projects += sign * np.bincount(clusters[valid], minlength=len(self.cluster_projects))
+        self.cluster_sums += sign * np.bincount(clusters[valid], weights=index.funding[positions][valid], minlength=len(self.cluster_sums))
+
+        rows = index.org_rows(positions)
+        countries = index.country_codes[rows]
+        valid = countries >= 0
+        self.country_rows += sign * np.bincount(countries[valid], minlength=len(self.country_rows))
+        self.country_funding += sign * np.bincount(countries[valid], weights=index.contribution[rows][valid], minlength=len(self.country_funding))
+
+        # An org is counted while at least one of its rows is in the set
+        names, counts = np.unique(index.name_codes[rows], return_counts=True)
+        counts, names = counts[names >= 0], names[names >= 0]
+        before = self.org_refcounts[names]
+        after = before + sign * counts
+        self.org_refcounts[names] = after
+        self.unique_orgs += int(((before == 0) & (after > 0)).sum()) - int(((before > 0) & (after == 0)).sum())
+
+    def _facet_delta(self, positions, filters, watchlist_ids):
+        engine = self.index.engine
+        if engine is None or filters is None or self.filters is None:
+            return None
+        if (watchlist_ids is None) != (self.watchlist_ids is None) or (
+                watchlist_ids is not None and self.watchlist_ids != watchlist_ids):
+            return None
+        return engine.facet_delta(self.filters, filters, self.positions, positions)
+
+    def update(self, positions, filters=None, watchlist_ids=None):
+        """
+        Moves the aggregates to the rows at `positions` (any order).
+
+        Args:
+            positions: The filtered row positions.
+            filters: The sidebar filters that produced them, if known.
+            watchlist_ids: The watchlist they were filtered with (None if off).
+        """
+        source = positions
+        watchlist_ids = None if watchlist_ids is None else frozenset(map(str, watchlist_ids))
+        signature = None if filters is None else filter_signature(filters, watchlist_ids)
+        if signature is not None and signature == self.signature and (
+                not filters.get('search_objective') or source is self.source):
+            return self
+        positions = np.asarray(positions, dtype=np.int64)
+        delta = self._facet_delta(positions, filters, watchlist_ids)
+        if delta is None:
+            positions = np.unique(positions)
+            added = np.setdiff1d(positions, self.positions, assume_unique=True)
+            removed = np.setdiff1d(self.positions, positions, assume_unique=True)
+        else:
+            added, removed = delta
+        if len(added) + len(removed) > len(positions):
+            self.reset()
+            added, removed = positions, np.empty(0, dtype=np.int64)
+        self._apply(removed, -1)
+        self._apply(added, 1)
+        self.positions = positions
+        self.filters = None if filters is None else dict(filters)
+        self.watchlist_ids = watchlist_ids
+        self.signature = signature
+        self.source = source
+        return self
+
+    def totals(self):
+        return {'projects': self.projects, 'funding': float(self.funding), 'orgs': self.unique_orgs}
+
+    # Same interface as CubeSlice, so the charts accept either
+    def cluster_counts(self):
+        """Projects per cluster (clusters without projects omitted)."""
+        counts = pd.Series(self.cluster_projects, index=self.index.clusters)
+        return counts[counts > 0].sort_values(ascending=False)
+
+    def cluster_funding(self):
+        funding = pd.Series(self.cluster_sums, index=self.index.clusters)
+        return funding[self.cluster_projects > 0].sort_index()
+
+    def country_stats(self):
+        """Per country: total ecContribution and number of participations."""
+        stats = pd.DataFrame({
+            'country': self.index.countries,
+            'TotalFunding': self.country_funding,
+            'ProjectCount': self.country_rows,
+        })
+        return stats[stats['ProjectCount'] > 0].sort_values('country').reset_index(drop=True)
+
+
+def get_session_aggregates(index):
+    """This session's IncrementalAggregates, reset when the dataset changes."""
+    aggregates = st.session_state.get(SESSION_KEY)
+    if aggregates is None or aggregates.index is not index or aggregates.version != index.version:
+        aggregates = IncrementalAggregates(index)
+        st.session_state[SESSION_KEY] = aggregates
+    return aggregates
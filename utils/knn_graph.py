@@ -0,0 +1,153 @@
+import os
+import numpy as np
+import pandas as pd
+from utils.logger import logger
+from utils.vector_index import top_k_per_row
+
+# Neighbours stored per project and rows per matrix-multiplication block
+DEFAULT_NEIGHBOURS = 20
+BLOCK_ROWS = 1024
+
+
+def _top_neighbours(scores, n_neighbours):
+    """Row-wise top-n (positions, scores) of a score block, best first, padded with -1."""
+    n_rows, n_cols = scores.shape
+    k = min(n_neighbours, n_cols)
+    positions = np.full((n_rows, n_neighbours), -1, dtype=np.int32)
+    values = np.full((n_rows, n_neighbours), -np.inf, dtype=np.float32)
+    positions[:, :k], values[:, :k] = top_k_per_row(scores, k)
+    # Excluded pairs (scored -inf) are not neighbours
+    positions[~np.isfinite(values)] = -1
+    return positions, values
+
+
+class KnnGraph:
+    """
+    Precomputed project-to-project similarity graph: for every project, the
+    positions and cosine scores of its nearest neighbours (best first, -1 padded).
+    """
+
+    def __init__(self, ids, neighbours, scores):
+        self.ids = list(ids)
+        self.neighbours = neighbours
+        self.scores = scores
+
+    def __len__(self):
+        return len(self.ids)
+
+    @property
+    def n_neighbours(self):
+        return self.neighbours.shape[1]
+
+    @classmethod
+    def build(cls, matrix, ids, n_neighbours=DEFAULT_NEIGHBOURS, block_rows=BLOCK_ROWS):
+        """Builds the full graph with blocked matrix multiplications."""
+        logger.info(f"Building similarity graph for {len(matrix)} projects...")
+        neighbours, scores = cls._compute_rows(matrix, np.arange(len(matrix)), n_neighbours, block_rows)
+        return cls(ids, neighbours, scores)
+
+    @staticmethod
+    def _compute_rows(matrix, rows, n_neighbours, block_rows=BLOCK_ROWS):
+        """Exact neighbour lists for the given row positions."""
+        neighbours = np.full((len(rows), n_neighbours), -1, dtype=np.int32)
+        scores = np.full((len(rows), n_neighbours), -np.inf, dtype=np.float32)
+        for start in range(0, len(rows), block_rows):
+            block = rows[start:start + block_rows]
+            block_scores = matrix[block] @ matrix.T
+            block_scores[np.arange(len(block)), block] = -np.inf # Not your own neighbour
+            neighbours[start:start + len(block)], scores[start:start + len(block)] = _top_neighbours(block_scores, n_neighbours)
+        return neighbours, scores
+
+    def update(self, matrix, ids, changed, block_rows=BLOCK_ROWS):
+        """
+        Returns the graph for a new corpus, recomputing only what changed.
+
+        Args:
+            matrix: Normalised float matrix of the new corpus.
+            ids: Project ids of the new corpus (row order of matrix).
+            changed: Positions (in the new corpus) of new or re-encoded projects.
+        """
+        n = len(ids)
+        n_neighbours = self.n_neighbours
+        changed = np.asarray(changed, dtype=np.int64)
+        is_changed = np.zeros(n, dtype=bool)
+        is_changed[changed] = True
+
+        # Old position -> new position (-1 if the project was deleted)
+        old_to_new = pd.Index(ids).get_indexer(self.ids)
+        new_to_old = np.full(n, -1, dtype=np.int64)
+        new_to_old[old_to_new[old_to_new >= 0]] = np.flatnonzero(old_to_new >= 0)
+
+        # Projects that were not in the old graph are treated as changed
+        is_changed |= new_to_old < 0
+        changed = np.flatnonzero(is_changed)
+        unchanged = np.flatnonzero(~is_changed)
+
+        neighbours = np.full((n, n_neighbours), -1, dtype=np.int32)
+        scores = np.full((n, n_neighbours), -np.inf, dtype=np.float32)
+
+        # 1. New / edited projects get exact neighbour lists
+        if len(changed):
+            neighbours[changed], scores[changed] = self._compute_rows(matrix, changed, n_neighbours, block_rows)
+
+        # 2. Unchanged projects keep valid old neighbours and merge in the changed ones
+        incomplete = []
+        for start in range(0, len(unchanged), block_rows):
+            block = unchanged[start:start + block_rows]
+            old_rows = new_to_old[block]
+            old_neighbours = self.neighbours[old_rows]
+            remapped = np.where(old_neighbours >= 0, old_to_new[np.maximum(old_neighbours, 0)], -1)
+            valid = remapped >= 0
+            valid[valid] = ~is_changed[remapped[valid]] # Stale scores of edited neighbours
+            kept_scores = np.where(valid, self.scores[old_rows], -np.inf).astype(np.float32)
+            kept = np.where(valid, remapped, -1)
+
+            if len(changed):
+                fresh_scores = matrix[block] @ matrix[changed].T
+                candidates = np.hstack([kept, np.broadcast_to(changed, (len(block), len(changed)))])
+                candidate_scores = np.hstack([kept_scores, fresh_scores.astype(np.float32)])
+            else:
+                candidates, candidate_scores = kept, kept_scores
+
+            top, top_scores = _top_neighbours(candidate_scores, n_neighbours)
+            rows_idx = np.arange(len(block))[:, None]
+            neighbours[block] = np.where(top >= 0, candidates[rows_idx, np.maximum(top, 0)], -1)
+            scores[block] = top_scores
+
+            # Unchanged projects outside the old list score at most the old worst
+            # neighbour; if the merged list now ends below that (neighbours were
+            # deleted or edited), the row may be missing true neighbours.
+            old_threshold = self.scores[old_rows, -1]
+            incomplete.extend(block[scores[block][:, -1] < old_threshold].tolist())
+
+        if incomplete:
+            incomplete = np.array(incomplete)
+            neighbours[incomplete], scores[incomplete] = self._compute_rows(matrix, incomplete, n_neighbours, block_rows)
+
+        logger.info(f"Similarity graph updated: {len(changed)} changed, {len(incomplete)} repaired, {len(unchanged) - len(incomplete)} reused.")
+        return KnnGraph(ids, neighbours, scores)
+
+    def lookup(self, position):
+        """Returns (positions, scores) of a project's neighbours, best first."""
+        row = self.neighbours[position]
+        valid = row >= 0
+        return row[valid], self.scores[position][valid]
+
+    def save(self, path):
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, 'wb') as f:
+            np.savez(f, ids=np.array(self.ids, dtype=str), neighbours=self.neighbours, scores=self.scores)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path):
+        """Loads a persisted graph, or returns None if missing/unreadable."""
+        if not os.path.exists(path):
+            return None
+        try:
+            with np.load(path) as data:
+                return cls(data['ids'].tolist(), data['neighbours'], data['scores'])
+        except Exception as e:
+            logger.error(f"Failed to load similarity graph: {e}")
+            return None
@@ -0,0 +1,202 @@
+import os
+import re
+import hashlib
+import numpy as np
+from utils.logger import logger
+
+# BM25 parameters
+BM25_K1 = 1.2
+BM25_B = 0.75
+# Reciprocal rank fusion damping constant
+RRF_K = 60
+
+# Compound tokens keep codes such as "horizon-hlth-2024-disease-13-01" or "m-care" whole
+_TOKEN_RE = re.compile(r"[0-9a-z]+(?:[-_./][0-9a-z]+)*")
+_SPLIT_RE = re.compile(r"[-_./]")
+
+
+def tokenize(text):
+    """
+    Lower-cases and tokenizes text. Compound tokens (acronyms, topic codes)
+    are emitted whole and as their parts, so both "M-CARE" and "care" match.
+    """
+    tokens = []
+    for token in _TOKEN_RE.findall(str(text).lower()):
+        tokens.append(token)
+        if _SPLIT_RE.search(token):
+            tokens.extend(part for part in _SPLIT_RE.split(token) if part)
+    return tokens
+
+
+def build_documents(df):
+    """Builds the lexical text of each project (acronym, title, topics, objective)."""
+    cols = [c for c in ['acronym', 'title', 'topics', 'objective'] if c in df.columns]
+    return [" ".join(str(v) for v in values if isinstance(v, str)) for values in zip(*(df[c] for c in cols))]
+
+
+def documents_version(documents):
+    """Fingerprint of the indexed text, used to validate a persisted index."""
+    digest = hashlib.sha1()
+    for doc in documents:
+        digest.update(doc.encode('utf-8'))
+        digest.update(b"\0")
+    return digest.hexdigest()
+
+
+class BM25Index:
+    """
+    Okapi BM25 inverted index stored as CSR postings lists:
+    term t's postings are doc_positions[offsets[t]:offsets[t + 1]] with their
+    term frequencies in term_freqs.
+    """
+
+    def __init__(self, ids, terms, offsets, doc_positions, term_freqs, doc_lengths, version=None):
+        self.ids = list(ids)
+        self.terms = list(terms)
+        self.term_ids = {term: i for i, term in enumerate(self.terms)}
+        self.offsets = offsets
+        self.doc_positions = doc_positions
+        self.term_freqs = term_freqs
+        self.doc_lengths = doc_lengths
+        self.version = version
+
+        n_docs = len(self.ids)
+        doc_freqs = np.diff(offsets)
+        self.idf = np.log(1 + (n_docs - doc_freqs + 0.5) / (doc_freqs + 0.5)).astype(np.float32)
+        self.avg_length = float(doc_lengths.mean()) if n_docs else 0.0
+
+    def __len__(self):
+        return len(self.ids)
+
+    @classmethod
+    def build(cls, ids, documents):
+        """Tokenizes the documents and builds the postings lists."""
+        vocabulary = {}
+        term_col, doc_col, tf_col = [], [], []
+        doc_lengths = np.zeros(len(documents), dtype=np.float32)
+
+        for position, doc in enumerate(documents):
+            tokens = tokenize(doc)
+            doc_lengths[position] = len(tokens)
+            counts = {}
+            for token in tokens:
+                counts[token] = counts.get(token, 0) + 1
+            for token, tf in counts.items():
+                term_col.append(vocabulary.setdefault(token, len(vocabulary)))
+                doc_col.append(position)
+                tf_col.append(tf)
+
+        # Renumber terms alphabetically and sort postings by term
+        terms = sorted(vocabulary)
+        remap = np.empty(len(vocabulary), dtype=np.int64)
+        remap[[vocabulary[t] for t in terms]] = np.arange(len(terms))
+        term_col = remap[np.array(term_col, dtype=np.int64)]
+        order = np.argsort(term_col, kind='stable')
+
+        offsets = np.concatenate(([0], np.cumsum(np.bincount(term_col, minlength=len(terms))))).astype(np.int64)
+        return cls(
+            ids, terms, offsets,
+            np.array(doc_col, dtype=np.int32)[order],
+            np.array(tf_col, dtype=np.float32)[order],
+            doc_lengths,
+            version=documents_version(documents)
+        )
+
+    def has_term(self, term):
+        return term in self.term_ids
+
+    def matches_code(self, query):
+        """
+        True if the query is a single compound/alphanumeric token (acronym,
+        topic code) that occurs in the index, e.g. "M-CARE".
+        """
+        text = str(query).strip().lower()
+        if not _TOKEN_RE.fullmatch(text):
+            return False
+        is_code = bool(_SPLIT_RE.search(text)) or any(ch.isdigit() for ch in text)
+        return is_code and self.has_term(text)
+
+    def search(self, query, k=None, candidates=None):
+        """
+        Returns (positions, scores) of the best BM25 matches, best first.
+        Only the postings of the query terms are touched.
+
+        Args:
+            query: Free-text query.
+            k: Number of results (None returns every match).
+            candidates: Optional boolean mask over documents.
+        """
+        term_ids = [self.term_ids[t] for t in dict.fromkeys(tokenize(query)) if t in self.term_ids]
+        if not term_ids:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+
+        docs, contributions = [], []
+        for t in term_ids:
+            postings = self.doc_positions[self.offsets[t]:self.offsets[t + 1]]
+            tf = self.term_freqs[self.offsets[t]:self.offsets[t + 1]]
+            norm = BM25_K1 * (1 - BM25_B + BM25_B * self.doc_lengths[postings] / self.avg_length)
+            docs.append(postings)
+            contributions.append(self.idf[t] * tf * (BM25_K1 + 1) / (tf + norm))
+
+        docs = np.concatenate(docs)
+        contributions = np.concatenate(contributions)
+        if candidates is not None:
+            keep = candidates[docs]
+            docs, contributions = docs[keep], contributions[keep]
+
+        positions, inverse = np.unique(docs, return_inverse=True)
+        scores = np.bincount(inverse, weights=contributions, minlength=len(positions)).astype(np.float32)
+        order = np.argsort(-scores, kind='stable')
+        if k is not None:
+            order = order[:k]
+        return positions[order].astype(np.int64), scores[order]
+
+    def save(self, path):
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, 'wb') as f:
+            np.savez(
+                f,
+                ids=np.array(self.ids, dtype=str),
+                terms=np.array(self.terms, dtype=str),
+                offsets=self.offsets,
+                doc_positions=self.doc_positions,
+                term_freqs=self.term_freqs,
+                doc_lengths=self.doc_lengths,
+                version=np.array(self.version or "")
+            )
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path):
+        """Loads a persisted index, or returns None if missing/unreadable."""
+        if not os.path.exists(path):
+            return None
+        try:
+            with np.load(path) as data:
+                return cls(
+                    data['ids'].tolist(), data['terms'].tolist(), data['offsets'],
+                    data['doc_positions'], data['term_freqs'], data['doc_lengths'],
+                    version=str(data['version'])
+                )
+        except Exception as e:
+            logger.error(f"Failed to load BM25 index: {e}")
+            return None
+
+
+def reciprocal_rank_fusion(rankings, k=None, rrf_k=RRF_K):
+    """
+    Fuses several ranked position arrays: score(d) = sum 1 / (rrf_k + rank).
+    Returns (positions, scores), best first.
+    """
+    rankings = [np.asarray(r, dtype=np.int64) for r in rankings if len(r)]
+    if not rankings:
+        return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+    docs = np.concatenate(rankings)
+    contributions = np.concatenate([1.0 / (rrf_k + np.arange(1, len(r) + 1)) for r in rankings])
+    positions, inverse = np.unique(docs, return_inverse=True)
+    scores = np.bincount(inverse, weights=contributions).astype(np.float32)
+    order = np.argsort(-scores, kind='stable')
+    if k is not None:
+        order = order[:k]
+    return positions[order], scores[order]
@@ -1,13 +1,44 @@
 import pandas as pd
 import numpy as np
 import os
-import pickle
-from sentence_transformers import SentenceTransformer, util
+import hashlib
+from sentence_transformers import SentenceTransformer
 from utils.logger import logger
+from utils.embedding_store import EmbeddingStore, SCAN_BLOCK_ROWS
+from utils.knn_graph import KnnGraph, DEFAULT_NEIGHBOURS
+from utils.query_cache import get_query_cache, normalize_query
+from utils.lexical import BM25Index, build_documents, documents_version, reciprocal_rank_fusion
+from utils.vector_index import as_float_matrix, build_index, load_index, rank_positions, top_k_per_row, IVF_RECALL_TARGET
 import streamlit as st
 
 # Global Constants
-EMBEDDINGS_FILE = "data/processed/embeddings.pkl"
+MODEL_NAME = 'all-MiniLM-L6-v2'
+EMBEDDINGS_FILE = "data/processed/embeddings.npy"
+INDEX_FILE = "data/processed/vector_index.npz"
+KNN_GRAPH_FILE = "data/processed/knn_graph.npz"
+LEXICAL_INDEX_FILE = "data/processed/bm25_index.npz"
+
+# On-disk precision of the embedding matrix: 'float32', 'float16' or 'int8'
+# (float16 halves memory; float32 flat scans are several times faster)
+EMBEDDING_DTYPE = os.getenv("HOPON_EMBEDDING_DTYPE", "float16")
+
+# Vector index configuration: 'flat' (exact), 'ivf' (approximate) or 'auto'.
+# The approximate index probes enough lists to reach HOPON_IVF_RECALL (recall@100,
+# measured when it is built); HOPON_IVF_NPROBE fixes the number of lists instead.
+INDEX_TYPE = os.getenv("HOPON_VECTOR_INDEX", "auto")
+INDEX_N_PROBE = int(os.environ["HOPON_IVF_NPROBE"]) if os.getenv("HOPON_IVF_NPROBE") else None
+INDEX_RECALL = float(os.getenv("HOPON_IVF_RECALL", IVF_RECALL_TARGET))
+
+# Neighbours precomputed per project for "Similar Projects"
+GRAPH_NEIGHBOURS = int(os.getenv("HOPON_GRAPH_NEIGHBOURS", DEFAULT_NEIGHBOURS))
+
+# Number of projects returned by the semantic search box
+SEMANTIC_TOP_K = 100
+
+# Search modes: 'semantic' (embeddings), 'keyword' (BM25) or 'hybrid' (both, fused)
+SEARCH_MODES = ('semantic', 'hybrid', 'keyword') # First one is the sidebar default
+# Candidates taken from each ranking before hybrid fusion
+HYBRID_DEPTH = 200
 
 @st.cache_resource
 def load_model():
@@ -16,155 +47,429 @@ def load_model():
     Cached globally to prevent reloading on every session.
     """
     try:
-        logger.info("Loading Semantic Model (all-MiniLM-L6-v2)...")
-        return SentenceTransformer('all-MiniLM-L6-v2')
+        logger.info(f"Loading Semantic Model ({MODEL_NAME})...")
+        return SentenceTransformer(MODEL_NAME)
     except Exception as e:
         logger.exception(f"Failed to load Semantic Model: {e}")
         return None
 
+def build_corpus(df):
+    """Builds the text that is embedded for each project (title + objective + topics)."""
+    return [f"{title} {objective} {topics}" for title, objective, topics in zip(df['title'], df['objective'], df['topics'])]
+
+def content_hash(text, model_name=MODEL_NAME):
+    """Cache key of one embedding: the exact encoded text and the model that encoded it."""
+    return hashlib.sha1(f"{model_name}\0{text}".encode('utf-8')).hexdigest()
+
 class ProjectMatcher:
-    def __init__(self):
-        self.model = load_model()
-        self.embeddings = None
+    def __init__(self, with_model=True):
+        # Without the model only keyword search is available (fast warm-up stage)
+        self.model = load_model() if with_model else None
+        self.embeddings = None # EmbeddingStore (memory-mapped)
         self.project_ids = None
+        self.index = None
+        self.graph = None # KnnGraph of precomputed similar projects
+        self.version = None # Fingerprint of the embedded corpus
+        self.lexical = None # BM25Index over acronym/title/topics/objective
+        self._id_index = None # id -> row position in the embedding matrix
+        self._lexical_id_index = None # id -> document position in the BM25 index
+
+    @property
+    def semantic_ready(self):
+        """True once the model and the embeddings are available."""
+        return self.model is not None and self.embeddings is not None
 
-    def encode_projects(self, df):
+    def encode_projects(self, df, encode_fn=None, allow_encode=True):
         """
         Generates or loads embeddings for the projects dataframe.
+        Cached vectors are keyed by a hash of their text and model, so only new
+        or edited projects are encoded; deleted projects are dropped.
+
+        Args:
+            df: Projects dataframe.
+            encode_fn: Optional callable(texts) -> matrix used instead of
+                model.encode (e.g. the chunked, multi-process build job).
+            allow_encode: If False, never encode; a stale artifact on disk is
+                served as-is (web processes only load finished artifacts).
         """
-        if self.model is None or df.empty:
+        if df.empty:
+            return
+
+        # The keyword index needs no model, so it is always available
+        self._load_or_build_lexical(df)
+
+        if self.model is None:
             return
 
+        project_ids = df['id'].tolist()
+        hashes = [content_hash(text) for text in build_corpus(df)]
+
         # 1. Try to load from disk first
-        if self._load_embeddings_from_disk(df):
-             return
+        store = EmbeddingStore.load(EMBEDDINGS_FILE)
+        if (store is not None and store.ids == project_ids and store.meta.get('hashes') == hashes
+                and store.dtype == EMBEDDING_DTYPE):
+            self._set_corpus(store)
+            logger.info(f"Mapped embeddings from disk ({store.dtype}, Cache Hit).")
+            self._load_or_build_index()
+            self._load_or_build_graph()
+            return
 
-        # 2. If not found or stale, re-compute
-        logger.info(f"Computing embeddings for {len(df)} projects...")
-        
-        text_corpus = df.apply(lambda x: f"{x['title']} {x['objective']} {x['topics']}", axis=1).tolist()
-        
-        # Compute embeddings
-        self.embeddings = self.model.encode(text_corpus, convert_to_tensor=True)
-        self.project_ids = df['id'].tolist()
+        if not allow_encode:
+            if store is None:
+                logger.warning("No embedding artifact found; semantic search disabled. Run scripts/build_embeddings.py.")
+                return
+            logger.warning("Embedding artifact is stale; serving it until scripts/build_embeddings.py is run.")
+            self._set_corpus(store)
+            self._load_or_build_index()
+            self._load_or_build_graph()
+            return
+
+        # 2. Reuse unchanged vectors, encode only new or edited projects
+        matrix, changed = self._sync_embeddings(df, hashes, store, encode_fn or self.model.encode)
+        self._set_corpus(EmbeddingStore.from_float(
+            matrix, project_ids, dtype=EMBEDDING_DTYPE, meta={'model': MODEL_NAME, 'hashes': hashes}
+        ))
         
         # 3. Save to disk
         self._save_embeddings_to_disk()
+        self._build_index(matrix)
+        self._update_graph(matrix, changed)
         
         logger.success("Project encoding complete (Computed & Saved).")
 
+    def _set_corpus(self, store):
+        self.embeddings = store
+        self.project_ids = store.ids
+        self._id_index = pd.Index(store.ids)
+        keys = store.meta.get('hashes') or store.ids
+        self.version = hashlib.sha1("\n".join(keys).encode('utf-8')).hexdigest()[:16]
+
+    def _sync_embeddings(self, df, hashes, store, encode_fn):
+        """
+        Returns (matrix, encoded positions): the float embedding matrix for df,
+        copying cached rows whose content hash is unchanged and encoding the rest.
+        """
+        cached_rows = {}
+        if store is not None:
+            cached_rows = {h: pos for pos, h in enumerate(store.meta.get('hashes') or [])}
+
+        reuse = np.array([cached_rows.get(h, -1) for h in hashes])
+        missing = np.flatnonzero(reuse < 0)
+
+        matrix = None
+        if len(missing) < len(hashes):
+            kept = np.flatnonzero(reuse >= 0)
+            cached = store.dequantize(reuse[kept])
+            matrix = np.empty((len(hashes), cached.shape[1]), dtype=np.float32)
+            matrix[kept] = cached
+
+        if len(missing):
+            logger.info(f"Computing embeddings for {len(missing)} of {len(df)} projects...")
+            corpus = build_corpus(df.iloc[missing])
+            encoded = as_float_matrix(encode_fn(corpus))
+            if matrix is None:
+                # Full build: the encoded rows already are the matrix, in order
+                matrix = encoded
+            else:
+                matrix[missing] = encoded
+
+        dropped = 0 if store is None else len(store) - len(set(reuse[reuse >= 0].tolist()))
+        logger.info(f"Embeddings: {len(hashes) - len(missing)} reused, {len(missing)} encoded, {dropped} dropped.")
+        return matrix, missing
+
     def _save_embeddings_to_disk(self):
-        """Saves embeddings and project IDs to a pickle file."""
+        """Saves the embedding matrix and its id sidecar, then re-opens it memory-mapped."""
         try:
-            data = {
-                'ids': self.project_ids,
-                'embeddings': self.embeddings
-            }
-            # Ensure directory exists
-            os.makedirs(os.path.dirname(EMBEDDINGS_FILE), exist_ok=True)
-            with open(EMBEDDINGS_FILE, 'wb') as f:
-                pickle.dump(data, f)
-            logger.info(f"Embeddings saved to {EMBEDDINGS_FILE}")
+            self.embeddings.save(EMBEDDINGS_FILE)
+            logger.info(f"Embeddings ({self.embeddings.dtype}) saved to {EMBEDDINGS_FILE}")
+            # Serve from the shared page-cached file instead of this process' copy
+            self._set_corpus(EmbeddingStore.load(EMBEDDINGS_FILE) or self.embeddings)
         except Exception as e:
             logger.error(f"Failed to save embeddings: {e}")
 
-    def _load_embeddings_from_disk(self, current_df):
-        """
-        Loads embeddings from disk if they match the current dataset.
-        Returns True if successful, False otherwise.
-        """
-        if not os.path.exists(EMBEDDINGS_FILE):
-            return False
-        
+    def _build_index(self, matrix=None):
+        """Builds the vector index over the current embeddings and persists it."""
+        if matrix is None:
+            matrix = self.embeddings.dequantize()
+        self.index = build_index(matrix, kind=INDEX_TYPE, n_probe=INDEX_N_PROBE, vectors=self.embeddings, recall=INDEX_RECALL)
         try:
-            with open(EMBEDDINGS_FILE, 'rb') as f:
-                data = pickle.load(f)
-            
-            cached_ids = data.get('ids', [])
-            current_ids = current_df['id'].tolist()
-            
-            # Simple validation: Check if ID lists are identical
-            # (In production, a hash of the content would be safer, but this covers add/remove)
-            if cached_ids == current_ids:
-                self.project_ids = cached_ids
-                self.embeddings = data['embeddings']
-                logger.info("Loaded embeddings from disk (Cache Hit).")
-                return True
-            else:
-                logger.warning("Cached embeddings do not match current project list (Cache Miss).")
-                return False
-                
+            self.index.save(INDEX_FILE, version=self.version)
+            logger.info(f"Vector index ({self.index.kind}) saved to {INDEX_FILE}")
+        except Exception as e:
+            logger.error(f"Failed to save vector index: {e}")
+
+    def _load_or_build_index(self):
+        """Loads the persisted vector index, rebuilding it if missing or stale."""
+        index = load_index(INDEX_FILE, self.embeddings, n_probe=INDEX_N_PROBE, version=self.version)
+        if index is None or (INDEX_TYPE != 'auto' and index.kind != INDEX_TYPE):
+            self._build_index()
+        else:
+            self.index = index
+            logger.info(f"Loaded vector index ({index.kind}) from disk.")
+
+    def _load_or_build_lexical(self, df):
+        """Loads the persisted BM25 index if it matches df, otherwise rebuilds it."""
+        ids = df['id'].tolist()
+        documents = build_documents(df)
+        index = BM25Index.load(LEXICAL_INDEX_FILE)
+        if index is not None and index.ids == ids and index.version == documents_version(documents):
+            logger.info("Loaded BM25 index from disk.")
+        else:
+            index = BM25Index.build(ids, documents)
+            try:
+                index.save(LEXICAL_INDEX_FILE)
+                logger.info(f"BM25 index ({len(index.terms)} terms) saved to {LEXICAL_INDEX_FILE}")
+            except Exception as e:
+                logger.error(f"Failed to save BM25 index: {e}")
+        self.lexical = index
+        self._lexical_id_index = pd.Index(index.ids)
+
+    def _save_graph(self):
+        try:
+            self.graph.save(KNN_GRAPH_FILE)
+            logger.info(f"Similarity graph saved to {KNN_GRAPH_FILE}")
         except Exception as e:
-            logger.error(f"Failed to load cached embeddings: {e}")
-            return False
+            logger.error(f"Failed to save similarity graph: {e}")
+
+    def _update_graph(self, matrix, changed):
+        """Updates the persisted similarity graph for changed projects only (full build if none)."""
+        graph = KnnGraph.load(KNN_GRAPH_FILE)
+        if graph is not None and graph.n_neighbours == GRAPH_NEIGHBOURS:
+            self.graph = graph.update(matrix, self.project_ids, changed)
+        else:
+            self.graph = KnnGraph.build(matrix, self.project_ids, n_neighbours=GRAPH_NEIGHBOURS)
+        self._save_graph()
+
+    def _load_or_build_graph(self):
+        """Loads the persisted similarity graph, rebuilding it if missing or stale."""
+        graph = KnnGraph.load(KNN_GRAPH_FILE)
+        if graph is not None and graph.ids == self.project_ids and graph.n_neighbours == GRAPH_NEIGHBOURS:
+            self.graph = graph
+            logger.info("Loaded similarity graph from disk.")
+            return
+        self.graph = KnnGraph.build(self.embeddings.dequantize(), self.project_ids, n_neighbours=GRAPH_NEIGHBOURS)
+        self._save_graph()
 
-    def search(self, query, df, top_k=None):
+    def _encode_query(self, query):
+        """
+        Encodes a query string into a normalised float32 vector.
+        Vectors are cached process-wide, so repeated queries skip the model.
+        """
+        cache = get_query_cache().vectors
+        text = normalize_query(query)
+        key = (MODEL_NAME, text)
+        query_vec = cache.get(key)
+        if query_vec is None:
+            query_vec = as_float_matrix(self.model.encode(text))[0]
+            query_vec.setflags(write=False)
+            cache.put(key, query_vec)
+        return query_vec
+
+    def _encode_queries(self, queries):
+        """
+        Encodes many queries with a single batched model call.
+        Cached vectors are reused; only unseen queries hit the model.
+        """
+        cache = get_query_cache().vectors
+        texts = [normalize_query(q) for q in queries]
+        vectors = [cache.get((MODEL_NAME, text)) for text in texts]
+
+        missing = sorted({text for text, vec in zip(texts, vectors) if vec is None})
+        if missing:
+            encoded = dict(zip(missing, as_float_matrix(self.model.encode(missing))))
+            for text, vec in encoded.items():
+                vec.setflags(write=False)
+                cache.put((MODEL_NAME, text), vec)
+            vectors = [encoded[text] if vec is None else vec for text, vec in zip(texts, vectors)]
+        return np.vstack(vectors)
+
+    def _candidate_mask(self, candidate_ids, id_index=None):
+        """Boolean mask over the rows of id_index (embeddings by default) for candidate_ids."""
+        id_index = self._id_index if id_index is None else id_index
+        positions = id_index.get_indexer(candidate_ids)
+        mask = np.zeros(len(id_index), dtype=bool)
+        mask[positions[positions >= 0]] = True
+        return mask
+
+    def _join_scores(self, df, ranked_ids, scores, column):
+        """
+        Selects only the ranked rows from df, in rank order, and attaches their
+        scores. Rows that are not in df are skipped.
+        """
+        rows = pd.Index(df['id']).get_indexer(ranked_ids)
+        keep = rows >= 0
+        result_df = df.iloc[rows[keep]].copy()
+        result_df[column] = np.asarray(scores)[keep].astype(float)
+        return result_df
+
+    def _rank(self, query_vec, candidates, top_k):
+        """
+        Top-k (positions, scores) among the candidate rows, best first.
+        The index scores selective candidate sets exactly over those rows only,
+        so narrow filters are cheaper, never truncated.
+        """
+        if top_k is not None and self.index is not None:
+            return self.index.search(query_vec, top_k, candidates=candidates)
+        return rank_positions(self.embeddings, query_vec, np.flatnonzero(candidates), top_k)
+
+    def _resolve_mode(self, query, mode):
+        """
+        Picks the search mode that can actually serve the query.
+        Returns None if neither engine is ready.
+        """
+        semantic_ready = self.semantic_ready
+        if mode != 'keyword' and not semantic_ready:
+            # Degraded: keyword search until the semantic engine is ready
+            return 'keyword' if self.lexical is not None else None
+        if mode == 'keyword' and self.lexical is None:
+            return 'semantic' if semantic_ready else None
+        if mode == 'hybrid' and self.lexical is not None and self.lexical.matches_code(query):
+            # Exact acronyms / topic codes resolve from the postings lists alone
+            return 'keyword'
+        return mode
+
+    def _rank_query(self, query, candidate_ids, top_k, mode):
+        """Ranks the candidates for a query in the given mode. Returns (ids, scores)."""
+        if mode == 'keyword':
+            candidates = self._candidate_mask(candidate_ids, self._lexical_id_index)
+            positions, scores = self.lexical.search(query, top_k, candidates=candidates)
+            # BM25 scores are unbounded; scale to [0, 1] for display
+            if len(scores):
+                scores = scores / scores[0]
+            return self._lexical_id_index[positions].to_numpy(), scores
+
+        candidates = self._candidate_mask(candidate_ids)
+        if mode == 'semantic':
+            positions, scores = self._rank(self._encode_query(query), candidates, top_k)
+            return self._id_index[positions].to_numpy(), scores
+
+        # Hybrid: reciprocal rank fusion of the semantic and keyword rankings
+        depth = None if top_k is None else max(top_k, HYBRID_DEPTH)
+        semantic_positions, _ = self._rank(self._encode_query(query), candidates, depth)
+        keyword_ids, _ = self._rank_query(query, candidate_ids, depth, 'keyword')
+        keyword_positions = self._id_index.get_indexer(keyword_ids)
+        positions, scores = reciprocal_rank_fusion(
+            [semantic_positions, keyword_positions[keyword_positions >= 0]], k=top_k
+        )
+        if len(scores):
+            scores = scores / scores[0]
+        return self._id_index[positions].to_numpy(), scores
+
+    def search(self, query, df, top_k=None, candidate_ids=None, mode='semantic'):
         """
         Searches the projects for the query.
-        Returns the DataFrame with a new 'Relevance' column, sorted.
+        Returns the DataFrame with a new 'relevance_score' column, sorted.
+
+        Args:
+            query: Free-text query.
+            df: Projects to rank (usually already filtered by the sidebar).
+            top_k: If given, only the top_k rows are returned, retrieved through
+                the vector index with partial selection.
+            candidate_ids: Optional id set further restricting the search.
+                Together with df it forms the candidate set; small sets are
+                scanned exactly instead of probing the IVF lists.
+            mode: 'semantic', 'keyword' (BM25) or 'hybrid' (rank fusion of both).
         """
-        if self.model is None or self.embeddings is None:
+        mode = self._resolve_mode(query, mode)
+        if mode is None:
             logger.warning("Matcher not initialized or embeddings missing.")
             return df
 
-        # Encode query
-        query_embedding = self.model.encode(query, convert_to_tensor=True)
+        ids = df['id'].to_numpy()
+        if candidate_ids is not None:
+            ids = ids[np.isin(ids, np.asarray(list(candidate_ids), dtype=object))]
 
-        # Compute Cosine Similarity
-        # util.cos_sim returns a tensor of shape (1, num_projects)
-        scores = util.cos_sim(query_embedding, self.embeddings)[0]
+        # Ranked ids are cached per dataset version, mode, query and candidate set
+        rankings = get_query_cache().rankings
+        candidates_digest = (len(ids), int(pd.util.hash_array(ids.astype(object)).sum()))
+        key = (MODEL_NAME, self.version, self.lexical.version if self.lexical else None,
+               mode, normalize_query(query), top_k, candidates_digest)
+        ranked = rankings.get(key)
+        if ranked is None:
+            ranked = self._rank_query(query, ids, top_k, mode)
+            rankings.put(key, ranked)
+        ranked_ids, scores = ranked
+        result_df = self._join_scores(df, ranked_ids, scores, 'relevance_score')
 
-        # Convert to numpy and then to list
-        scores_list = scores.cpu().numpy().tolist()
+        if mode == 'semantic' and top_k is None and candidate_ids is None and len(result_df) < len(df):
+            # Projects without an embedding yet keep their place at the bottom
+            unscored = df[~df['id'].isin(result_df['id'])].copy()
+            unscored['relevance_score'] = 0.0
+            result_df = pd.concat([result_df, unscored])
 
-        score_map = dict(zip(self.project_ids, scores_list))
-        
-        # Create a copy to avoid SettingWithCopy warnings
-        result_df = df.copy()
-        
-        # Map scores
-        result_df['relevance_score'] = result_df['id'].map(score_map).fillna(0)
-        
-        # Sort
-        result_df = result_df.sort_values('relevance_score', ascending=False)
-        
         return result_df
 
-    def get_similar_projects(self, project_id, df, top_k=5):
+    def search_many(self, queries, top_k=10, candidate_ids=None):
         """
-        Finds projects similar to the given project_id based on embeddings.
+        Batched search for many queries (saved-search digests, evaluations).
+
+        All queries are encoded in one model call and scored with one matrix
+        multiply per block of the embedding matrix.
+
+        Args:
+            queries: List of query strings.
+            top_k: Results per query.
+            candidate_ids: Optional id set restricting the searchable projects.
+
+        Returns:
+            One (ids, scores) pair of NumPy arrays per query, best first.
+        """
+        if not queries:
+            return []
+        if self.model is None or self.embeddings is None:
+            logger.warning("Matcher not initialized or embeddings missing.")
+            return [(np.array([], dtype=object), np.array([], dtype=np.float32)) for _ in queries]
+
+        query_matrix = self._encode_queries(queries)
+
+        if candidate_ids is None:
+            positions = np.arange(len(self.project_ids))
+        else:
+            positions = self._id_index.get_indexer(list(candidate_ids))
+            positions = np.unique(positions[positions >= 0])
+
+        # Running top-k over blocks keeps memory bounded on large corpora
+        best_positions = np.empty((len(queries), 0), dtype=np.int64)
+        best_scores = np.empty((len(queries), 0), dtype=np.float32)
+        for start in range(0, len(positions), SCAN_BLOCK_ROWS):
+            block = positions[start:start + SCAN_BLOCK_ROWS]
+            block_scores = query_matrix @ self.embeddings.dequantize(block).T
+            merged_scores = np.hstack([best_scores, block_scores])
+            merged_positions = np.hstack([best_positions, np.broadcast_to(block, block_scores.shape)])
+            top, best_scores = top_k_per_row(merged_scores, top_k)
+            best_positions = np.take_along_axis(merged_positions, top, axis=1)
+
+        ids = self._id_index.to_numpy(dtype=object)
+        return [(ids[row_positions], row_scores) for row_positions, row_scores in zip(best_positions, best_scores)]
+
+    def get_similar_projects(self, project_id, df, top_k=5, candidate_ids=None):
+        """
+        Finds the top_k projects in df (or candidate_ids) most similar to project_id.
         """
         if self.model is None or self.embeddings is None:
             return pd.DataFrame()
 
-        # Find index of the project
-        try:
-            # We need the integer index in the embeddings tensor
-            idx = self.project_ids.index(project_id)
-        except ValueError:
+        # We need the integer row of the project in the embedding matrix
+        idx = self._id_index.get_indexer([project_id])[0]
+        if idx < 0:
             logger.warning(f"Project ID {project_id} not found in embeddings.")
             return pd.DataFrame()
 
-        # Get embedding for this project
-        target_embedding = self.embeddings[idx]
+        # O(1) path: precomputed neighbours intersected with the filtered ids
+        if self.graph is not None:
+            positions, scores = self.graph.lookup(idx)
+            result_df = self._join_scores(df, self._id_index[positions], scores, 'similarity_score')
+            if candidate_ids is not None:
+                result_df = result_df[result_df['id'].isin(candidate_ids)]
+            # Enough neighbours survived the filters (or nothing else to find)
+            if len(result_df) >= top_k or len(positions) < self.graph.n_neighbours:
+                return result_df.head(top_k)
 
-        # Compute cosine similarity against ALL projects
-        scores = util.cos_sim(target_embedding, self.embeddings)[0]
-        
-        # Convert to list
-        scores_list = scores.cpu().numpy().tolist()
-        
-        # Map to IDs
-        score_map = dict(zip(self.project_ids, scores_list))
-        
-        # Create result DF
-        result_df = df.copy()
-        result_df['similarity_score'] = result_df['id'].map(score_map).fillna(0)
-        
-        # Sort desc
-        result_df = result_df.sort_values('similarity_score', ascending=False)
-        
-        # Filter out the project itself (similarity is 1.0)
-        result_df = result_df[result_df['id'] != project_id]
-        
-        return result_df.head(top_k)
\ No newline at end of file
+        target_embedding = self.embeddings.dequantize([idx])[0]
+
+        candidates = self._candidate_mask(df['id'] if candidate_ids is None else list(candidate_ids))
+        # Exclude the project itself (similarity is 1.0)
+        candidates[idx] = False
+
+        positions, scores = self._rank(target_embedding, candidates, top_k)
+        return self._join_scores(df, self._id_index[positions], scores, 'similarity_score')
@@ -0,0 +1,202 @@
+import os
+import time
+import threading
+import pandas as pd
+import streamlit as st
+from utils.embedding_store import EmbeddingStore
+from utils.matcher import ProjectMatcher, EMBEDDINGS_FILE, load_model
+from utils.logger import logger
+
+# Embeddings are built offline by scripts/build_embeddings.py. The web process
+# only encodes if no artifact exists yet (set HOPON_ONLINE_ENCODING=0 to never).
+ONLINE_ENCODING = os.getenv("HOPON_ONLINE_ENCODING", "1") == "1"
+# A failed warm-up is retried for the same dataset only after this many seconds
+WARMUP_RETRY_SECONDS = float(os.getenv("HOPON_WARMUP_RETRY_SECONDS", 300))
+
+
+def dataset_version(projects_df):
+    """
+    Returns a version string identifying the projects dataset.
+    Uses the version recorded by the data loader when present, otherwise
+    hashes the columns that feed the embeddings.
+    """
+    version = projects_df.attrs.get('dataset_version')
+    if version:
+        return version
+    cols = [c for c in ['id', 'title', 'objective', 'topics'] if c in projects_df.columns]
+    return format(int(pd.util.hash_pandas_object(projects_df[cols], index=False).sum()) & 0xFFFFFFFFFFFFFFFF, 'x')
+
+
+class MatcherService:
+    """
+    Process-wide owner of the current ProjectMatcher.
+
+    The matcher is built once per dataset version and shared by every session.
+    A built matcher is never mutated: a new dataset produces a new matcher that
+    replaces the old one in a single reference swap, so concurrent searches
+    always see a complete, consistent snapshot.
+
+    `start_warmup` builds it in a background thread: a keyword-only matcher is
+    published first, so pages render immediately, and the full matcher is
+    swapped in once the model and embeddings are loaded. A failed warm-up is
+    not restarted by every rerun: only a new dataset version or the end of the
+    retry cooldown (HOPON_WARMUP_RETRY_SECONDS) starts another one. A model
+    that fails to load counts as a failed warm-up. Each warm-up has a
+    generation number: a superseded thread neither reports its status nor
+    publishes its matcher.
+    """
+
+    def __init__(self):
+        self._build_lock = threading.Lock()
+        self._warmup_lock = threading.Lock()
+        self._state = (None, None, False) # (dataset version, matcher, fully built)
+        self._warmup_thread = None
+        self._warmup_version = None
+        self._generation = 0
+        self._warmup = {'state': 'idle', 'error': None, 'started_at': None, 'failed_at': None, 'timings': {}}
+
+    @property
+    def matcher(self):
+        """The current matcher snapshot (None until the first build)."""
+        return self._state[1]
+
+    @property
+    def version(self):
+        return self._state[0]
+
+    @property
+    def semantic_ready(self):
+        """True once the served matcher can answer semantic queries."""
+        matcher = self._state[1]
+        return matcher is not None and matcher.semantic_ready
+
+    def is_current(self, projects_df):
+        """True if the fully built matcher for this dataset is being served."""
+        version, _, built = self._state
+        return built and version == dataset_version(projects_df)
+
+    def status(self):
+        """Readiness and warm-up timings (seconds per stage), for display and health checks."""
+        return dict(self._warmup, timings=dict(self._warmup['timings']),
+                    version=self.version, semantic_ready=self.semantic_ready)
+
+    def start_warmup(self, projects_df):
+        """
+        Starts building the matcher for projects_df in a background thread and
+        returns immediately. Returns False if it is already built, warming up,
+        or failed for this version less than WARMUP_RETRY_SECONDS ago.
+        """
+        version = dataset_version(projects_df)
+        with self._warmup_lock:
+            if self.is_current(projects_df):
+                return False
+            thread = self._warmup_thread
+            if thread is not None and thread.is_alive() and self._warmup_version == version:
+                return False
+            failed_at = self._warmup['failed_at']
+            if failed_at is not None and self._warmup_version == version and time.time() - failed_at < WARMUP_RETRY_SECONDS:
+                return False
+            self._generation += 1
+            self._warmup_version = version
+            self._warmup = {'state': 'warming', 'error': None, 'started_at': time.time(), 'failed_at': None, 'timings': {}}
+            self._warmup_thread = threading.Thread(
+                target=self._warm_up, args=(projects_df, version, self._generation, self._warmup),
+                name="matcher-warmup", daemon=True
+            )
+            self._warmup_thread.start()
+            return True
+
+    def wait_until_ready(self, timeout=None):
+        """Blocks until the running warm-up finishes. Returns True if it did."""
+        thread = self._warmup_thread
+        if thread is not None:
+            thread.join(timeout)
+            return not thread.is_alive()
+        return True
+
+    def _is_current_generation(self, generation):
+        return generation is None or generation == self._generation
+
+    def _warm_up(self, projects_df, version, generation, status):
+        # `status` is this warm-up's own dict: a superseded thread only updates
+        # a dict that status() no longer returns
+        timings = status['timings']
+        started = time.perf_counter()
+        try:
+            # 1. Keyword-only matcher, so searches work while the model loads
+            if self.matcher is None:
+                stage = time.perf_counter()
+                lexical = ProjectMatcher(with_model=False)
+                lexical.encode_projects(projects_df)
+                with self._build_lock:
+                    if self.matcher is None and self._is_current_generation(generation):
+                        self._state = (version, lexical, False)
+                        logger.info("Keyword search available while the semantic engine warms up.")
+                timings['lexical'] = time.perf_counter() - stage
+
+            # 2. Model (download / load into memory)
+            stage = time.perf_counter()
+            if load_model() is None:
+                # load_model logs and returns None; don't keep that in its cache
+                load_model.clear()
+                raise RuntimeError("Semantic model could not be loaded")
+            timings['model'] = time.perf_counter() - stage
+
+            # 3. Embedding artifact, vector index and similarity graph
+            stage = time.perf_counter()
+            self.ensure_ready(projects_df, generation)
+            timings['embeddings'] = time.perf_counter() - stage
+
+            timings['total'] = time.perf_counter() - started
+            status['state'] = 'ready'
+            logger.success(f"Matcher warm-up finished in {timings['total']:.1f}s "
+                           f"({', '.join(f'{k} {v:.1f}s' for k, v in timings.items() if k != 'total')}).")
+        except Exception as e:
+            status['error'] = str(e)
+            status['failed_at'] = time.time()
+            status['state'] = 'failed'
+            logger.exception(f"Matcher warm-up failed: {e}")
+
+    def ensure_ready(self, projects_df, generation=None):
+        """
+        Returns a matcher for the given dataset, building it at most once per
+        version even if many sessions ask at the same time.
+
+        Raises RuntimeError if the model cannot be loaded; the model-less
+        matcher is not published as the built version. A build for a warm-up
+        `generation` that has been superseded is returned but not published.
+        """
+        version = dataset_version(projects_df)
+        current_version, matcher, built = self._state
+        if built and current_version == version:
+            return matcher
+
+        with self._build_lock:
+            # Another session may have finished the build while we waited
+            current_version, matcher, built = self._state
+            if built and current_version == version:
+                return matcher
+
+            logger.info(f"Building shared matcher for dataset version {version}...")
+            matcher = ProjectMatcher()
+            if matcher.model is None:
+                load_model.clear() # Retry the load next time instead of serving the cached None
+                raise RuntimeError("Semantic model could not be loaded")
+            allow_encode = ONLINE_ENCODING and not EmbeddingStore.exists(EMBEDDINGS_FILE)
+            matcher.encode_projects(projects_df, allow_encode=allow_encode)
+            if self._is_current_generation(generation):
+                self.swap(matcher, version)
+            else:
+                logger.info(f"Discarding matcher for dataset version {version}, a newer warm-up started.")
+            return matcher
+
+    def swap(self, matcher, version):
+        """Atomically publishes a new matcher; in-flight searches keep the old one."""
+        self._state = (version, matcher, True)
+        logger.info(f"Shared matcher now serving dataset version {version}.")
+
+
+@st.cache_resource
+def get_matcher_service():
+    """Returns the single MatcherService of this server process."""
+    return MatcherService()
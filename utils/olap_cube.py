@@ -0,0 +1,111 @@
+import numpy as np
+import pandas as pd
+from utils.filter_engine import FACET_FILTERS
+
+# Dimensions shared by every cube: what the sidebar can filter on without text
+PROJECT_DIMENSIONS = ['cluster', 'fundingScheme', 'startMonth']
+NO_MONTH = -1 # Cell of projects without a start date
+
+
+def month_number(dates):
+    """Months since year 0 (year * 12 + month - 1); NaT -> NO_MONTH."""
+    dates = pd.to_datetime(pd.Series(dates))
+    months = dates.dt.year * 12 + dates.dt.month - 1
+    return months.fillna(NO_MONTH).astype(np.int32).to_numpy()
+
+
+class DashboardCube:
+    """
+    Pre-aggregated cells for the dashboard analytics, built once per dataset.
+
+    - projects: cluster x fundingScheme x startMonth -> count, funding (totalCost)
+    - orgs: the same x country x role -> org rows, ecContribution
+    - coordinators: the same x coordinator name -> projects coordinated
+
+    All measures are additive, so any combination of cluster / scheme /
+    start-month filters is answered by summing the matching cells. Filters the
+    cube cannot express (day-precise dates, end date, id, favorites, free-text
+    or semantic search) fall back to row-level aggregation (`slice` returns None).
+    """
+
+    def __init__(self, projects, orgs):
+        dims = projects[[c for c in ('id', 'cluster', 'fundingScheme', 'startDate', 'totalCost') if c in projects.columns]].copy()
+        for column in ('cluster', 'fundingScheme'):
+            if column not in dims.columns:
+                dims[column] = pd.NA
+        if 'totalCost' not in dims.columns:
+            dims['totalCost'] = 0.0
+        dims['startMonth'] = month_number(dims['startDate']) if 'startDate' in dims.columns else NO_MONTH
+
+        self.projects = dims.groupby(PROJECT_DIMENSIONS, observed=True, dropna=False).agg(
+            count=('id', 'size'), funding=('totalCost', 'sum')
+        ).reset_index()
+
+        org_rows = pd.DataFrame(columns=['projectID', 'name', 'country', 'role', 'ecContribution'] + PROJECT_DIMENSIONS)
+        if not orgs.empty:
+            org_rows = orgs.merge(dims[['id'] + PROJECT_DIMENSIONS], left_on='projectID', right_on='id', how='inner')
+        self.orgs = org_rows.groupby(PROJECT_DIMENSIONS + ['country', 'role'], observed=True, dropna=False).agg(
+            rows=('projectID', 'size'), ecContribution=('ecContribution', 'sum')
+        ).reset_index()
+
+        coordinators = org_rows[org_rows['role'].astype(str).str.contains('coordinator', case=False, na=False)]
+        self.coordinators = coordinators.groupby(PROJECT_DIMENSIONS + ['name'], observed=True, dropna=False).size().rename('projects').reset_index()
+
+    def supports(self, filters, watchlist_ids=None):
+        """True if the filters can be answered from cube cells alone."""
+        start_date = filters.get('start_date')
+        return not (
+            filters.get('end_date') or filters.get('search_id') or filters.get('search_objective')
+            or watchlist_ids is not None
+            or (start_date and pd.Timestamp(start_date).day != 1)
+        )
+
+    def slice(self, filters, watchlist_ids=None):
+        """The cells matching the filters, or None if the cube cannot answer them."""
+        if not self.supports(filters, watchlist_ids):
+            return None
+        return CubeSlice(self, filters)
+
+
+class CubeSlice:
+    """Aggregates of one filter state, computed by summing the matching cells."""
+
+    def __init__(self, cube, filters):
+        self.cube = cube
+        self.filters = filters
+
+    def _cells(self, table):
+        mask = np.ones(len(table), dtype=bool)
+        for key, column in FACET_FILTERS.items():
+            if self.filters.get(key):
+                mask &= table[column].isin(self.filters[key]).to_numpy()
+        if self.filters.get('start_date'):
+            bound = month_number([self.filters['start_date']])[0]
+            mask &= table['startMonth'].to_numpy() >= bound
+        return table[mask]
+
+    def totals(self):
+        cells = self._cells(self.cube.projects)
+        return {'projects': int(cells['count'].sum()), 'funding': float(cells['funding'].sum())}
+
+    def cluster_counts(self):
+        """Projects per cluster (clusters without projects omitted)."""
+        counts = self._cells(self.cube.projects).groupby('cluster', observed=True)['count'].sum()
+        return counts[counts > 0].sort_values(ascending=False)
+
+    def cluster_funding(self):
+        return self._cells(self.cube.projects).groupby('cluster', observed=True)['funding'].sum()
+
+    def country_stats(self):
+        """Per country: total ecContribution and number of participations."""
+        cells = self._cells(self.cube.orgs)
+        stats = cells.groupby('country', observed=True).agg(
+            TotalFunding=('ecContribution', 'sum'), ProjectCount=('rows', 'sum')
+        ).reset_index()
+        return stats[stats['ProjectCount'] > 0]
+
+    def top_coordinators(self, n=10):
+        """The n coordinators with the most projects, most first."""
+        counts = self._cells(self.cube.coordinators).groupby('name', observed=True)['projects'].sum()
+        counts = counts[counts > 0].reset_index().sort_values(['projects', 'name'], ascending=[False, True])
+        return counts.head(n)
@@ -0,0 +1,53 @@
+import numpy as np
+import pandas as pd
+
+
+class OrgIndex:
+    """
+    CSR index from project id to the rows of an organizations frame.
+
+    The org rows of the i-th indexed project are
+    rows[offsets[i]:offsets[i + 1]] (positions in `orgs`, original order),
+    so the orgs of one project are a slice and the orgs of an id set a gather.
+    """
+
+    def __init__(self, orgs):
+        self.orgs = orgs
+        if orgs.empty or 'projectID' not in orgs.columns:
+            codes, uniques = np.empty(0, dtype=np.int64), []
+        else:
+            codes, uniques = pd.factorize(orgs['projectID'])
+
+        valid = np.flatnonzero(codes >= 0)
+        self.project_ids = pd.Index(uniques)
+        self.rows = valid[np.argsort(codes[valid], kind='stable')]
+        counts = np.bincount(codes[valid], minlength=len(uniques))
+        self.offsets = np.concatenate(([0], np.cumsum(counts))).astype(np.int64)
+
+    def __len__(self):
+        return len(self.project_ids)
+
+    def positions(self, project_ids):
+        """
+        Row positions (ascending, i.e. in frame order) of the orgs of all the
+        given projects. Unknown ids are ignored.
+        """
+        idx = self.project_ids.get_indexer(pd.unique(np.asarray(project_ids, dtype=object)))
+        idx = idx[idx >= 0]
+        starts = self.offsets[idx]
+        lengths = self.offsets[idx + 1] - starts
+        # Expand the [start, start + length) ranges without a Python loop
+        output_starts = np.cumsum(lengths) - lengths
+        ranges = np.repeat(starts - output_starts, lengths) + np.arange(lengths.sum())
+        return np.sort(self.rows[ranges])
+
+    def orgs_for(self, project_ids):
+        """Orgs of the given projects (same rows as orgs[orgs['projectID'].isin(project_ids)])."""
+        return self.orgs.iloc[self.positions(project_ids)]
+
+    def orgs_for_project(self, project_id):
+        """Orgs of a single project."""
+        i = self.project_ids.get_indexer([project_id])[0]
+        if i < 0:
+            return self.orgs.iloc[:0]
+        return self.orgs.iloc[self.rows[self.offsets[i]:self.offsets[i + 1]]]
@@ -0,0 +1,65 @@
+import pyarrow as pa
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+from pyarrow import fs
+
+
+def filters_to_expression(filters):
+    """
+    Converts filters into a pyarrow expression.
+
+    Filters use the `pd.read_parquet` convention: a list of
+    (column, op, value) tuples that are AND-ed, e.g.
+    [('country', 'in', ['DE', 'FR']), ('startDate', '>=', pd.Timestamp('2025-01-01'))].
+    """
+    if not filters:
+        return None
+    return pq.filters_to_expression([list(f) for f in filters])
+
+
+class ParquetSource:
+    """
+    Memory-mapped Parquet file read through a pyarrow Dataset.
+
+    Only the requested columns are read (projection) and row groups that
+    cannot match the filters are skipped (predicate pushdown). `table` returns
+    Arrow data; `to_pandas` converts the whole projected table eagerly, so
+    callers save memory only by asking for fewer columns.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.dataset = ds.dataset(path, format='parquet', filesystem=fs.LocalFileSystem(use_mmap=True))
+
+    @property
+    def columns(self):
+        return self.dataset.schema.names
+
+    def table(self, columns=None, filters=None):
+        """Reads an Arrow table; unknown columns are ignored."""
+        if columns is not None:
+            columns = [c for c in columns if c in self.columns]
+        return self.dataset.to_table(columns=columns, filter=filters_to_expression(filters))
+
+    def to_pandas(self, columns=None, filters=None):
+        """Reads and converts the projected, filtered table to pandas in one go."""
+        return table_to_pandas(self.table(columns, filters))
+
+
+def table_to_pandas(table):
+    """
+    Converts an Arrow table to pandas with as few copies as possible:
+    one block per column (no consolidation copy) and Arrow buffers released
+    as soon as each column is converted.
+    """
+    return table.to_pandas(split_blocks=True, self_destruct=True)
+
+
+def select_frame(df, columns=None, filters=None):
+    """Applies the same projection and filters to an in-memory DataFrame."""
+    if filters:
+        table = pa.Table.from_pandas(df, preserve_index=False)
+        df = table_to_pandas(table.filter(filters_to_expression(filters)))
+    if columns is not None:
+        df = df[[c for c in columns if c in df.columns]]
+    return df
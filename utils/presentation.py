@@ -0,0 +1,58 @@
+import numpy as np
+import pandas as pd
+
+DOI_BASE_URL = "https://doi.org/"
+OBJECTIVE_PREVIEW_CHARS = 200
+
+
+def doi_urls(dois):
+    """DOI -> clickable URL; missing or blank DOIs -> None."""
+    dois = pd.Series(dois, dtype=object)
+    valid = dois.notna() & (dois.astype(str).str.strip() != '')
+    urls = (DOI_BASE_URL + dois.astype(str)).astype(object)
+    return urls.where(valid, None)
+
+
+def cost_labels(costs):
+    """Costs in euros -> '€1.2M' labels; missing costs -> None."""
+    costs = pd.to_numeric(pd.Series(costs), errors='coerce').to_numpy(dtype=np.float64)
+    labels = pd.Series(np.char.mod('€%.1fM', costs / 1_000_000), dtype=object)
+    return labels.where(~np.isnan(costs), None)
+
+
+def objective_previews(objectives, chars=OBJECTIVE_PREVIEW_CHARS):
+    """First `chars` characters of each objective followed by '...'."""
+    return pd.Series(objectives, dtype=object).fillna('').astype(str).str.slice(0, chars) + "..."
+
+
+class PresentationView:
+    """
+    Display-only columns of the projects frame, computed once (vectorized)
+    per dataset and aligned with it by row position:
+
+    - doiUrl: the grantDoi as a https://doi.org/ link
+    - costLabel: totalCost formatted in millions
+    - objectivePreview: the truncated objective shown on the project cards
+    """
+
+    def __init__(self, projects, version=None):
+        self.version = version or projects.attrs.get('dataset_version')
+        self.ids = pd.Index(projects['id']) if 'id' in projects.columns else pd.Index([])
+        n = len(projects)
+        self.frame = pd.DataFrame({
+            'doiUrl': doi_urls(projects['grantDoi']).to_numpy() if 'grantDoi' in projects.columns else [None] * n,
+            'costLabel': cost_labels(projects['totalCost']).to_numpy() if 'totalCost' in projects.columns else [None] * n,
+            'objectivePreview': objective_previews(projects['objective']).to_numpy() if 'objective' in projects.columns else ["..."] * n,
+        }, dtype=object) # Missing links / costs stay None
+
+    def __len__(self):
+        return len(self.frame)
+
+    def take(self, positions):
+        """Display columns of the projects at the given row positions."""
+        return self.frame.iloc[positions]
+
+    def for_ids(self, ids):
+        """Display columns of the given project ids (unknown ids are skipped)."""
+        positions = self.ids.get_indexer(list(ids))
+        return self.take(positions[positions >= 0])
@@ -0,0 +1,104 @@
+import os
+import time
+import threading
+from collections import OrderedDict
+import streamlit as st
+
+QUERY_CACHE_SIZE = int(os.getenv("HOPON_QUERY_CACHE_SIZE", 2048))
+QUERY_CACHE_TTL = float(os.getenv("HOPON_QUERY_CACHE_TTL", 3600))
+
+
+def normalize_query(text):
+    """Canonical form of a query: case-folded with collapsed whitespace."""
+    return " ".join(str(text).casefold().split())
+
+
+class LRUCache:
+    """
+    Thread-safe, size-bounded LRU cache with a time-to-live.
+    Tracks hits, misses and evictions.
+    """
+
+    def __init__(self, maxsize=QUERY_CACHE_SIZE, ttl=QUERY_CACHE_TTL):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data = OrderedDict() # key -> (expires_at, value)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __len__(self):
+        return len(self._data)
+
+    def get(self, key, default=None):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is not None and entry[0] > time.monotonic():
+                self._data.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+            if entry is not None:
+                del self._data[key] # Expired
+            self.misses += 1
+            return default
+
+    def peek(self, key, default=None):
+        """Like get, without counting a hit / miss or refreshing recency."""
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is not None and entry[0] > time.monotonic():
+                return entry[1]
+            return default
+
+    def pop(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def put(self, key, value):
+        with self._lock:
+            self._data[key] = (time.monotonic() + self.ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            'size': len(self._data),
+            'maxsize': self.maxsize,
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'hit_rate': self.hits / lookups if lookups else 0.0
+        }
+
+
+class QueryCache:
+    """
+    Process-wide cache of query work shared by every session:
+    - vectors: (model, normalized query) -> query embedding
+    - rankings: (model, dataset version, normalized query, search args) -> (positions, scores)
+    """
+
+    def __init__(self, maxsize=QUERY_CACHE_SIZE, ttl=QUERY_CACHE_TTL):
+        self.vectors = LRUCache(maxsize, ttl)
+        self.rankings = LRUCache(maxsize, ttl)
+
+    def clear(self):
+        self.vectors.clear()
+        self.rankings.clear()
+
+    def stats(self):
+        return {'vectors': self.vectors.stats(), 'rankings': self.rankings.stats()}
+
+
+@st.cache_resource
+def get_query_cache():
+    """Returns the single QueryCache of this server process."""
+    return QueryCache()
@@ -0,0 +1,110 @@
+import os
+import threading
+import streamlit as st
+import utils.db as db
+from utils.query_cache import LRUCache
+
+# Per-user data cached in front of utils.db, shared by the sessions of this process
+USER_CACHE_SIZE = int(os.getenv("HOPON_USER_CACHE_SIZE", 1024))
+USER_CACHE_TTL = float(os.getenv("HOPON_USER_CACHE_TTL", 300))
+
+
+class UserDataCache:
+    """
+    Write-through cache of user data, keyed by user id:
+    - watchlists: user id -> frozenset of favorite project ids
+    - searches: user id -> tuple of saved searches (newest first)
+
+    Reads hit the database only on a miss or after the TTL. Writes go to the
+    database first and then update the cached entry, so a user's reruns read
+    their own changes without a query. Entries only reflect writes made in
+    this process; changes from other processes show up after the TTL.
+    """
+
+    def __init__(self, maxsize=USER_CACHE_SIZE, ttl=USER_CACHE_TTL):
+        self.watchlists = LRUCache(maxsize, ttl)
+        self.searches = LRUCache(maxsize, ttl)
+        self._lock = threading.Lock() # Serialises read-modify-write of entries
+
+    # --- Watchlist ---
+    def get_watchlist(self, user_id):
+        ids = self.watchlists.get(user_id)
+        if ids is None:
+            ids = frozenset(db.get_watchlist(user_id))
+            self.watchlists.put(user_id, ids)
+        return ids
+
+    def update_watchlist(self, add_ids, remove_ids, user_id):
+        """Writes a favorites diff (utils.db.update_watchlist), then updates the cached set."""
+        ok = db.update_watchlist(add_ids, remove_ids, user_id)
+        with self._lock:
+            ids = self.watchlists.peek(user_id)
+            if not ok:
+                self.watchlists.pop(user_id) # Unknown state, reload on next read
+            elif ids is not None:
+                self.watchlists.put(user_id, (ids | {str(pid) for pid in add_ids}) - {str(pid) for pid in remove_ids})
+        return ok
+
+    # --- Saved Searches ---
+    def get_saved_searches(self, user_id):
+        searches = self.searches.get(user_id)
+        if searches is None:
+            searches = tuple(db.get_saved_searches(user_id))
+            self.searches.put(user_id, searches)
+        return list(searches)
+
+    def save_search(self, name, filters_json, user_id):
+        search = db.save_search(name, filters_json, user_id)
+        with self._lock:
+            searches = self.searches.peek(user_id)
+            if search is None:
+                self.searches.pop(user_id)
+            elif searches is not None:
+                self.searches.put(user_id, (search,) + searches)
+        return search
+
+    def delete_search(self, search_id, user_id):
+        ok = db.delete_search(search_id)
+        with self._lock:
+            searches = self.searches.peek(user_id)
+            if not ok:
+                self.searches.pop(user_id)
+            elif searches is not None:
+                self.searches.put(user_id, tuple(s for s in searches if s['id'] != search_id))
+        return ok
+
+    def invalidate(self, user_id):
+        """Drops everything cached for a user (e.g. after deleting the account)."""
+        self.watchlists.pop(user_id)
+        self.searches.pop(user_id)
+
+    def clear(self):
+        self.watchlists.clear()
+        self.searches.clear()
+
+    def stats(self):
+        return {'watchlists': self.watchlists.stats(), 'searches': self.searches.stats()}
+
+
+@st.cache_resource
+def get_user_cache():
+    """Returns the user data cache of this server process."""
+    return UserDataCache()
+
+
+# Drop-in replacements for the utils.db functions used by the UI
+
+def get_watchlist(user_id):
+    return get_user_cache().get_watchlist(user_id)
+
+def update_watchlist(add_ids, remove_ids, user_id):
+    return get_user_cache().update_watchlist(add_ids, remove_ids, user_id)
+
+def get_saved_searches(user_id):
+    return get_user_cache().get_saved_searches(user_id)
+
+def save_search(name, filters_json, user_id):
+    return get_user_cache().save_search(name, filters_json, user_id)
+
+def delete_search(search_id, user_id):
+    return get_user_cache().delete_search(search_id, user_id)
@@ -0,0 +1,306 @@
+import os
+import numpy as np
+from utils.logger import logger
+from utils.embedding_store import RESCORE_FACTOR
+
+# Below this many vectors an exact scan is both faster and perfectly accurate.
+IVF_MIN_VECTORS = 5000
+# Without an explicit n_probe, IVF probes the fewest lists that reach this
+# recall@RECALL_K on a sample of the corpus (measured when the index is built)
+IVF_RECALL_TARGET = 0.95
+RECALL_K = 100
+CALIBRATION_QUERIES = 256
+# Searches score at least k * this many rows; filtered searches over at most
+# that many candidates are scored exactly
+EXACT_SCAN_FACTOR = 10
+
+
+def as_float_matrix(embeddings):
+    """
+    Returns the embeddings as a contiguous, L2-normalised float32 NumPy matrix.
+    Accepts NumPy arrays as well as torch tensors (legacy pickled embeddings).
+    Already normalised float32 input is returned without a copy.
+    """
+    if hasattr(embeddings, 'cpu'):
+        embeddings = embeddings.cpu().numpy()
+    matrix = np.ascontiguousarray(embeddings, dtype=np.float32)
+    if matrix.ndim == 1:
+        matrix = matrix.reshape(1, -1)
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    if np.allclose(norms, 1.0, atol=1e-5):
+        return matrix
+    norms[norms == 0] = 1.0
+    return matrix / norms
+
+
+def top_k_positions(scores, k):
+    """
+    Returns the positions of the k highest scores, best first.
+    Uses argpartition so the cost is O(n + k log k) instead of a full sort.
+    """
+    n = len(scores)
+    if k is None or k >= n:
+        return np.argsort(-scores, kind='stable')
+    if k <= 0:
+        return np.empty(0, dtype=np.int64)
+    part = np.argpartition(-scores, k - 1)[:k]
+    return part[np.argsort(-scores[part], kind='stable')]
+
+
+def top_k_per_row(scores, k):
+    """
+    Row-wise top-k of a 2-D score matrix, best first.
+    Returns (column positions, scores), each of shape (rows, min(k, columns)).
+    """
+    k = min(k, scores.shape[1])
+    if k <= 0:
+        empty = np.empty((scores.shape[0], 0))
+        return empty.astype(np.int64), empty.astype(scores.dtype)
+    part = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+    part_scores = np.take_along_axis(scores, part, axis=1)
+    order = np.argsort(-part_scores, axis=1, kind='stable')
+    return np.take_along_axis(part, order, axis=1), np.take_along_axis(part_scores, order, axis=1)
+
+
+def score_rows(vectors, query, positions=None):
+    """
+    Inner products of the query with the given rows.
+    `vectors` is either a float matrix or an EmbeddingStore (quantized rows).
+    """
+    if hasattr(vectors, 'scores'):
+        return vectors.scores(query, positions)
+    rows = vectors if positions is None else vectors[positions]
+    return rows @ query
+
+
+def rank_positions(vectors, query, positions, k):
+    """
+    Scores the given positions and returns the k best (positions, scores).
+    int8 vectors are shortlisted on their scan scores and the shortlist is
+    rescored with the unquantized query (still approximate, see
+    EmbeddingStore.rescore).
+    """
+    scores = score_rows(vectors, query, positions)
+    if k is not None and getattr(vectors, 'needs_rescore', False):
+        shortlist = top_k_positions(scores, k * RESCORE_FACTOR)
+        positions = positions[shortlist]
+        scores = vectors.rescore(query, positions)
+    best = top_k_positions(scores, k)
+    return positions[best], scores[best]
+
+
+class FlatIndex:
+    """Exact (brute-force) inner product index."""
+
+    kind = 'flat'
+
+    def __init__(self, vectors):
+        self.vectors = vectors
+
+    def __len__(self):
+        return len(self.vectors)
+
+    def search(self, query, k, candidates=None):
+        """
+        Returns (positions, scores) of the k nearest vectors to the query.
+
+        Args:
+            query: Normalised query vector of shape (dim,).
+            k: Number of results (None returns every candidate, ranked).
+            candidates: Optional boolean mask restricting the searchable rows.
+        """
+        if candidates is None:
+            positions = np.arange(len(self.vectors))
+        else:
+            positions = np.flatnonzero(candidates)
+        return rank_positions(self.vectors, query, positions, k)
+
+    def save(self, path, version=''):
+        """Persists the index; `version` identifies the embeddings it was built for."""
+        _atomic_savez(path, kind=np.array(self.kind), n_vectors=np.array(len(self)), version=np.array(version or ''))
+
+
+class IVFIndex:
+    """
+    Inverted-file approximate index.
+
+    Vectors are clustered with spherical k-means; a query only scores the members
+    of the `n_probe` closest clusters. Raising `n_probe` trades latency for recall
+    (n_probe == n_lists is an exact search). By default `n_probe` is calibrated
+    at build time to reach IVF_RECALL_TARGET (see `calibrate_n_probe`), and
+    every search keeps probing until k * EXACT_SCAN_FACTOR rows were scored.
+
+    With a candidate mask, selective masks (no more candidates than the probed
+    lists would hold, or than k * EXACT_SCAN_FACTOR) are scored exactly. Otherwise
+    further lists are probed until enough candidates survive the mask.
+    """
+
+    kind = 'ivf'
+
+    def __init__(self, vectors, centroids, list_positions, list_offsets, n_probe=1):
+        self.vectors = vectors
+        self.centroids = centroids
+        self.list_positions = list_positions
+        self.list_offsets = list_offsets
+        self.n_probe = n_probe
+
+    def __len__(self):
+        return len(self.vectors)
+
+    @classmethod
+    def build(cls, matrix, n_lists=None, n_probe=None, n_iter=10, seed=42, vectors=None, recall=IVF_RECALL_TARGET):
+        """
+        Clusters a normalised float matrix. `vectors` is what queries are scored
+        against (defaults to the matrix itself, e.g. a quantized EmbeddingStore).
+        If n_probe is None it is calibrated to the `recall` target.
+        """
+        n = len(matrix)
+        if n_lists is None:
+            n_lists = int(np.sqrt(n))
+        n_lists = max(1, min(n_lists, n))
+
+        rng = np.random.default_rng(seed)
+        centroids = matrix[rng.choice(n, size=n_lists, replace=False)].copy()
+        for _ in range(n_iter):
+            assignment = np.argmax(matrix @ centroids.T, axis=1)
+            sums = np.zeros_like(centroids)
+            np.add.at(sums, assignment, matrix)
+            empty = np.bincount(assignment, minlength=n_lists) == 0
+            # Re-seed empty clusters so every list stays useful
+            sums[empty] = matrix[rng.choice(n, size=int(empty.sum()), replace=False)]
+            centroids = as_float_matrix(sums)
+
+        assignment = np.argmax(matrix @ centroids.T, axis=1)
+        list_positions = np.argsort(assignment, kind='stable')
+        list_offsets = np.concatenate(([0], np.cumsum(np.bincount(assignment, minlength=n_lists))))
+        index = cls(matrix if vectors is None else vectors, centroids, list_positions, list_offsets, n_probe=n_probe or 1)
+        if n_probe is None:
+            index.n_probe = index.calibrate_n_probe(matrix, recall, seed=seed)
+        return index
+
+    def calibrate_n_probe(self, matrix, recall=IVF_RECALL_TARGET, k=RECALL_K, n_queries=CALIBRATION_QUERIES, seed=42):
+        """
+        Smallest n_probe whose recall@k, with sampled corpus rows as queries,
+        reaches `recall`.
+        A true neighbour is found once its list is probed, so the lists needed
+        per (query, neighbour) pair follow from the centroid ranking alone.
+        """
+        n_lists = len(self.centroids)
+        rng = np.random.default_rng(seed)
+        queries = matrix[rng.choice(len(matrix), size=min(n_queries, len(matrix)), replace=False)]
+        assignment = np.empty(len(matrix), dtype=np.int64)
+        assignment[self.list_positions] = np.repeat(np.arange(n_lists), np.diff(self.list_offsets))
+
+        # Each sample's own row is dropped, as real queries are not in the corpus
+        truth = top_k_per_row(queries @ matrix.T, k + 1)[0][:, 1:]
+        list_rank = np.argsort(np.argsort(-(queries @ self.centroids.T), axis=1), axis=1)
+        needed = np.take_along_axis(list_rank, assignment[truth], axis=1) + 1
+        n_probe = int(np.ceil(np.quantile(needed, recall, method='higher')))
+        return max(1, min(n_lists, n_probe))
+
+    def search(self, query, k, candidates=None, n_probe=None):
+        n_lists = len(self.centroids)
+        n_probe = min(n_probe or self.n_probe, n_lists)
+        if candidates is not None:
+            n_candidates = int(np.count_nonzero(candidates))
+            probed_rows = len(self) * n_probe // n_lists
+            if k is None or n_candidates <= max(k * EXACT_SCAN_FACTOR, probed_rows):
+                return rank_positions(self.vectors, query, np.flatnonzero(candidates), k)
+
+        lists = []
+        found = 0
+        for probed, c in enumerate(top_k_positions(self.centroids @ query, n_lists), start=1):
+            members = self.list_positions[self.list_offsets[c]:self.list_offsets[c + 1]]
+            if candidates is not None:
+                members = members[candidates[members]]
+            lists.append(members)
+            found += len(members)
+            if probed >= n_probe and (k is None or found >= k * EXACT_SCAN_FACTOR):
+                break
+        positions = np.concatenate(lists) if lists else np.empty(0, dtype=np.int64)
+        return rank_positions(self.vectors, query, positions, k)
+
+    def save(self, path, version=''):
+        """Persists the index; `version` identifies the embeddings it was built for."""
+        _atomic_savez(
+            path,
+            kind=np.array(self.kind),
+            n_vectors=np.array(len(self)),
+            version=np.array(version or ''),
+            centroids=self.centroids,
+            list_positions=self.list_positions,
+            list_offsets=self.list_offsets,
+            n_probe=np.array(self.n_probe)
+        )
+
+
+def build_index(matrix, kind='auto', n_probe=None, vectors=None, recall=IVF_RECALL_TARGET):
+    """
+    Builds a vector index over a normalised embedding matrix.
+
+    Args:
+        matrix: Normalised float32 matrix of shape (n, dim).
+        kind: 'flat', 'ivf' or 'auto' (IVF only once the corpus is large and
+            clustered enough to reach `recall` without probing half the lists).
+        n_probe: Number of IVF lists scanned per query (None: calibrated to `recall`).
+        vectors: Rows queries are scored against (defaults to matrix).
+        recall: Target recall@RECALL_K of the calibrated n_probe.
+    """
+    vectors = matrix if vectors is None else vectors
+    requested = kind
+    if kind == 'auto':
+        kind = 'ivf' if len(matrix) >= IVF_MIN_VECTORS else 'flat'
+    if kind == 'ivf':
+        logger.info(f"Building IVF index over {len(matrix)} vectors...")
+        index = IVFIndex.build(matrix, n_probe=n_probe, vectors=vectors, recall=recall)
+        n_lists = len(index.centroids)
+        logger.info(f"IVF index: {n_lists} lists, n_probe={index.n_probe}"
+                    + ("" if n_probe else f" (calibrated for recall@{RECALL_K} >= {recall})"))
+        if requested == 'auto' and 2 * index.n_probe > n_lists:
+            logger.info("Embeddings are too uniform for IVF to pay off, using an exact scan.")
+            return FlatIndex(vectors)
+        return index
+    if kind != 'flat':
+        raise ValueError(f"Unknown vector index type: {kind}")
+    return FlatIndex(vectors)
+
+
+def load_index(path, vectors, n_probe=None, version=None):
+    """
+    Loads a persisted index for the given vectors (matrix or EmbeddingStore).
+    Returns None if the file is missing or was built for different vectors:
+    another row count or, if `version` is given, other embeddings (e.g. a
+    re-encoded store of the same size).
+    """
+    if not os.path.exists(path):
+        return None
+    try:
+        with np.load(path) as data:
+            if int(data['n_vectors']) != len(vectors):
+                logger.warning("Vector index does not match embeddings (Cache Miss).")
+                return None
+            if version is not None and ('version' not in data.files or str(data['version']) != version):
+                logger.warning("Vector index was built for other embeddings (Cache Miss).")
+                return None
+            kind = str(data['kind'])
+            if kind == 'flat':
+                return FlatIndex(vectors)
+            return IVFIndex(
+                vectors,
+                data['centroids'],
+                data['list_positions'],
+                data['list_offsets'],
+                n_probe=n_probe or int(data['n_probe'])
+            )
+    except Exception as e:
+        logger.error(f"Failed to load vector index: {e}")
+        return None
+
+
+def _atomic_savez(path, **arrays):
+    """Writes an .npz file via a temp file so readers never see a partial index."""
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'wb') as f:
+        np.savez(f, **arrays)
+    os.replace(tmp_path, path)